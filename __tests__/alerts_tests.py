@@ -0,0 +1,283 @@
+import sys
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from unittest.mock import patch
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.models.models import Base, Subscritions, User, Notifications
+from src.helpers import price_helper
+from src.helpers.cache_helper import market_cache
+from src.helpers import alerts_helper
+from src.helpers.alerts_helper import NotificationSink, ThresholdIndex, shard_ranges
+from src.helpers.notification_stream_helper import notification_to_dict
+
+
+def make_sub(sid: int, check_type: str, what_to_check: str, operator: str, value: int, currency: str = "usd", uid: int = 1):
+    return Subscritions(
+        id=sid,
+        uid=uid,
+        check_type=check_type,
+        what_to_check=what_to_check,
+        operator=operator,
+        value=value,
+        currency=currency
+    )
+
+
+@pytest.fixture(autouse=True)
+def clear_market_cache():
+    market_cache.clear()
+    yield
+    market_cache.clear()
+
+
+@pytest.fixture
+def db_session():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+
+    with Session(engine) as session:
+        yield session
+
+
+def seed_subscriptions(session: Session, count: int):
+    users = [User(id=uid, username=f"user{uid}", email=f"user{uid}@mail.com", password="pwd", country="pl", pfp="") for uid in range(1, 11)]
+    session.add_all(users)
+
+    session.add_all([
+        make_sub(sid, "crypto", ["bitcoin", "ethereum"][sid % 2], "greater", sid, uid=sid % 10 + 1)
+        for sid in range(1, count + 1)
+    ])
+
+    session.commit()
+
+
+def count_statements(session: Session, kind: str = "SELECT"):
+    statements = []
+
+    def before_execute(conn, cursor, statement, *args):
+        if statement.lstrip().upper().startswith(kind):
+            statements.append(statement)
+
+    event.listen(session.get_bind(), "before_cursor_execute", before_execute)
+
+    return statements
+
+
+@pytest.fixture
+def mock_subs():
+    return [
+        make_sub(1, "crypto", "bitcoin", "greater", 40000),
+        make_sub(2, "crypto", "bitcoin", "less", 50000, "eur"),
+        make_sub(3, "crypto", "ethereum", "greater", 3000),
+        make_sub(4, "stock", "aapl", "less", 300),
+        make_sub(5, "stock", "MSFT", "greater", 100)
+    ]
+
+
+@pytest.fixture
+def mock_stock_frame():
+    columns = pd.MultiIndex.from_product([["AAPL", "MSFT"], ["Open", "Close"]])
+
+    return pd.DataFrame([[1.0, 200.0, 3.0, 410.0], [5.0, 210.0, 7.0, np.nan]], columns=columns)
+
+
+class TestPriceResolution:
+    def test_one_gecko_call_for_all_coins(self, mock_subs, mock_stock_frame):
+        with patch.object(price_helper, "cg") as mock_cg, \
+             patch("yfinance.download") as mock_download:
+            mock_cg.get_price.return_value = {
+                "bitcoin": {"usd": 45000, "eur": 41000},
+                "ethereum": {"usd": 3200, "eur": 2900}
+            }
+            mock_download.return_value = mock_stock_frame
+
+            prices = price_helper.resolve_prices(mock_subs)
+
+        mock_cg.get_price.assert_called_once_with(ids="bitcoin,ethereum", vs_currencies="eur,usd")
+        mock_download.assert_called_once()
+
+        assert prices[("crypto", "bitcoin", "usd")] == 45000
+        assert prices[("crypto", "bitcoin", "eur")] == 41000
+        assert prices[("stock", "aapl", "usd")] == 210.0
+        assert prices[("stock", "MSFT", "usd")] == 410.0
+
+    def test_gecko_ids_are_chunked(self):
+        subs = [make_sub(i, "crypto", f"coin-{i}", "greater", 1) for i in range(5)]
+
+        with patch.object(price_helper, "cg") as mock_cg, \
+             patch.object(price_helper, "GECKO_IDS_PER_CALL", 2):
+            mock_cg.get_price.return_value = {}
+
+            price_helper.resolve_prices(subs)
+
+        assert mock_cg.get_price.call_count == 3
+
+
+class TestThresholdIndex:
+    def test_triggered_matches_linear_scan(self):
+        subs = [make_sub(i, "crypto", "bitcoin", "greater" if i % 2 else "less", i * 10) for i in range(1, 200)]
+
+        index = ThresholdIndex(subs)
+
+        for current in (-1, 0, 10, 15, 1000, 1990, 5000):
+            expected = {
+                sub.id for sub in subs
+                if (sub.operator == "greater" and current > sub.value) or (sub.operator == "less" and current < sub.value)
+            }
+
+            assert {sub.id for sub in index.triggered(("crypto", "bitcoin", "usd"), current)} == expected
+
+    def test_thresholds_are_strict(self):
+        index = ThresholdIndex([
+            make_sub(1, "crypto", "bitcoin", "greater", 100),
+            make_sub(2, "crypto", "bitcoin", "less", 100)
+        ])
+
+        assert index.triggered(("crypto", "bitcoin", "usd"), 100) == []
+
+    def test_keys_are_separated_by_currency(self, mock_subs):
+        index = ThresholdIndex(mock_subs)
+
+        assert [sub.id for sub in index.triggered(("crypto", "bitcoin", "usd"), 45000)] == [1]
+        assert [sub.id for sub in index.triggered(("crypto", "bitcoin", "eur"), 45000)] == [2]
+        assert index.triggered(("crypto", "dogecoin", "usd"), 1) == []
+        assert len(index) == 5
+
+    def test_add_after_lookup_resorts(self):
+        index = ThresholdIndex([make_sub(1, "stock", "aapl", "greater", 100)])
+
+        assert len(index.triggered(("stock", "aapl", "usd"), 150)) == 1
+
+        index.add(make_sub(2, "stock", "aapl", "greater", 120))
+
+        assert {sub.id for sub in index.triggered(("stock", "aapl", "usd"), 150)} == {1, 2}
+
+
+class TestShardRanges:
+    def test_ranges_cover_every_id_once(self):
+        ranges = shard_ranges(3, 1002, 4)
+
+        assert len(ranges) == 4
+        assert ranges[0][0] == 3 and ranges[-1][1] == 1003
+        assert all(prev[1] == curr[0] for prev, curr in zip(ranges, ranges[1:]))
+
+    def test_less_ids_than_shards(self):
+        assert shard_ranges(5, 6, 8) == [(5, 6), (6, 7)]
+
+    def test_empty_table(self):
+        assert shard_ranges(None, None, 4) == []
+
+
+class TestSubscriptionScan:
+    @pytest.mark.parametrize("count", [20, 2000])
+    def test_queries_per_cycle_are_constant(self, db_session, count):
+        seed_subscriptions(db_session, count)
+
+        statements = count_statements(db_session)
+
+        prices = {("crypto", "bitcoin", "usd"): 15.0, ("crypto", "ethereum", "usd"): 10.0}
+
+        with patch.object(alerts_helper, "resolve_prices", return_value=prices):
+            checked, hits = alerts_helper.find_triggered(db_session, 1, count + 1, batch_size=100)
+
+        assert checked == count
+        assert sorted(sub.id for sub, _ in hits) == [1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 12, 14]
+        assert len(statements) == 2
+
+    def test_rows_carry_owner_email(self, db_session):
+        seed_subscriptions(db_session, 5)
+
+        with patch.object(alerts_helper, "resolve_prices", return_value={("crypto", "bitcoin", "usd"): 100.0}):
+            _, hits = alerts_helper.find_triggered(db_session, 1, 6)
+
+        assert {(sub.id, sub.email) for sub, _ in hits} == {(2, "user3@mail.com"), (4, "user5@mail.com")}
+
+    def test_prices_of_the_cycle_are_reused(self, db_session):
+        seed_subscriptions(db_session, 5)
+
+        prices = price_helper.prices_from_rows(price_helper.prices_to_rows({("crypto", "bitcoin", "usd"): 100.0}))
+
+        with patch.object(alerts_helper, "resolve_prices") as mock_resolve:
+            _, hits = alerts_helper.find_triggered(db_session, 1, 6, prices=prices)
+
+        mock_resolve.assert_not_called()
+        assert sorted(sub.id for sub, _ in hits) == [2, 4]
+
+
+class TestNotificationSink:
+    def test_flushes_in_batches(self, db_session):
+        seed_subscriptions(db_session, 5)
+
+        with patch.object(alerts_helper, "resolve_prices", return_value={("crypto", "bitcoin", "usd"): 100.0, ("crypto", "ethereum", "usd"): 100.0}):
+            _, hits = alerts_helper.find_triggered(db_session, 1, 6)
+
+        inserts = count_statements(db_session, "INSERT")
+        deletes = count_statements(db_session, "DELETE")
+        flushed = []
+
+        with NotificationSink(db_session, batch_size=2, on_flush=flushed.append) as sink:
+            for sub, current_price in hits:
+                sink.add(sub, current_price)
+
+        assert [len(batch) for batch in flushed] == [2, 2, 1]
+        assert len(inserts) == 3 and len(deletes) == 3
+        assert sink.flushed == 5
+
+        assert db_session.query(Subscritions).count() == 0
+        assert db_session.query(Notifications).filter(Notifications.uid == 3).one().what_to_check == "bitcoin"
+
+    def test_publishes_stored_notifications(self, db_session):
+        seed_subscriptions(db_session, 3)
+
+        published = []
+
+        with NotificationSink(db_session, publish=published.extend) as sink:
+            for sub in db_session.query(Subscritions).order_by(Subscritions.id).all():
+                sink.add(sub, 42.0)
+
+        stored = db_session.query(Notifications).order_by(Notifications.id).all()
+
+        # Live events carry exactly what a backlog read from the database carries
+        assert sorted(published, key=lambda notification: notification["id"]) == [notification_to_dict(notification) for notification in stored]
+        assert all(notification["price"] == 42.0 for notification in published)
+
+    def test_only_claimed_subscriptions_are_notified(self, db_session):
+        seed_subscriptions(db_session, 3)
+
+        subs = db_session.query(Subscritions).order_by(Subscritions.id).all()
+
+        # Another worker already fired subscription 2
+        db_session.query(Subscritions).filter(Subscritions.id == 2).delete()
+        db_session.commit()
+
+        flushed, published = [], []
+
+        with NotificationSink(db_session, on_flush=flushed.extend, publish=published.extend) as sink:
+            for sub in subs:
+                sink.add(sub, 42.0)
+
+        assert [sub.id for sub, _ in flushed] == [1, 3]
+        assert sorted(notification["uid"] for notification in published) == [2, 4]
+        assert db_session.query(Notifications).count() == 2
+        assert sink.flushed == 2
+
+    def test_failed_flush_keeps_subscriptions(self, db_session):
+        seed_subscriptions(db_session, 2)
+
+        sink = NotificationSink(db_session)
+        sink.add(make_sub(1, "crypto", "bitcoin", "greater", 1, uid=None), 2.0)
+
+        with pytest.raises(Exception):
+            sink.flush()
+
+        assert db_session.query(Subscritions).count() == 2
+        assert db_session.query(Notifications).count() == 0
@@ -0,0 +1,110 @@
+import sys
+import os
+
+import jwt
+import pytest
+
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+
+from fastapi import HTTPException, Response
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.auth import auth_service
+from src.auth.auth_service import check_auth, check_tokens, check_users_auth, resolve_tokens
+
+USER = {"uid": 1, "role": "user", "pfp": "pfp.png", "username": "user", "email": "user@example.com"}
+
+
+def make_token(secret: str, lifetime: timedelta, **claims):
+    return jwt.encode({**USER, **claims, "exp": datetime.now(timezone.utc) + lifetime}, secret, algorithm="HS256")
+
+
+def set_cookies(res: Response):
+    return [value for key, value in res.headers.items() if key == "set-cookie"]
+
+
+@pytest.fixture(autouse=True)
+def auth_env(monkeypatch):
+    monkeypatch.setenv("ACCESS_TOKEN_SECRET", "access-secret")
+    monkeypatch.setenv("REFRESH_TOKEN_SECRET", "refresh-secret")
+    monkeypatch.setenv("JWT_ALGORITHM", "HS256")
+
+    auth_service.claims_cache.clear()
+    yield
+    auth_service.claims_cache.clear()
+
+
+@pytest.fixture
+def refresh_token():
+    return make_token("refresh-secret", timedelta(days=1))
+
+
+class TestResolveTokens:
+    def test_decodes_each_token_once(self, refresh_token):
+        access_token = make_token("access-secret", timedelta(minutes=15))
+
+        with patch("src.auth.auth_service.jwt.decode", wraps=jwt.decode) as decode:
+            for _ in range(5):
+                resolve_tokens(Response(), access_token, refresh_token)
+
+        assert decode.call_count == 2
+
+    def test_fresh_access_token_is_not_reissued(self, refresh_token):
+        res = Response()
+        auth = resolve_tokens(res, make_token("access-secret", timedelta(minutes=15)), refresh_token)
+
+        assert auth.logged_in
+        assert auth.users_data == {"uid": 1, "role": "user", "pfp": "pfp.png", "username": "user"}
+        assert set_cookies(res) == []
+
+    def test_access_token_near_expiry_is_reissued(self, refresh_token):
+        res = Response()
+        auth = resolve_tokens(res, make_token("access-secret", timedelta(minutes=2)), refresh_token)
+
+        cookies = set_cookies(res)
+
+        assert auth.logged_in
+        assert len(cookies) == 1 and cookies[0].startswith("access_token=")
+
+        claims = jwt.decode(cookies[0].split(";")[0].split("=", 1)[1], "access-secret", algorithms=["HS256"])
+
+        assert claims["email"] == USER["email"]
+
+    def test_missing_access_token_is_issued_from_refresh_token(self, refresh_token):
+        res = Response()
+        auth = resolve_tokens(res, None, refresh_token)
+
+        assert auth.logged_in
+        assert set_cookies(res)[0].startswith("access_token=")
+
+    def test_invalid_access_token_clears_cookies(self, refresh_token):
+        res = Response()
+        auth = resolve_tokens(res, "not-a-token", refresh_token)
+
+        assert not auth.logged_in
+        assert any(cookie.startswith('refresh_token=""') for cookie in set_cookies(res))
+
+    def test_invalid_tokens_are_not_cached(self):
+        resolve_tokens(Response(), None, "not-a-token")
+
+        assert len(auth_service.claims_cache._entries) == 0
+
+
+class TestCheckFunctions:
+    async def test_check_auth_requires_refresh_token(self):
+        with pytest.raises(HTTPException) as error:
+            await check_auth(Response(), None, None)
+
+        assert error.value.status_code == 401
+
+    async def test_check_auth_rejects_invalid_refresh_token(self):
+        with pytest.raises(HTTPException) as error:
+            await check_auth(Response(), None, "not-a-token")
+
+        assert error.value.detail == "Invalid refresh token"
+
+    async def test_anonymous_client(self):
+        assert await check_tokens(Response(), None, None) is False
+        assert await check_users_auth(Response(), None, None) == {}
@@ -0,0 +1,249 @@
+import sys
+import os
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from fastapi import FastAPI, WebSocketDisconnect
+from fastapi.testclient import TestClient
+from unittest.mock import AsyncMock, MagicMock, patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.helpers.broadcast_helper import PriceBroadcaster, TooManyAssets
+from src.helpers.cache_helper import market_cache
+from src.helpers.rate_limit_helper import RateLimiter
+from src.helpers.upstream_quota_helper import BACKGROUND
+
+
+class FakeSocket:
+    def __init__(self, fail: bool = False):
+        self.fail = fail
+        self.sent = []
+        self.close_code = None
+
+    async def send_text(self, payload: str):
+        if self.fail:
+            raise RuntimeError("socket closed")
+
+        self.sent.append(json.loads(payload))
+
+    async def close(self, code: int = 1000):
+        self.close_code = code
+
+
+class FakeMarket:
+    def __init__(self, prices: dict):
+        self.prices = prices
+        self.calls = []
+
+    async def __call__(self, assets):
+        self.calls.append(set(assets))
+
+        return {asset: price for asset, price in self.prices.items() if asset in assets}
+
+
+@pytest.fixture
+def market():
+    return FakeMarket({"crypto:bitcoin": 60000.0, "crypto:ethereum": 3000.0, "stock:AAPL": 200.0})
+
+
+@pytest.fixture
+def broadcaster(market):
+    return PriceBroadcaster(market, interval=60)
+
+
+class TestPriceBroadcaster:
+    async def test_one_fetch_for_union_of_subscriptions(self, broadcaster, market):
+        first, second = FakeSocket(), FakeSocket()
+
+        broadcaster.clients = {first: frozenset({"crypto:bitcoin"}), second: frozenset({"crypto:bitcoin", "stock:AAPL"})}
+
+        await broadcaster.poll_once()
+
+        assert market.calls == [{"crypto:bitcoin", "stock:AAPL"}]
+        assert first.sent == [{"type": "prices", "data": {"crypto:bitcoin": 60000.0}}]
+        assert second.sent == [{"type": "prices", "data": {"crypto:bitcoin": 60000.0, "stock:AAPL": 200.0}}]
+
+    async def test_only_changed_prices_are_pushed(self, broadcaster, market):
+        socket = FakeSocket()
+
+        broadcaster.clients = {socket: frozenset({"crypto:bitcoin", "crypto:ethereum"})}
+
+        await broadcaster.poll_once()
+
+        market.prices["crypto:ethereum"] = 3100.0
+        await broadcaster.poll_once()
+
+        # Nothing changed, nothing is sent
+        await broadcaster.poll_once()
+
+        assert [message["data"] for message in socket.sent] == [
+            {"crypto:bitcoin": 60000.0, "crypto:ethereum": 3000.0},
+            {"crypto:ethereum": 3100.0}
+        ]
+
+    async def test_failing_client_is_dropped(self, broadcaster):
+        healthy, broken = FakeSocket(), FakeSocket(fail=True)
+
+        broadcaster.clients = {healthy: frozenset({"crypto:bitcoin"}), broken: frozenset({"crypto:bitcoin"})}
+
+        await broadcaster.poll_once()
+
+        assert broken not in broadcaster.clients
+        assert broken.close_code == 1011
+        assert len(healthy.sent) == 1
+        assert healthy.close_code is None
+
+    async def test_subscribe_sends_known_prices(self, broadcaster):
+        socket = FakeSocket()
+
+        broadcaster.prices = {"crypto:bitcoin": 60000.0}
+        broadcaster.clients = {socket: frozenset()}
+
+        await broadcaster.subscribe(socket, {"crypto:bitcoin", "stock:AAPL"})
+
+        for _ in range(10):
+            await asyncio.sleep(0)
+
+        # The snapshot comes first, the unknown asset follows from the poll started by subscribe
+        assert socket.sent == [
+            {"type": "snapshot", "data": {"crypto:bitcoin": 60000.0}},
+            {"type": "prices", "data": {"stock:AAPL": 200.0}}
+        ]
+
+        broadcaster.disconnect(socket)
+
+    async def test_poller_stops_without_clients(self, broadcaster):
+        socket = FakeSocket()
+
+        broadcaster.connect(socket)
+        task = broadcaster._task
+
+        broadcaster.disconnect(socket)
+        await asyncio.sleep(0)
+
+        assert broadcaster._task is None
+        assert task.cancelled()
+
+    async def test_subscribe_restarts_stopped_poller(self, broadcaster, market):
+        socket = FakeSocket()
+
+        broadcaster.connect(socket)
+        broadcaster.disconnect(socket)
+
+        await broadcaster.subscribe(socket, {"crypto:bitcoin"})
+
+        for _ in range(10):
+            await asyncio.sleep(0)
+
+        assert broadcaster._task is not None and not broadcaster._task.done()
+        assert socket.sent[-1] == {"type": "prices", "data": {"crypto:bitcoin": 60000.0}}
+
+        broadcaster.disconnect(socket)
+
+
+    async def test_asset_caps(self, broadcaster):
+        first, second = FakeSocket(), FakeSocket()
+
+        with patch("src.helpers.broadcast_helper.MAX_ASSETS_PER_CLIENT", 2), \
+             patch("src.helpers.broadcast_helper.MAX_WATCHED_ASSETS", 3):
+            with pytest.raises(TooManyAssets):
+                await broadcaster.subscribe(first, {"crypto:a", "crypto:b", "crypto:c"})
+
+            await broadcaster.subscribe(first, {"crypto:a", "crypto:b"})
+
+            # Assets someone already watches do not count again
+            await broadcaster.subscribe(second, {"crypto:b", "crypto:c"})
+
+            with pytest.raises(TooManyAssets):
+                await broadcaster.subscribe(second, {"crypto:c", "crypto:d"})
+
+        assert broadcaster.clients[second] == frozenset({"crypto:b", "crypto:c"})
+
+        broadcaster.disconnect(first)
+        broadcaster.disconnect(second)
+
+
+@pytest.fixture
+def socket_app(market):
+    from src.routes import ws_route
+
+    app = FastAPI()
+    app.include_router(ws_route.router, prefix="/ws")
+
+    with patch.object(ws_route, "broadcaster", PriceBroadcaster(market, interval=60)), \
+         patch.object(ws_route, "known_coins", AsyncMock(return_value=frozenset({"bitcoin", "ethereum"}))), \
+         patch.object(ws_route, "rate_limiter", RateLimiter({"ws": "100/60"})):
+        yield TestClient(app)
+
+
+class TestPricesSocket:
+    def test_subscribe_and_receive_prices(self, socket_app):
+        with socket_app.websocket_connect("/ws/prices") as websocket:
+            websocket.send_json({"action": "subscribe", "crypto": ["Bitcoin"], "stocks": ["aapl"]})
+
+            assert websocket.receive_json() == {"type": "snapshot", "data": {}}
+            assert websocket.receive_json() == {"type": "prices", "data": {"crypto:bitcoin": 60000.0, "stock:AAPL": 200.0}}
+
+            websocket.send_json({"action": "unknown"})
+
+            assert websocket.receive_json()["type"] == "error"
+
+    def test_invalid_asset_lists_are_rejected(self, socket_app):
+        with socket_app.websocket_connect("/ws/prices") as websocket:
+            for message in ({"action": "subscribe", "crypto": [1]}, {"action": "subscribe", "stocks": {"a": 1}}, {"action": "subscribe", "crypto": "bitcoin"}):
+                websocket.send_json(message)
+
+                assert websocket.receive_json()["type"] == "error"
+
+            # The handler is still alive
+            websocket.send_json({"action": "subscribe", "crypto": ["bitcoin"]})
+
+            assert websocket.receive_json() == {"type": "snapshot", "data": {}}
+
+    def test_unknown_assets_are_rejected(self, socket_app):
+        with socket_app.websocket_connect("/ws/prices") as websocket:
+            websocket.send_json({"action": "subscribe", "crypto": ["bitcoin", "my-own-coin"], "stocks": ["AAPL", "NOPE"]})
+
+            assert websocket.receive_json() == {"type": "error", "detail": "Unknown assets: my-own-coin, NOPE"}
+
+    def test_connects_are_rate_limited(self, socket_app):
+        from src.routes import ws_route
+
+        with patch.object(ws_route, "rate_limiter", RateLimiter({"ws": "2/60"})):
+            with socket_app.websocket_connect("/ws/prices") as websocket:
+                websocket.send_json({"action": "subscribe", "crypto": ["bitcoin"]})
+
+                assert websocket.receive_json()["type"] == "snapshot"
+
+                assert websocket.receive_json()["type"] == "prices"
+
+                # The subscribe took the second token
+                websocket.send_json({"action": "subscribe", "crypto": ["ethereum"]})
+
+                assert websocket.receive_json() == {"type": "error", "detail": "Too many requests, try again later"}
+
+            with pytest.raises(WebSocketDisconnect):
+                with socket_app.websocket_connect("/ws/prices") as websocket:
+                    websocket.receive_json()
+
+
+class TestPricePoller:
+    async def test_polls_on_background_budget(self):
+        from src.routes import ws_route
+
+        quota = MagicMock()
+        upstream = httpx.Client(base_url="https://coingecko.test", transport=httpx.MockTransport(lambda request: httpx.Response(200, json={"bitcoin": {"usd": 60000}})))
+
+        market_cache.clear()
+
+        try:
+            with patch.object(ws_route.poller_cg, "quota", quota), patch.object(ws_route.poller_cg, "client", upstream):
+                assert await ws_route.fetch_market_prices({"crypto:bitcoin"}) == {"crypto:bitcoin": 60000.0}
+        finally:
+            market_cache.clear()
+
+        quota.acquire_sync.assert_called_once_with(BACKGROUND)
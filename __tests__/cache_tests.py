@@ -0,0 +1,229 @@
+import sys
+import os
+import asyncio
+import threading
+import time
+
+import httpx
+import pandas as pd
+import pytest
+
+from unittest.mock import MagicMock, patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.helpers.cache_helper import LRUCache, MarketCache, MISS
+from src.helpers.upstream_helper import AsyncCoinGeckoAPI, download_quotes
+
+
+@pytest.fixture
+def cache():
+    return MarketCache(ttl=60, max_entries=16)
+
+
+class TestMarketCache:
+    def test_hit_skips_upstream(self, cache):
+        fetch = MagicMock(return_value=[{"id": "bitcoin"}])
+
+        first = cache.get_or_fetch("coingecko", "coins_markets", {"vs_currency": "usd", "page": 1}, fetch)
+        second = cache.get_or_fetch("coingecko", "coins_markets", {"page": 1, "vs_currency": "usd"}, fetch)
+
+        assert first == second == [{"id": "bitcoin"}]
+        assert fetch.call_count == 1
+
+    def test_params_are_part_of_key(self, cache):
+        fetch = MagicMock(side_effect=lambda: object())
+
+        cache.get_or_fetch("coingecko", "coins_markets", {"page": 1}, fetch)
+        cache.get_or_fetch("coingecko", "coins_markets", {"page": 2}, fetch)
+        cache.get_or_fetch("yfinance", "coins_markets", {"page": 1}, fetch)
+
+        assert fetch.call_count == 3
+
+    def test_entries_expire(self, cache):
+        fetch = MagicMock(return_value=1)
+
+        with patch("src.helpers.cache_helper.time.monotonic", return_value=1000):
+            cache.get_or_fetch("coingecko", "price", {}, fetch, ttl=5)
+
+        with patch("src.helpers.cache_helper.time.monotonic", return_value=1006):
+            cache.get_or_fetch("coingecko", "price", {}, fetch, ttl=5)
+
+        assert fetch.call_count == 2
+
+    def test_errors_are_not_cached(self, cache):
+        fetch = MagicMock(side_effect=[Exception("API rate limit exceeded"), 42])
+
+        with pytest.raises(Exception):
+            cache.get_or_fetch("coingecko", "price", {}, fetch)
+
+        assert cache.get_or_fetch("coingecko", "price", {}, fetch) == 42
+
+    def test_concurrent_misses_share_one_call(self, cache):
+        calls = []
+        release = threading.Event()
+
+        def fetch():
+            calls.append(1)
+            release.wait(timeout=5)
+            return "data"
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(cache.get_or_fetch("coingecko", "price", {"ids": "bitcoin"}, fetch)))
+            for _ in range(20)
+        ]
+
+        for thread in threads:
+            thread.start()
+
+        time.sleep(0.1)
+        release.set()
+
+        for thread in threads:
+            thread.join()
+
+        assert len(calls) == 1
+        assert results == ["data"] * 20
+
+
+class TestAsyncMarketCache:
+    async def test_concurrent_async_misses_share_one_call(self, cache):
+        requests = []
+
+        async def upstream(request: httpx.Request):
+            requests.append(request)
+            await asyncio.sleep(0.05)
+            return httpx.Response(200, json=[{"id": "bitcoin"}])
+
+        cg = AsyncCoinGeckoAPI(api_key="demo-key", transport=httpx.MockTransport(upstream))
+
+        results = await asyncio.gather(*(
+            cache.aget_or_fetch("coingecko", "coins_markets", {"page": 1}, lambda: cg.get_coins_markets(vs_currency="usd", page=1))
+            for _ in range(20)
+        ))
+
+        assert results == [[{"id": "bitcoin"}]] * 20
+        assert len(requests) == 1
+        assert requests[0].headers["x-cg-demo-api-key"] == "demo-key"
+        assert dict(requests[0].url.params) == {"vs_currency": "usd", "page": "1"}
+
+    async def test_upstream_errors_propagate(self, cache):
+        cg = AsyncCoinGeckoAPI(transport=httpx.MockTransport(lambda request: httpx.Response(429)))
+
+        with pytest.raises(httpx.HTTPStatusError):
+            await cache.aget_or_fetch("coingecko", "price", {}, lambda: cg.get_price(ids=["bitcoin", "ethereum"], vs_currencies="usd"))
+
+
+class TestLRUCache:
+    def test_least_recently_used_is_evicted(self):
+        lru = LRUCache(max_entries=2)
+
+        lru.set("a", 1, 60)
+        lru.set("b", 2, 60)
+        lru.get("a")
+        lru.set("c", 3, 60)
+
+        assert lru.get("b") is MISS
+        assert lru.get("a") == 1 and lru.get("c") == 3
+
+
+@pytest.fixture
+def clock(clock):
+    # Freshness is kept on the wall clock, expiry of the entries on the monotonic one
+    with patch("src.helpers.cache_helper.time.time", clock), \
+         patch("src.helpers.cache_helper.time.monotonic", clock):
+        yield clock
+
+
+def wait_for_refreshes(cache):
+    for _ in range(100):
+        if not cache._inflight:
+            return
+
+        time.sleep(0.01)
+
+
+class TestStaleWhileRevalidate:
+    def test_stale_value_is_served_while_refreshing(self, cache, clock):
+        fetch = MagicMock(side_effect=[1, 2])
+
+        assert cache.get_or_fetch("yfinance", "download", {}, fetch, ttl=5, stale_ttl=60) == 1
+
+        clock.now += 10
+
+        assert cache.get_or_fetch("yfinance", "download", {}, fetch, ttl=5, stale_ttl=60) == 1
+
+        wait_for_refreshes(cache)
+
+        assert cache.get_or_fetch("yfinance", "download", {}, fetch, ttl=5, stale_ttl=60) == 2
+        assert fetch.call_count == 2
+
+    def test_failed_refresh_keeps_stale_value(self, cache, clock):
+        fetch = MagicMock(side_effect=[1, Exception("upstream is down"), Exception("upstream is down")])
+
+        cache.get_or_fetch("yfinance", "download", {}, fetch, ttl=5, stale_ttl=60)
+        clock.now += 10
+
+        assert cache.get_or_fetch("yfinance", "download", {}, fetch, ttl=5, stale_ttl=60) == 1
+
+        wait_for_refreshes(cache)
+
+        assert cache.get_or_fetch("yfinance", "download", {}, fetch, ttl=5, stale_ttl=60) == 1
+
+        # Past the hard TTL the error reaches the caller
+        wait_for_refreshes(cache)
+        clock.now += 60
+
+        with pytest.raises(Exception):
+            cache.get_or_fetch("yfinance", "download", {}, fetch, ttl=5, stale_ttl=60)
+
+    def test_empty_download_keeps_stale_value(self, cache, clock):
+        quotes = pd.DataFrame({"Close": [101.0]}, index=pd.to_datetime(["2025-03-12"]))
+        params = {"tickers": "AAPL", "auto_adjust": False, "progress": False}
+
+        # yfinance reports a failed download with an empty frame instead of an error
+        responses = [quotes, pd.DataFrame(), pd.DataFrame({"Close": [float("nan")]}), quotes.copy()]
+
+        with patch("yfinance.download", side_effect=responses) as download:
+            fetch = lambda: download_quotes(**params)  # noqa: E731
+
+            cache.get_or_fetch("yfinance", "download", params, fetch, ttl=5, stale_ttl=60)
+
+            # Every request is past the soft TTL, so each one starts the next refresh
+            for _ in range(3):
+                clock.now += 10
+
+                assert cache.get_or_fetch("yfinance", "download", params, fetch, ttl=5, stale_ttl=60) is quotes
+
+                wait_for_refreshes(cache)
+
+        assert download.call_count == 4
+
+    async def test_one_background_refresh_for_concurrent_requests(self, cache, clock):
+        calls = []
+        release = asyncio.Event()
+
+        async def fetch():
+            calls.append(1)
+
+            if len(calls) > 1:
+                await release.wait()
+
+            return len(calls)
+
+        await cache.aget_or_fetch("coingecko", "coins_markets_snapshot", {}, fetch, ttl=5, stale_ttl=60)
+        clock.now += 10
+
+        results = await asyncio.gather(*(
+            cache.aget_or_fetch("coingecko", "coins_markets_snapshot", {}, fetch, ttl=5, stale_ttl=60)
+            for _ in range(20)
+        ))
+
+        assert results == [1] * 20
+
+        release.set()
+        await asyncio.gather(*cache._refreshes)
+
+        assert len(calls) == 2
+        assert await cache.aget_or_fetch("coingecko", "coins_markets_snapshot", {}, fetch, ttl=5, stale_ttl=60) == 2
@@ -0,0 +1,91 @@
+import sys
+import os
+import base64
+
+import numpy as np
+import pytest
+
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.helpers.compression_helper import CompressionMiddleware, accepted_encodings
+from src.helpers.sparkline_helper import compact_statistics, encode_sparkline
+
+
+def decode(sparkline: dict) -> np.ndarray:
+    values = np.frombuffer(base64.b64decode(sparkline["data"]), dtype="<f4").astype(np.float64)
+
+    return np.cumsum(values) if sparkline["encoding"] == "delta" else values
+
+
+@pytest.fixture
+def prices():
+    return [45000.0 + 250 * np.sin(i / 10) for i in range(168)]
+
+
+class TestSparklineEncoding:
+    def test_full_is_unchanged(self, prices):
+        stats = [{"name": "BTC", "sparkline_in_7d": {"price": prices}}]
+
+        assert compact_statistics(stats) is stats
+
+    @pytest.mark.parametrize("encoding", ["float32", "delta"])
+    def test_roundtrip(self, prices, encoding):
+        sparkline = encode_sparkline(prices, encoding)
+
+        assert sparkline["length"] == 168
+        assert np.allclose(decode(sparkline), prices, rtol=1e-5)
+
+    def test_downsample_keeps_ends(self, prices):
+        sparkline = encode_sparkline(prices, "full", points=24)
+
+        assert len(sparkline["price"]) == 24
+        assert sparkline["price"][0] == prices[0] and sparkline["price"][-1] == prices[-1]
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, minimum_size=100)
+
+    @app.get("/large")
+    def large():
+        return PlainTextResponse("price " * 1000)
+
+    @app.get("/small")
+    def small():
+        return PlainTextResponse("price")
+
+    @app.get("/events")
+    def events():
+        return StreamingResponse(iter(["data: 1\n\n" * 100]), media_type="text/event-stream")
+
+    return TestClient(app)
+
+
+class TestCompressionMiddleware:
+    def test_prefers_brotli(self, client):
+        res = client.get("/large", headers={"Accept-Encoding": "gzip, br"})
+
+        assert res.headers["content-encoding"] == "br"
+        assert int(res.headers["content-length"]) < 100
+        assert res.text == "price " * 1000
+        assert "accept-encoding" in res.headers["vary"].lower()
+
+    def test_falls_back_to_gzip(self, client):
+        res = client.get("/large", headers={"Accept-Encoding": "gzip, br;q=0"})
+
+        assert res.headers["content-encoding"] == "gzip"
+        assert res.text == "price " * 1000
+
+    @pytest.mark.parametrize("path", ["/small", "/events"])
+    def test_leaves_small_responses_and_streams(self, client, path):
+        res = client.get(path, headers={"Accept-Encoding": "br"})
+
+        assert "content-encoding" not in res.headers
+
+    def test_accepted_encodings(self):
+        assert accepted_encodings("gzip;q=1.0, br; q=0, Deflate") == {"gzip", "deflate"}
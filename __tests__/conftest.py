@@ -0,0 +1,32 @@
+import pytest
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class BrokenRedis:
+    def __init__(self):
+        self.calls = 0
+
+    async def take(self, *args):
+        self.calls += 1
+        raise ConnectionError("redis is down")
+
+    def take_sync(self, *args):
+        self.calls += 1
+        raise ConnectionError("redis is down")
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def broken_redis():
+    return BrokenRedis()
@@ -0,0 +1,147 @@
+import sys
+import os
+import time
+
+import pytest
+
+from unittest.mock import AsyncMock, patch
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.routes import crypto_route
+from src.helpers import statistics_helper
+from src.helpers.history_helper import HistoryStore
+from src.helpers.cache_helper import MARKET_STALE_TTL, market_cache
+from src.helpers.http_cache_helper import etag_matches, held_version, snapshot_etag
+
+
+@pytest.fixture(autouse=True)
+def clear_market_cache():
+    market_cache.clear()
+    yield
+    market_cache.clear()
+
+
+@pytest.fixture
+def coin_stats():
+    return [{
+        "name": "Bitcoin",
+        "image": "https://example.com/bitcoin.png",
+        "current_price": 45000.0,
+        "id": "bitcoin",
+        "high_24h": 46000.0,
+        "low_24h": 44000.0,
+        "price_change_percentage_24h": 1.5,
+        "price_change_percentage_7d_in_currency": -2.5
+    }]
+
+
+@pytest.fixture
+def upstream(coin_stats, tmp_path):
+    with patch("src.helpers.statistics_helper.cg") as mock_cg, \
+         patch.object(statistics_helper, "history_store", HistoryStore(str(tmp_path / "history.sqlite3"))):
+        mock_cg.get_coins_markets = AsyncMock(return_value=coin_stats)
+        mock_cg.get_coin_market_chart_by_id = AsyncMock(return_value={"prices": []})
+        yield mock_cg
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.include_router(crypto_route.router, prefix="/crypto")
+
+    return TestClient(app)
+
+
+class TestConditionalGet:
+    def test_not_modified_without_upstream_call(self, client, upstream):
+        first = client.get("/crypto/statistics/", params={"crypto": "bitcoin"})
+
+        assert first.status_code == 200
+        assert first.headers["cache-control"] == "public, max-age=10"
+        assert first.json()["statsData"][0]["high"] == 46000.0
+
+        second = client.get("/crypto/statistics/", params={"crypto": "bitcoin"}, headers={"If-None-Match": first.headers["etag"]})
+
+        assert second.status_code == 304
+        assert second.content == b""
+        assert second.headers["etag"] == first.headers["etag"]
+        assert upstream.get_coins_markets.call_count == 1
+
+    def test_changed_data_gets_new_etag(self, client, upstream, coin_stats):
+        first = client.get("/crypto/statistics/", params={"crypto": "bitcoin"})
+
+        market_cache.clear()
+        upstream.get_coins_markets.return_value = [{**coin_stats[0], "current_price": 45100.0}]
+
+        # The client's copy is older than any snapshot the cache would still serve
+        later = time.time() + market_cache.ttl + MARKET_STALE_TTL + 1
+
+        with patch("src.helpers.http_cache_helper.time.time", return_value=later):
+            second = client.get("/crypto/statistics/", params={"crypto": "bitcoin"}, headers={"If-None-Match": first.headers["etag"]})
+
+        assert second.status_code == 200
+        assert second.headers["etag"] != first.headers["etag"]
+        assert second.json()["statsData"][0]["current_price"] == 45100.0
+
+    def test_cold_cache_revalidates_without_upstream_call(self, client, upstream):
+        first = client.get("/crypto/statistics/", params={"crypto": "bitcoin"})
+
+        # Another process without the snapshot, or the entry is past its hard TTL
+        market_cache.clear()
+
+        second = client.get("/crypto/statistics/", params={"crypto": "bitcoin"}, headers={"If-None-Match": first.headers["etag"]})
+
+        assert second.status_code == 304
+        assert upstream.get_coins_markets.call_count == 1
+
+    def test_newer_snapshot_is_sent_from_the_cache(self, client, upstream, coin_stats):
+        first = client.get("/crypto/statistics/", params={"crypto": "bitcoin"})
+
+        market_cache.clear()
+        upstream.get_coins_markets.return_value = [{**coin_stats[0], "current_price": 45100.0}]
+
+        with patch("src.helpers.cache_helper.time.time", return_value=time.time() + 1):
+            client.get("/crypto/statistics/", params={"crypto": "bitcoin"})
+
+        second = client.get("/crypto/statistics/", params={"crypto": "bitcoin"}, headers={"If-None-Match": first.headers["etag"]})
+
+        assert second.status_code == 200
+        assert second.json()["statsData"][0]["current_price"] == 45100.0
+        assert upstream.get_coins_markets.call_count == 2
+
+
+class TestEtags:
+    def test_etag_depends_on_version_and_fields(self):
+        fields = {"isLoggedIn": False, "usersData": None}
+
+        assert snapshot_etag(1000, fields) == snapshot_etag(1000, dict(fields))
+        assert snapshot_etag(1000, fields) != snapshot_etag(1001, fields)
+        assert snapshot_etag(1000, fields) != snapshot_etag(1000, {**fields, "isLoggedIn": True})
+
+    def test_etag_is_weak(self):
+        # One entity is sent as identity, gzip and br bodies
+        assert snapshot_etag(1000, {}).startswith('W/"')
+
+    def test_held_version(self):
+        fields = {"isLoggedIn": False}
+        header = f'{snapshot_etag(1000, fields)}, {snapshot_etag(2000, fields)}, {snapshot_etag(3000, {"isLoggedIn": True})}'
+
+        assert held_version(header, fields) == 2000
+        assert held_version('"abc"', fields) is None
+        assert held_version(None, fields) is None
+
+    @pytest.mark.parametrize("header, expected", [
+        (None, False),
+        ('"abc"', True),
+        ('W/"abc"', True),
+        ('"other", "abc"', True),
+        ("*", True),
+        ('"abcd"', False)
+    ])
+    def test_if_none_match(self, header, expected):
+        assert etag_matches(header, '"abc"') is expected
+        assert etag_matches(header, 'W/"abc"') is expected
@@ -0,0 +1,103 @@
+import sys
+import os
+
+import socket
+
+import pytest
+
+from aiosmtpd.controller import Controller
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.helpers.mail_helper import SMTPPool
+
+
+class RecordingHandler:
+    def __init__(self):
+        self.messages = []
+        self.connections = 0
+
+    async def handle_EHLO(self, server, session, envelope, hostname, responses):
+        self.connections += 1
+        session.host_name = hostname
+        return responses
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address.startswith("bounce@"):
+            return "550 No such user"
+
+        envelope.rcpt_tos.append(address)
+        return "250 OK"
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append(envelope)
+        return "250 Message accepted for delivery"
+
+
+@pytest.fixture
+def smtp_server():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+
+    handler = RecordingHandler()
+    controller = Controller(handler, hostname="127.0.0.1", port=port)
+    controller.start()
+
+    yield handler, "127.0.0.1", port
+
+    controller.stop()
+
+
+@pytest.fixture
+def make_pool(smtp_server):
+    pools = []
+
+    def factory(size: int):
+        _, hostname, port = smtp_server
+        pool = SMTPPool(hostname=hostname, port=port, sender="tracker@mail.com", sender_name="Tracker", start_tls=False, size=size)
+        pools.append(pool)
+        return pool
+
+    yield factory
+
+    for pool in pools:
+        pool.run(pool.close())
+
+
+class TestSMTPPool:
+    def test_batch_shares_one_connection(self, smtp_server, make_pool):
+        handler, _, _ = smtp_server
+        pool = make_pool(1)
+
+        messages = [pool.build_message([f"user{i}@mail.com"], f"Alert {i}", "<p>hi</p>") for i in range(5)]
+
+        results = pool.send_batch_sync(messages)
+
+        assert all(result["sent"] for result in results)
+        assert len(handler.messages) == 5
+        assert handler.connections == 1
+
+    def test_connections_survive_between_batches(self, smtp_server, make_pool):
+        handler, _, _ = smtp_server
+        pool = make_pool(2)
+
+        for _ in range(3):
+            pool.send_batch_sync([pool.build_message(["user@mail.com"], "Alert", "<p>hi</p>") for _ in range(4)])
+
+        assert len(handler.messages) == 12
+        assert handler.connections == 2
+
+    def test_failures_are_reported_per_message(self, smtp_server, make_pool):
+        handler, _, _ = smtp_server
+        pool = make_pool(1)
+
+        results = pool.send_batch_sync([
+            pool.build_message(["user@mail.com"], "Alert", "<p>hi</p>"),
+            pool.build_message(["bounce@mail.com"], "Alert", "<p>hi</p>"),
+            pool.build_message(["other@mail.com"], "Alert", "<p>hi</p>")
+        ])
+
+        assert [result["sent"] for result in results] == [True, False, True]
+        assert "No such user" in results[1]["error"]
+        assert len(handler.messages) == 2
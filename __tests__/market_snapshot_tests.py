@@ -0,0 +1,85 @@
+import sys
+import os
+import random
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.helpers.json_helper import dumps
+from src.helpers.market_snapshot_helper import LIST_COLUMNS, MarketSnapshot, SORT_COLUMNS
+
+
+@pytest.fixture
+def market_page():
+    rng = random.Random(7)
+
+    rows = [
+        {
+            "id": f"coin-{position}",
+            "symbol": f"c{position}",
+            "image": f"https://example.com/{position}.png",
+            "current_price": round(rng.uniform(0.01, 50000), 2),
+            "market_cap": rng.randint(1, 10 ** 12),
+            "market_cap_rank": position + 1,
+            "price_change_percentage_24h": round(rng.uniform(-20, 20), 3),
+            "total_volume": rng.randint(1, 10 ** 9)
+        }
+        for position in range(100)
+    ]
+
+    rows[3]["market_cap"] = None
+    rows[10]["price_change_percentage_24h"] = None
+
+    return rows
+
+
+def pandas_select(rows, sort_by, ascending, ids, limit):
+    df = pd.DataFrame(rows)[list(LIST_COLUMNS)]
+
+    if ids:
+        df = df[df.id.isin(ids)]
+
+    return df.sort_values(by=sort_by, ascending=ascending, kind="stable").dropna().head(limit).to_dict(orient="records")
+
+
+class TestMarketSnapshot:
+    @pytest.mark.parametrize("sort_by", SORT_COLUMNS)
+    @pytest.mark.parametrize("descending", [True, False])
+    def test_matches_dataframe_path(self, market_page, sort_by, descending):
+        snapshot = MarketSnapshot(market_page)
+
+        selected = snapshot.select(sort_by=sort_by, descending=descending, limit=50)
+        expected = pandas_select(market_page, sort_by, not descending, [], 50)
+
+        assert [row["id"] for row in selected] == [row["id"] for row in expected]
+
+    def test_filters_by_ids(self, market_page):
+        snapshot = MarketSnapshot(market_page)
+
+        ids = ["coin-5", "COIN-42", "coin-3", "unknown"]
+        selected = snapshot.select(sort_by="current_price", ids=ids)
+        expected = pandas_select(market_page, "current_price", False, [coin_id.lower() for coin_id in ids], None)
+
+        assert [row["id"] for row in selected] == [row["id"] for row in expected]
+        assert "coin-3" not in [row["id"] for row in selected]
+
+    def test_names_projection(self, market_page):
+        snapshot = MarketSnapshot(market_page)
+
+        selected = snapshot.select(names=True, sort_by="market_cap", limit=3)
+
+        assert len(selected) == 3
+        assert all(set(row) == {"id", "image", "current_price"} for row in selected)
+
+    def test_serialized_rows_match_records(self, market_page):
+        snapshot = MarketSnapshot(market_page)
+
+        for names in (False, True):
+            expected = snapshot.select(names=names, sort_by="market_cap", ids=["coin-1", "coin-2", "coin-3"])
+
+            assert dumps(snapshot.select_serialized(names=names, sort_by="market_cap", ids=["coin-1", "coin-2", "coin-3"])) == dumps(expected)
+
+    def test_empty_page(self):
+        assert MarketSnapshot([]).select(limit=10) == []
@@ -0,0 +1,70 @@
+import sys
+import os
+import math
+import random
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.helpers.market_stats_helper import compute_indicators, high_low, pct_change, to_matrix, with_indicators
+
+
+@pytest.fixture
+def series():
+    rng = random.Random(3)
+
+    return [[rng.uniform(50, 150) for _ in range(rng.randint(3, 30))] for _ in range(40)]
+
+
+def percent(current, previous):
+    return (current - previous) / previous * 100
+
+
+def drawdown(prices):
+    peak, worst = prices[0], 0.0
+
+    for price in prices:
+        peak = max(peak, price)
+        worst = min(worst, (price - peak) / peak * 100)
+
+    return worst
+
+
+def deviation(prices):
+    returns = [math.log(current / previous) for previous, current in zip(prices, prices[1:])]
+    mean = sum(returns) / len(returns)
+
+    return math.sqrt(sum((value - mean) ** 2 for value in returns) / (len(returns) - 1)) * 100
+
+
+class TestMarketStats:
+    def test_matches_per_series_computation(self, series):
+        matrix = to_matrix(series)
+        highs, lows = high_low(matrix)
+
+        assert highs.tolist() == [max(prices) for prices in series]
+        assert lows.tolist() == [min(prices) for prices in series]
+        assert np.allclose(pct_change(matrix), [percent(prices[-1], prices[0]) for prices in series])
+        assert np.allclose(pct_change(matrix, 1), [percent(prices[-1], prices[-2]) for prices in series])
+
+    def test_indicators(self, series):
+        indicators = compute_indicators(series, changes=[5], averages=[3], with_volatility=True, with_drawdown=True)
+
+        for prices, values in zip(series, indicators):
+            assert values["change_5"] == (pytest.approx(percent(prices[-1], prices[-6])) if len(prices) > 5 else None)
+            assert values["sma_3"] == pytest.approx(sum(prices[-3:]) / 3)
+            assert values["volatility"] == pytest.approx(deviation(prices))
+            assert values["max_drawdown"] == pytest.approx(drawdown(prices))
+
+    def test_short_series_get_none(self):
+        indicators = compute_indicators([[10.0], [10.0, 12.0]], averages=[2], with_volatility=True)
+
+        assert indicators == [{"sma_2": None, "volatility": None}, {"sma_2": 11.0, "volatility": None}]
+
+    def test_nothing_requested(self):
+        stats = [{"sparkline_in_7d": {"price": [1.0, 2.0]}}]
+
+        assert with_indicators(stats, changes=[0]) is stats
+        assert with_indicators(stats, changes=[1])[0]["indicators"] == {"change_1": 100.0}
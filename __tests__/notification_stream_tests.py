@@ -0,0 +1,113 @@
+import sys
+import os
+import asyncio
+import contextlib
+import json
+
+import pytest
+
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.helpers import notification_stream_helper
+from src.helpers.notification_stream_helper import NotificationStream, channel_for, format_event
+
+
+async def idle(self):
+    await asyncio.Event().wait()
+
+
+@pytest.fixture
+async def stream():
+    with patch.object(NotificationStream, "run", idle):
+        stream = NotificationStream(queue_size=2)
+
+        yield stream
+
+        # Tests may leave listeners behind, the subscriber task must not outlive the event loop
+        if stream._task is not None:
+            stream._task.cancel()
+
+            with contextlib.suppress(asyncio.CancelledError):
+                await stream._task
+
+
+class FakePubSub:
+    async def psubscribe(self, pattern: str):
+        pass
+
+    async def listen(self):
+        yield {"type": "pmessage", "channel": channel_for(7), "data": json.dumps({"id": 1, "uid": 7})}
+
+        await asyncio.Event().wait()
+
+    async def aclose(self):
+        pass
+
+
+class FakeRedis:
+    def pubsub(self):
+        return FakePubSub()
+
+    async def aclose(self):
+        pass
+
+
+def parse_events(chunks):
+    return [json.loads(chunk.split("data: ", 1)[1]) for chunk in chunks if chunk.startswith("id: ")]
+
+
+class TestNotificationStream:
+    async def test_routes_messages_to_owner(self, stream):
+        mine, other = stream.listen(7), stream.listen(8)
+
+        stream.dispatch(channel_for(7), json.dumps({"id": 1, "uid": 7}))
+
+        assert mine.get_nowait() == {"id": 1, "uid": 7}
+        assert other.empty()
+
+    async def test_full_queue_drops_messages(self, stream):
+        queue = stream.listen(7)
+
+        for nid in range(1, 4):
+            stream.dispatch(channel_for(7), json.dumps({"id": nid, "uid": 7}))
+
+        assert queue.qsize() == 2
+
+    async def test_backlog_first_without_duplicates(self, stream):
+        queue = stream.listen(7)
+
+        stream.dispatch(channel_for(7), json.dumps({"id": 2, "uid": 7}))
+        stream.dispatch(channel_for(7), json.dumps({"id": 3, "uid": 7}))
+
+        events = stream.events(7, queue, [{"id": 1, "uid": 7}, {"id": 2, "uid": 7}])
+        chunks = [await events.__anext__() for _ in range(3)]
+
+        assert [event["id"] for event in parse_events(chunks)] == [1, 2, 3]
+
+        await events.aclose()
+
+        assert stream.listeners == {}
+        assert stream._task is None
+
+    def test_event_format(self):
+        assert format_event({"id": 5, "uid": 1}) == 'id: 5\nevent: notification\ndata: {"id": 5, "uid": 1}\n\n'
+
+    async def test_subscriber_retries_when_redis_is_unreachable(self):
+        import redis.asyncio as aioredis
+
+        stream = NotificationStream(url="redis://unreachable")
+
+        with patch.object(notification_stream_helper, "NOTIF_RETRY_DELAY", 0), \
+             patch.object(aioredis.Redis, "from_url", side_effect=[ConnectionError("refused"), FakeRedis()]) as from_url:
+            queue = stream.listen(7)
+            task = stream._task
+
+            assert await asyncio.wait_for(queue.get(), 1) == {"id": 1, "uid": 7}
+            assert from_url.call_count == 2
+
+            stream.unlisten(7, queue)
+
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
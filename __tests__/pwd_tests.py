@@ -0,0 +1,78 @@
+import sys
+import os
+import asyncio
+import threading
+
+import pytest
+
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.helpers import pwd_helper
+from src.helpers.pwd_helper import PasswordPool, PasswordPoolBusy, comparePwds, hash_rounds, hashPwd, needs_rehash
+
+
+@pytest.fixture(autouse=True)
+def low_cost():
+    # The lowest bcrypt cost keeps the tests fast, the behaviour does not depend on it
+    with patch.object(pwd_helper, "PWD_HASH_ROUNDS", 4):
+        yield
+
+
+class TestHashing:
+    async def test_hash_and_compare(self):
+        hashed = (await hashPwd("password123")).decode('utf-8')
+
+        assert hash_rounds(hashed) == 4
+        assert await comparePwds("password123", hashed)
+        assert not await comparePwds("password124", hashed)
+
+    async def test_needs_rehash_when_cost_changes(self):
+        hashed = (await hashPwd("password123")).decode('utf-8')
+
+        assert not needs_rehash(hashed)
+
+        with patch.object(pwd_helper, "PWD_HASH_ROUNDS", 5):
+            assert needs_rehash(hashed)
+
+    def test_malformed_hash_needs_rehash(self):
+        assert needs_rehash("not-a-hash")
+
+    async def test_event_loop_keeps_running_while_hashing(self):
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+
+            while True:
+                ticks += 1
+                await asyncio.sleep(0)
+
+        task = asyncio.create_task(ticker())
+
+        with patch.object(pwd_helper, "PWD_HASH_ROUNDS", 10):
+            await hashPwd("password123")
+
+        task.cancel()
+
+        assert ticks > 1
+
+
+class TestPasswordPool:
+    async def test_rejects_when_saturated(self):
+        release = threading.Event()
+        pool = PasswordPool(ThreadPoolExecutor(max_workers=1), workers=1, queue_limit=1)
+
+        running = [asyncio.create_task(pool.run(release.wait)) for _ in range(2)]
+        await asyncio.sleep(0)
+
+        with pytest.raises(PasswordPoolBusy):
+            await pool.run(release.wait)
+
+        release.set()
+        await asyncio.gather(*running)
+
+        assert pool.pending == 0
+        assert await pool.run(len, "slot") == 4
@@ -0,0 +1,112 @@
+import sys
+import os
+
+import jwt
+import pytest
+
+from datetime import datetime, timedelta, timezone
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.auth import auth_service
+from src.helpers.rate_limit_helper import MemoryBuckets, RateLimiter, RateLimitMiddleware, match_route, parse_limit
+
+
+@pytest.fixture
+def limiter(clock):
+    return RateLimiter(limits={"login": "2/60", "market": "3/60", "alert": "0"}, local=MemoryBuckets(clock=clock))
+
+
+@pytest.fixture
+def client(limiter):
+    app = FastAPI()
+    app.add_middleware(RateLimitMiddleware, limiter=limiter)
+
+    @app.post("/auth/login")
+    async def login():
+        return {"message": "ok"}
+
+    @app.get("/crypto/statistics/")
+    async def statistics():
+        return {"message": "ok"}
+
+    @app.get("/health")
+    async def health():
+        return {"message": "ok"}
+
+    return TestClient(app)
+
+
+class TestTokenBucket:
+    def test_parse_limit(self):
+        assert parse_limit("5/60") == (5 / 60, 5.0)
+        assert parse_limit("0") is None
+        assert parse_limit("") is None
+
+    async def test_burst_then_refill(self, limiter, clock):
+        assert (await limiter.hit("login", "ip:1"))[0]
+        assert (await limiter.hit("login", "ip:1"))[0]
+
+        allowed, wait = await limiter.hit("login", "ip:1")
+
+        assert not allowed
+        assert wait == pytest.approx(30)
+
+        clock.now += 30
+
+        assert (await limiter.hit("login", "ip:1"))[0]
+
+    async def test_clients_have_separate_buckets(self, limiter):
+        for _ in range(2):
+            await limiter.hit("login", "ip:1")
+
+        assert not (await limiter.hit("login", "ip:1"))[0]
+        assert (await limiter.hit("login", "ip:2"))[0]
+
+    async def test_disabled_limit(self, limiter):
+        assert all([(await limiter.hit("alert", "ip:1"))[0] for _ in range(50)])
+
+    async def test_falls_back_to_memory_when_redis_fails(self, clock, broken_redis):
+        limiter = RateLimiter(limits={"login": "1/60"}, remote=broken_redis, local=MemoryBuckets(clock=clock))
+
+        assert (await limiter.hit("login", "ip:1"))[0]
+        assert not (await limiter.hit("login", "ip:1"))[0]
+
+        # Redis is not asked again until the retry delay passed
+        assert broken_redis.calls == 1
+
+
+class TestMiddleware:
+    def test_routes(self):
+        assert match_route("POST", "/auth/login") == ("login", False)
+        assert match_route("GET", "/auth/login") is None
+        assert match_route("GET", "/stock/statistics/") == ("market", True)
+        assert match_route("GET", "/notifications/1") is None
+
+    def test_too_many_requests(self, client):
+        assert [client.post("/auth/login").status_code for _ in range(3)] == [200, 200, 429]
+
+        res = client.post("/auth/login")
+
+        assert res.json() == {"detail": "Too many requests, try again later"}
+        assert res.headers["retry-after"] == "30"
+
+    def test_unlisted_route_is_not_limited(self, client):
+        assert all(client.get("/health").status_code == 200 for _ in range(10))
+
+    def test_logged_in_users_are_counted_per_user(self, client, monkeypatch):
+        monkeypatch.setenv("ACCESS_TOKEN_SECRET", "access-secret")
+        monkeypatch.setenv("JWT_ALGORITHM", "HS256")
+        auth_service.claims_cache.clear()
+
+        def token(uid):
+            return jwt.encode({"uid": uid, "exp": datetime.now(timezone.utc) + timedelta(minutes=15)}, "access-secret", algorithm="HS256")
+
+        client.cookies.set("access_token", token(1))
+        assert [client.get("/crypto/statistics/").status_code for _ in range(4)] == [200, 200, 200, 429]
+
+        client.cookies.set("access_token", token(2))
+        assert client.get("/crypto/statistics/").status_code == 200
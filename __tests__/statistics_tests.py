@@ -0,0 +1,213 @@
+import sys
+import os
+import threading
+import time
+
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from unittest.mock import AsyncMock, MagicMock, patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.helpers import statistics_helper
+from src.helpers.cache_helper import market_cache
+from src.helpers.history_helper import HOUR, HistoryStore
+from src.helpers.statistics_helper import get_coin_stats, get_stock_stats
+
+
+class FixedDate(date):
+    @classmethod
+    def today(cls):
+        return cls(2025, 3, 12)
+
+
+def make_history(tickers, days: int = 15, start: str = "2025-02-24"):
+    index = pd.bdate_range(start, periods=days)
+    frames = {
+        ticker: pd.DataFrame({"Close": 100.0 + position + np.arange(days, dtype=float), "Volume": 1000.0}, index=index)
+        for position, ticker in enumerate(tickers)
+    }
+
+    return pd.concat(frames, axis=1)
+
+
+@pytest.fixture(autouse=True)
+def clear_market_cache():
+    market_cache.clear()
+    yield
+    market_cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def history(tmp_path):
+    store = HistoryStore(str(tmp_path / "history.sqlite3"))
+
+    with patch.object(statistics_helper, "history_store", store), patch.object(statistics_helper, "date", FixedDate):
+        yield store
+
+
+@pytest.fixture
+def empty_store():
+    with patch.object(statistics_helper.ticker_store, "get", return_value={}):
+        yield
+
+
+class TestStockStats:
+    async def test_one_download_for_all_tickers(self, empty_store):
+        download = MagicMock(side_effect=lambda tickers, **kwargs: make_history(tickers, days=14))
+
+        with patch("yfinance.download", download), \
+             patch.object(statistics_helper, "get_ticker_info", return_value={"website": "example.com"}):
+            stats = await get_stock_stats(["msft", "AAPL", "MSFT"])
+
+        assert download.call_count == 1
+        assert download.call_args.kwargs["tickers"] == ["AAPL", "MSFT"]
+
+        assert [item["name"] for item in stats] == ["MSFT", "AAPL", "MSFT"]
+        assert stats[1]["current_price"] == 113.0 and stats[1]["low"] == 100.0
+        assert stats[0]["image"] == "https://logo.clearbit.com/example.com"
+
+    async def test_metadata_lookups_are_bounded(self, empty_store):
+        tickers = [f"T{i}" for i in range(12)]
+        running, peak = [0], [0]
+        lock = threading.Lock()
+
+        def slow_info(ticker):
+            with lock:
+                running[0] += 1
+                peak[0] = max(peak[0], running[0])
+
+            time.sleep(0.05)
+
+            with lock:
+                running[0] -= 1
+
+            return {}
+
+        with patch("yfinance.download", side_effect=lambda tickers, **kwargs: make_history(tickers, days=14)), \
+             patch.object(statistics_helper, "get_ticker_info", side_effect=slow_info), \
+             patch.object(statistics_helper, "STATS_META_CONCURRENCY", 4):
+            started = time.perf_counter()
+            await get_stock_stats(tickers)
+            elapsed = time.perf_counter() - started
+
+        assert peak[0] == 4
+        assert elapsed < 12 * 0.05
+
+    async def test_unknown_ticker_fails(self, empty_store):
+        with patch("yfinance.download", side_effect=lambda tickers, **kwargs: make_history(["AAPL"], days=14)), \
+             patch.object(statistics_helper, "get_ticker_info", return_value={}):
+            with pytest.raises(ValueError):
+                await get_stock_stats(["AAPL", "FMDSK"])
+
+    async def test_only_missing_days_are_downloaded(self, empty_store, history):
+        # 2025-02-24 .. 2025-03-12, the last bar (today) is still open
+        download = MagicMock(side_effect=lambda tickers, start, **kwargs: make_history(tickers, days=13).loc[start:])
+
+        with patch("yfinance.download", download), patch.object(statistics_helper, "get_ticker_info", return_value={}):
+            first = await get_stock_stats(["AAPL"])
+            market_cache.clear()
+            second = await get_stock_stats(["AAPL"])
+
+        # The second download starts at the last stored close to check it against the store
+        assert [call.kwargs["start"] for call in download.call_args_list] == ["2025-02-19", "2025-03-11"]
+        assert first == second
+        assert len(history.read("stock", ["AAPL"], 0)["AAPL"]) == 12
+
+    async def test_split_rewrites_stored_history(self, empty_store, history):
+        history.append("stock", [
+            (ticker, statistics_helper.day_ts(index.date()), float(close))
+            for ticker in ("AAPL", "MSFT")
+            for index, close in make_history(["AAPL", "MSFT"], days=11)[ticker]["Close"].items()
+        ])
+
+        def split_aapl(tickers, start, **kwargs):
+            df = make_history(tickers, days=13)
+
+            if "AAPL" in tickers:
+                df[("AAPL", "Close")] /= 2
+
+            return df.loc[start:]
+
+        download = MagicMock(side_effect=split_aapl)
+
+        with patch("yfinance.download", download), patch.object(statistics_helper, "get_ticker_info", return_value={}):
+            stats = await get_stock_stats(["AAPL", "MSFT"])
+
+        assert [(call.kwargs["tickers"], call.kwargs["start"]) for call in download.call_args_list] == [
+            (["AAPL", "MSFT"], "2025-03-10"),
+            (["AAPL"], "2025-02-19")
+        ]
+
+        assert stats[0]["sparkline_in_7d"]["price"] == [(100.0 + day) / 2 for day in range(13)]
+        assert [close for _, close in history.read("stock", ["AAPL"], 0)["AAPL"]] == [(100.0 + day) / 2 for day in range(12)]
+        assert len(history.read("stock", ["MSFT"], 0)["MSFT"]) == 12
+
+
+class TestCoinSparkline:
+    async def test_history_is_fetched_once(self):
+        now = int(time.time())
+        chart = {"prices": [[(now - hours * HOUR) * 1000, 100.0 + hours] for hours in range(7 * 24, 0, -1)]}
+        markets = [{"id": "bitcoin", "current_price": 99.0}]
+
+        with patch.object(statistics_helper, "cg") as mock_cg:
+            mock_cg.get_coins_markets = AsyncMock(return_value=markets)
+            mock_cg.get_coin_market_chart_by_id = AsyncMock(return_value=chart)
+            mock_cg.get_coin_market_chart_range_by_id = AsyncMock()
+
+            first = await get_coin_stats("bitcoin")
+            market_cache.clear()
+            second = await get_coin_stats("bitcoin")
+
+        assert mock_cg.get_coin_market_chart_by_id.await_count == 1
+        assert mock_cg.get_coin_market_chart_range_by_id.await_count == 0
+
+        prices = first[0]["sparkline_in_7d"]["price"]
+
+        assert second == first
+        assert prices[-1] == 99.0 and prices[-2] == 101.0
+        assert len(prices) in (168, 169)
+
+    async def test_only_the_tail_is_fetched(self, history):
+        current_hour = int(time.time()) // HOUR * HOUR
+        history.append("crypto", [("bitcoin", current_hour - hours * HOUR, 100.0) for hours in range(24, 4, -1)])
+
+        tail = {"prices": [[(current_hour - hours * HOUR + 300) * 1000, 200.0] for hours in range(4, 0, -1)]}
+
+        with patch.object(statistics_helper, "cg") as mock_cg:
+            mock_cg.get_coins_markets = AsyncMock(return_value=[{"id": "bitcoin", "current_price": 201.0}])
+            mock_cg.get_coin_market_chart_range_by_id = AsyncMock(return_value=tail)
+
+            stats = await get_coin_stats("bitcoin")
+
+        assert mock_cg.get_coin_market_chart_range_by_id.await_args.kwargs["from_timestamp"] == current_hour - 4 * HOUR
+        assert stats[0]["sparkline_in_7d"]["price"] == [100.0] * 20 + [200.0] * 4 + [201.0]
+
+    async def test_fetched_at_most_once_an_hour(self, history):
+        current_hour = int(time.time()) // HOUR * HOUR
+        history.append("crypto", [("bitcoin", current_hour - hours * HOUR, 100.0) for hours in range(24, 4, -1)])
+
+        with patch.object(statistics_helper, "cg") as mock_cg:
+            mock_cg.get_coins_markets = AsyncMock(return_value=[{"id": "bitcoin", "current_price": 201.0}])
+            # Upstream has no point for the missing hours yet
+            mock_cg.get_coin_market_chart_range_by_id = AsyncMock(return_value={"prices": []})
+
+            first = await get_coin_stats("bitcoin")
+            market_cache.clear()
+            second = await get_coin_stats("bitcoin")
+
+            assert mock_cg.get_coin_market_chart_range_by_id.await_count == 1
+
+            # A fetch in the previous hour does not hold back the next one
+            history.record_fetch("crypto", "bitcoin", current_hour - 1)
+            market_cache.clear()
+            await get_coin_stats("bitcoin")
+
+            assert mock_cg.get_coin_market_chart_range_by_id.await_count == 2
+
+        assert first == second
+        assert first[0]["sparkline_in_7d"]["price"] == [100.0] * 20 + [201.0]
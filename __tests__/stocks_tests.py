@@ -10,11 +10,18 @@ from fastapi.testclient import TestClient
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
 from src.main import app
+from src.helpers.cache_helper import market_cache
 
 @pytest.fixture
 def client():
     return TestClient(app)
 
+@pytest.fixture(autouse=True)
+def clear_market_cache():
+    market_cache.clear()
+    yield
+    market_cache.clear()
+
 @pytest.fixture
 def mock_auth_success():
     with patch('src.auth.auth_service.check_tokens') as mock_check_tokens, \
@@ -0,0 +1,56 @@
+import sys
+import os
+
+import pytest
+
+from unittest.mock import MagicMock
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.helpers.ticker_meta_helper import TickerMetadataStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return TickerMetadataStore(str(tmp_path / "meta" / "tickers.json"))
+
+
+@pytest.fixture
+def mock_infos():
+    return {
+        "AAPL": {"shortName": "Apple Inc.", "website": "https://www.apple.com", "marketCap": 3000000000000},
+        "MSFT": {"longName": "Microsoft Corporation", "website": "https://www.microsoft.com", "marketCap": 2900000000000}
+    }
+
+
+class TestTickerMetadataStore:
+    def test_refresh_persists_metadata(self, store, mock_infos):
+        fetch_info = MagicMock(side_effect=lambda ticker: mock_infos[ticker])
+
+        assert store.is_empty()
+        assert store.refresh(["AAPL", "MSFT"], fetch_info) == 2
+
+        reopened = TickerMetadataStore(store.path)
+
+        assert reopened.get("aapl")["market_cap"] == 3000000000000
+        assert reopened.get("MSFT")["name"] == "Microsoft Corporation"
+        assert reopened.logo_url("AAPL") == "https://logo.clearbit.com/https://www.apple.com"
+
+    def test_failed_tickers_keep_previous_entry(self, store, mock_infos):
+        store.refresh(["AAPL"], lambda ticker: mock_infos[ticker])
+        store.refresh(["AAPL", "MSFT"], MagicMock(side_effect=Exception("Too Many Requests")))
+
+        assert store.get("AAPL")["name"] == "Apple Inc."
+        assert store.get("MSFT") == {}
+
+    def test_unknown_ticker_falls_back_to_symbol(self, store):
+        assert store.logo_url("NVDA") == "https://logo.clearbit.com/nvda"
+
+    def test_reader_sees_writes_of_other_process(self, store, mock_infos):
+        reader = TickerMetadataStore(store.path)
+
+        assert reader.is_empty()
+
+        store.refresh(["MSFT"], lambda ticker: mock_infos[ticker])
+
+        assert reader.get("MSFT")["market_cap"] == 2900000000000
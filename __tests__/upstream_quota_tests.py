@@ -0,0 +1,111 @@
+import sys
+import os
+
+import httpx
+import pytest
+
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.helpers import upstream_quota_helper
+from src.helpers.rate_limit_helper import MemoryBuckets
+from src.helpers.upstream_helper import AsyncCoinGeckoAPI, CoinGeckoAPI
+from src.helpers.upstream_quota_helper import BACKGROUND, INTERACTIVE, QuotaExceeded, UpstreamQuota
+
+
+@pytest.fixture
+def quota(clock):
+    # 6 calls per minute: one token every 10s, the last 2 kept for interactive calls
+    return UpstreamQuota("coingecko", per_minute=6, reserve=2, local=MemoryBuckets(clock=clock))
+
+
+@pytest.fixture
+def no_waiting():
+    with patch.dict(upstream_quota_helper.GECKO_MAX_WAIT, {INTERACTIVE: 0, BACKGROUND: 0}):
+        yield
+
+
+@pytest.fixture
+def fast_retries():
+    with patch.object(upstream_quota_helper, "GECKO_RETRY_BASE", 0.001):
+        yield
+
+
+class TestUpstreamQuota:
+    def test_background_calls_leave_the_reserve(self, quota, no_waiting):
+        for _ in range(4):
+            quota.acquire_sync(BACKGROUND)
+
+        with pytest.raises(QuotaExceeded):
+            quota.acquire_sync(BACKGROUND)
+
+        quota.acquire_sync(INTERACTIVE)
+        quota.acquire_sync(INTERACTIVE)
+
+        with pytest.raises(QuotaExceeded):
+            quota.acquire_sync(INTERACTIVE)
+
+        metrics = quota.metrics()
+
+        assert metrics["granted"] == {INTERACTIVE: 2, BACKGROUND: 4}
+        assert metrics["rejected"] == {INTERACTIVE: 1, BACKGROUND: 1}
+        assert metrics["remaining"] == 0
+
+    async def test_waits_for_the_next_token(self, clock):
+        quota = UpstreamQuota("coingecko", per_minute=60, reserve=0, local=MemoryBuckets(clock=clock))
+
+        for _ in range(60):
+            await quota.acquire(INTERACTIVE)
+
+        async def sleep(seconds):
+            clock.now += seconds
+
+        with patch("src.helpers.upstream_quota_helper.asyncio.sleep", sleep):
+            await quota.acquire(INTERACTIVE)
+
+        assert clock.now == pytest.approx(1001)
+        assert quota.metrics()["waited"][INTERACTIVE] == 1
+
+    def test_falls_back_to_local_budget_without_redis(self, clock, no_waiting, broken_redis):
+        quota = UpstreamQuota("coingecko", per_minute=2, reserve=0, remote=broken_redis, local=MemoryBuckets(clock=clock))
+
+        quota.acquire_sync(INTERACTIVE)
+        quota.acquire_sync(INTERACTIVE)
+
+        with pytest.raises(QuotaExceeded):
+            quota.acquire_sync(INTERACTIVE)
+
+
+class TestRateLimitedResponses:
+    async def test_429_is_retried_within_the_budget(self, quota, fast_retries):
+        responses = iter([httpx.Response(429), httpx.Response(200, json={"bitcoin": {"usd": 45000}})])
+        cg = AsyncCoinGeckoAPI(transport=httpx.MockTransport(lambda request: next(responses)), quota=quota, max_retries=3)
+
+        assert await cg.get_price(ids="bitcoin", vs_currencies="usd") == {"bitcoin": {"usd": 45000}}
+
+        metrics = quota.metrics()
+
+        assert metrics["rate_limited"] == 1
+        assert metrics["granted"][INTERACTIVE] == 2
+
+    async def test_retry_after_beyond_max_wait_fails(self, quota, fast_retries):
+        cg = AsyncCoinGeckoAPI(transport=httpx.MockTransport(lambda request: httpx.Response(429, headers={"Retry-After": "60"})), quota=quota, max_retries=3)
+
+        with pytest.raises(httpx.HTTPStatusError):
+            await cg.get_price(ids="bitcoin", vs_currencies="usd")
+
+        assert quota.metrics()["granted"][INTERACTIVE] == 1
+
+    def test_blocking_client_uses_background_budget(self, quota, fast_retries):
+        requests = []
+
+        def upstream(request: httpx.Request):
+            requests.append(request)
+            return httpx.Response(429) if len(requests) == 1 else httpx.Response(200, json={})
+
+        cg = CoinGeckoAPI(api_key="demo-key", transport=httpx.MockTransport(upstream), quota=quota, max_retries=1)
+
+        assert cg.get_price(ids="bitcoin,ethereum", vs_currencies="usd") == {}
+        assert requests[0].headers["x-cg-demo-api-key"] == "demo-key"
+        assert quota.metrics()["granted"] == {INTERACTIVE: 0, BACKGROUND: 2}
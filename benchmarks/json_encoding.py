@@ -0,0 +1,75 @@
+"""Microbenchmark of the response encoding of a 250-coin payload with 7 day sparklines (168 floats each).
+
+"fastapi default" is the path of a returned dict: jsonable_encoder followed by JSONResponse
+(stdlib json). "orjson" renders the same dict with FastJSONResponse, "pre-serialized" embeds
+the cached coin rows as a fragment, so only the per-request fields are encoded.
+
+    python -m benchmarks.json_encoding
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+
+from src.helpers.json_helper import FastJSONResponse, serialized  # noqa: E402
+
+COINS = 250
+SPARKLINE_POINTS = 168
+ROUNDS = 200
+
+
+def build_payload():
+    rng = random.Random(1)
+
+    return [
+        {
+            "name": f"Coin {i}",
+            "image": f"https://example.com/{i}.png",
+            "current_price": rng.uniform(0.01, 50000),
+            "high": rng.uniform(0.01, 50000),
+            "low": rng.uniform(0.01, 50000),
+            "sparkline_in_7d": {"price": [rng.uniform(0.01, 50000) for _ in range(SPARKLINE_POINTS)]},
+            "price_change_percentage_7d_in_currency": rng.uniform(-20, 20),
+            "price_change_percentage_24h": rng.uniform(-20, 20)
+        }
+        for i in range(COINS)
+    ]
+
+
+def measure(render):
+    render()
+
+    started = time.perf_counter()
+
+    for _ in range(ROUNDS):
+        body = render()
+
+    return (time.perf_counter() - started) / ROUNDS, len(body)
+
+
+def main():
+    stats = build_payload()
+    users_data = {"uid": 1, "username": "user", "role": "user", "pfp": ""}
+    cached = serialized(stats)
+
+    results = {
+        "fastapi default": measure(lambda: JSONResponse(jsonable_encoder({"statsData": stats, "isLoggedIn": True, "usersData": users_data})).body),
+        "orjson": measure(lambda: FastJSONResponse({"statsData": stats, "isLoggedIn": True, "usersData": users_data}).body),
+        "pre-serialized": measure(lambda: FastJSONResponse({"statsData": cached, "isLoggedIn": True, "usersData": users_data}).body)
+    }
+
+    baseline = results["fastapi default"][0]
+
+    print(f"{COINS} coins x {SPARKLINE_POINTS} sparkline points, {ROUNDS} rounds")
+
+    for name, (elapsed, size) in results.items():
+        print(f"{name:<16} {elapsed * 1000:8.3f}ms per response  {baseline / elapsed:7.1f}x  ({size / 1024:.0f} KiB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""Load test for /auth/login with 200 simultaneous logins of verified users.
+
+"inline" emulates the former helpers, which ran bcrypt on the event loop, "pool" uses the
+bounded password pool. While the logins run, a probe requests a trivial endpoint every 10ms;
+its worst latency shows how long the event loop was stalled for every other request. Logins
+rejected by the queue limit are counted as 503. Every login holds a database connection while
+it waits for its password check, so the database pool caps the logins in flight as well.
+
+The users live in a scratch SQLite database. The cost factor defaults to 10 here so the inline
+run stays short, set PWD_HASH_ROUNDS to measure another one.
+
+    python -m benchmarks.login_load
+"""
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+os.environ.setdefault("DB_CONN_LINE", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'login_bench.sqlite3')}")
+os.environ.setdefault("PWD_HASH_ROUNDS", "10")
+
+import bcrypt  # noqa: E402
+import httpx  # noqa: E402
+
+from unittest.mock import patch  # noqa: E402
+
+from fastapi import FastAPI  # noqa: E402
+from sqlalchemy import delete, insert  # noqa: E402
+
+from src.database.db import async_db, db  # noqa: E402
+from src.models.models import User  # noqa: E402
+from src.routes import auth_route  # noqa: E402
+from src.helpers import pwd_helper  # noqa: E402
+
+LOGINS = int(os.getenv("BENCH_LOGINS", 200))
+PASSWORD = "password123"
+PROBE_INTERVAL = 0.01
+
+
+def seed():
+    hashed = bcrypt.hashpw(PASSWORD.encode('utf-8'), bcrypt.gensalt(pwd_helper.PWD_HASH_ROUNDS)).decode('utf-8')
+
+    with db.begin() as conn:
+        conn.execute(delete(User))
+        conn.execute(insert(User), [
+            {"id": uid, "username": f"user{uid}", "email": f"user{uid}@mail.com", "password": hashed, "country": "pl", "pfp": "", "verified": True, "role": "user", "premium": False}
+            for uid in range(1, LOGINS + 1)
+        ])
+
+
+def create_app():
+    app = FastAPI()
+    app.include_router(auth_route.router, prefix="/auth")
+
+    @app.get("/ping")
+    async def ping():
+        return "pong"
+
+    return app
+
+
+async def run_inline(fn, *args):
+    return fn(*args)
+
+
+async def run(app: FastAPI):
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        done = asyncio.Event()
+        probes = []
+
+        async def login(uid: int):
+            started = time.perf_counter()
+            res = await client.post("/auth/login", json={"email": f"user{uid}@mail.com", "password": PASSWORD})
+
+            return res.status_code, time.perf_counter() - started
+
+        async def probe():
+            while not done.is_set():
+                started = time.perf_counter()
+                await client.get("/ping")
+                await asyncio.sleep(PROBE_INTERVAL)
+
+                # Anything beyond the interval is time the event loop was busy with something else
+                probes.append(time.perf_counter() - started - PROBE_INTERVAL)
+
+        prober = asyncio.create_task(probe())
+        started = time.perf_counter()
+
+        results = await asyncio.gather(*(login(uid) for uid in range(1, LOGINS + 1)))
+
+        elapsed = time.perf_counter() - started
+        done.set()
+        await prober
+
+    return elapsed, results, probes
+
+
+def report(name: str, elapsed: float, results, probes):
+    ok = [latency for status, latency in results if status == 200]
+    busy = sum(1 for status, _ in results if status == 503)
+    other = len(results) - len(ok) - busy
+
+    print(
+        f"{name:<7} {elapsed:6.2f}s total  200: {len(ok):3}  503: {busy:3}  other: {other}  "
+        f"login p50 {statistics.median(ok) * 1000:7.0f}ms  "
+        f"probe delay p50 {statistics.median(probes) * 1000:5.0f}ms max {max(probes) * 1000:5.0f}ms ({len(probes)} probes)"
+    )
+
+
+async def compare():
+    app = create_app()
+
+    # One event loop for both runs, the async engine pool is bound to it
+    with patch.object(pwd_helper.pwd_pool, "run", run_inline):
+        report("inline", *await run(app))
+
+    report("pool", *await run(app))
+
+    # aiosqlite connections run on non-daemon threads, the process only exits once they are closed
+    await async_db.dispose()
+
+
+def main():
+    seed()
+
+    print(f"{LOGINS} logins, bcrypt cost {pwd_helper.PWD_HASH_ROUNDS}, {pwd_helper.PWD_WORKERS} workers, queue limit {pwd_helper.PWD_QUEUE_LIMIT}")
+
+    asyncio.run(compare())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""Benchmark of the statistics computation for 500 symbols.
+
+"per-ticker loop" is the former get_stock_stats computation (Python lists, max, min and the
+percentage helper per ticker), "vectorized" computes the same values for all symbols with
+market_stats_helper, once including the conversion of the lists into a matrix and once on a
+prepared matrix. The indicator lines compute two changes, two moving averages, volatility and
+drawdown, per ticker in Python and vectorized. Everything runs on 15 daily closes (the 21 day
+window) and on 168 hourly prices (a coin sparkline).
+
+    python -m benchmarks.market_stats
+"""
+import math
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.helpers.market_stats_helper import compute_indicators, high_low, pct_change, to_matrix  # noqa: E402
+
+SYMBOLS = 500
+ROUNDS = 50
+
+
+def get_stock_price_change(curr_price, oldest_price):
+    if oldest_price == 0:
+        return 0
+    percentage = ((curr_price - oldest_price) / oldest_price) * 100
+    return percentage
+
+
+def per_ticker_loop(series):
+    res = []
+
+    for closes in series:
+        closes = list(closes)
+
+        res.append({
+            'current_price': closes[-1],
+            'high': max(closes),
+            'low': min(closes),
+            'price_change_percentage_7d_in_currency': get_stock_price_change(closes[-1], closes[0]),
+            'price_change_percentage_24h': get_stock_price_change(closes[-1], closes[-2])
+        })
+
+    return res
+
+
+def per_ticker_indicators(series):
+    res = []
+
+    for closes in series:
+        returns = [math.log(current / previous) for previous, current in zip(closes, closes[1:])]
+        mean = sum(returns) / len(returns)
+
+        peak, drawdown = closes[0], 0.0
+
+        for price in closes:
+            peak = max(peak, price)
+            drawdown = min(drawdown, (price - peak) / peak * 100)
+
+        res.append({
+            'change_1': get_stock_price_change(closes[-1], closes[-2]),
+            'change_5': get_stock_price_change(closes[-1], closes[-6]),
+            'sma_5': sum(closes[-5:]) / 5,
+            'sma_10': sum(closes[-10:]) / 10,
+            'volatility': math.sqrt(sum((value - mean) ** 2 for value in returns) / (len(returns) - 1)) * 100,
+            'max_drawdown': drawdown
+        })
+
+    return res
+
+
+def vectorized(series):
+    return reductions(to_matrix(series))
+
+
+def reductions(matrix):
+    highs, lows = high_low(matrix)
+
+    return matrix[:, -1], highs, lows, pct_change(matrix), pct_change(matrix, 1)
+
+
+def measure(fn, series):
+    fn(series)
+
+    started = time.perf_counter()
+
+    for _ in range(ROUNDS):
+        fn(series)
+
+    return (time.perf_counter() - started) / ROUNDS
+
+
+def main():
+    rng = random.Random(1)
+
+    for length in (15, 168):
+        series = [[rng.uniform(1, 1000) for _ in range(length)] for _ in range(SYMBOLS)]
+
+        loop = measure(per_ticker_loop, series)
+        fast = measure(vectorized, series)
+        prepared = measure(reductions, to_matrix(series))
+
+        loop_indicators = measure(per_ticker_indicators, series)
+        fast_indicators = measure(lambda data: compute_indicators(data, changes=[1, 5], averages=[5, 10], with_volatility=True, with_drawdown=True), series)
+
+        print(f"{SYMBOLS} symbols x {length} prices")
+        print(f"  per-ticker loop                {loop * 1000:7.3f}ms")
+        print(f"  vectorized                     {fast * 1000:7.3f}ms  {loop / fast:5.1f}x")
+        print(f"  vectorized, prepared matrix    {prepared * 1000:7.3f}ms  {loop / prepared:5.1f}x")
+        print(f"  per-ticker indicators          {loop_indicators * 1000:7.3f}ms")
+        print(f"  vectorized indicators          {fast_indicators * 1000:7.3f}ms  {loop_indicators / fast_indicators:5.1f}x")
+
+
+if __name__ == "__main__":
+    main()
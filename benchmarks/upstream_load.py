@@ -0,0 +1,98 @@
+"""Load test for the crypto list endpoint with 50 concurrent clients against a mocked CoinGecko.
+
+The upstream answers after UPSTREAM_LATENCY seconds. "blocking" emulates the old synchronous
+pycoingecko call made on the event loop, "async" uses the httpx based client.
+
+    python -m benchmarks.upstream_load
+"""
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+os.environ.setdefault("DB_CONN_LINE", "sqlite://")
+
+import httpx  # noqa: E402
+
+from unittest.mock import patch  # noqa: E402
+
+from fastapi import FastAPI  # noqa: E402
+
+from src.routes import crypto_route  # noqa: E402
+from src.helpers.cache_helper import market_cache  # noqa: E402
+from src.helpers.upstream_helper import AsyncCoinGeckoAPI  # noqa: E402
+
+CLIENTS = 50
+UPSTREAM_LATENCY = 0.2
+
+COINS = [
+    {
+        "id": f"coin-{i}",
+        "symbol": f"c{i}",
+        "image": f"https://example.com/{i}.png",
+        "current_price": 100.0 + i,
+        "market_cap": 1000000 * i,
+        "market_cap_rank": i,
+        "price_change_percentage_24h": 1.5
+    }
+    for i in range(1, 101)
+]
+
+
+async def mocked_upstream(request: httpx.Request):
+    await asyncio.sleep(UPSTREAM_LATENCY)
+
+    return httpx.Response(200, json=COINS)
+
+
+class BlockingCoinGecko:
+    async def get_coins_markets(self, vs_currency: str, **kwargs):
+        time.sleep(UPSTREAM_LATENCY)
+
+        return COINS
+
+
+def create_app():
+    app = FastAPI()
+    app.include_router(crypto_route.router, prefix="/crypto")
+
+    return app
+
+
+async def run(app: FastAPI):
+    market_cache.clear()
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        started = time.perf_counter()
+
+        # Every client asks for another page, so none of the requests is answered from the cache
+        responses = await asyncio.gather(*(
+            client.post("/crypto/crypto-list", json={"limit": 50}, params={"page": page})
+            for page in range(1, CLIENTS + 1)
+        ))
+
+        elapsed = time.perf_counter() - started
+
+    assert all(res.status_code == 200 for res in responses)
+
+    return elapsed
+
+
+def main():
+    app = create_app()
+
+    with patch.object(crypto_route, "cg", BlockingCoinGecko()):
+        blocking = asyncio.run(run(app))
+
+    with patch.object(crypto_route, "cg", AsyncCoinGeckoAPI(transport=httpx.MockTransport(mocked_upstream))):
+        non_blocking = asyncio.run(run(app))
+
+    print(f"{CLIENTS} concurrent clients, upstream latency {UPSTREAM_LATENCY * 1000:.0f}ms")
+    print(f"blocking: {blocking:.2f}s, {CLIENTS / blocking:.1f} req/s")
+    print(f"async:    {non_blocking:.2f}s, {CLIENTS / non_blocking:.1f} req/s")
+
+
+if __name__ == "__main__":
+    main()
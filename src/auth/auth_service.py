@@ -1,18 +1,29 @@
+import hashlib
 import jwt
 import os
+import time
 import dotenv
-from datetime import datetime, timedelta
-from fastapi import HTTPException, Response
-from src.database.db import session
-from sqlalchemy.orm import Session
+from datetime import datetime, timedelta, timezone
+from fastapi import HTTPException, Request, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional
 
 from src.schemas.request_types import UserType
 
 from src.models.models import User
+from src.helpers.cache_helper import LRUCache, MISS
 
 dotenv.load_dotenv()
 
+ACCESS_TOKEN_LIFETIME = timedelta(minutes=15)
+# The access token cookie is only re-issued when the current one expires within this many seconds
+ACCESS_TOKEN_RENEW_BEFORE = int(os.getenv("ACCESS_TOKEN_RENEW_BEFORE", 5 * 60))
+# Verified claims kept per token, bounded so a flood of distinct tokens cannot grow the process
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", 4096))
+
+claims_cache = LRUCache(AUTH_CACHE_SIZE)
+
 
 async def create_token(
         payload: dict,
@@ -20,13 +31,13 @@ async def create_token(
         secret: str
 ):
     payload_copy = payload.copy()
-    payload_copy["exp"] = datetime.now() + exp
+    payload_copy["exp"] = datetime.now(timezone.utc) + exp
 
     return jwt.encode(payload_copy, secret, algorithm="HS256")
 
 
-async def user_exists(session: Session, email: str) -> bool:
-    user = session.query(User).filter(User.email == email).first()
+async def user_exists(session: AsyncSession, email: str) -> bool:
+    user = (await session.execute(select(User.id).where(User.email == email))).first()
 
     return True if user else False
 
@@ -42,23 +53,23 @@ async def check_user_payload(data: UserType):
         raise HTTPException(status_code=400, detail="Invalid user data")
 
 
-async def register_user(user_data: UserType):
+async def register_user(session: AsyncSession, user_data: UserType):
     try:
         new_user = (User(**user_data.model_dump()))
 
         session.add(new_user)
-        session.commit()
+        await session.commit()
 
-        session.refresh(new_user)
+        await session.refresh(new_user)
     except BaseException:
-        session.rollback()
+        await session.rollback()
         raise HTTPException(status_code=500, detail="Database error")
 
 
-async def get_user_by_id(uid: str):
+async def get_user_by_id(session: AsyncSession, uid: str):
     uid = int(uid)
 
-    result = session.query(User.id, User.email, User.username, User.country, User.role).filter(User.id == uid).first()
+    result = (await session.execute(select(User.id, User.email, User.username, User.country, User.role).where(User.id == uid))).first()
 
     return {
         "id": result[0],
@@ -69,12 +80,31 @@ async def get_user_by_id(uid: str):
     }
 
 
+"""Verifying a token once and keeping its claims, keyed by a digest of the token, until it expires"""
+
+
+def decode_cached(kind: str, token: str, secret: Optional[str]) -> dict:
+    key = f"{kind}:{hashlib.sha256(token.encode('utf-8')).hexdigest()}"
+
+    claims = claims_cache.get(key)
+
+    if claims is not MISS:
+        return claims
+
+    claims = jwt.decode(token, secret, algorithms=[os.getenv("JWT_ALGORITHM")])
+
+    if "exp" in claims:
+        claims_cache.set(key, claims, claims["exp"] - time.time())
+
+    return claims
+
+
 def verify_access_token(access_token: str):
-    return jwt.decode(access_token, os.getenv("ACCESS_TOKEN_SECRET"), algorithms=[os.getenv("JWT_ALGORITHM")])
+    return decode_cached("access", access_token, os.getenv("ACCESS_TOKEN_SECRET"))
 
 
 def verify_refresh_token(refresh_token: str):
-    return jwt.decode(refresh_token, os.getenv("REFRESH_TOKEN_SECRET"), algorithms=[os.getenv("JWT_ALGORITHM")])
+    return decode_cached("refresh", refresh_token, os.getenv("REFRESH_TOKEN_SECRET"))
 
 
 def clear_tokens(res: Response):
@@ -82,8 +112,8 @@ def clear_tokens(res: Response):
     res.delete_cookie("refresh_token")
 
 
-async def generate_new_token(res: Response, payload):
-    new_token = await create_token(payload, timedelta(minutes=15), os.getenv("ACCESS_TOKEN_SECRET"))
+def set_access_token(res: Response, payload: dict):
+    new_token = jwt.encode({**payload, "exp": datetime.now(timezone.utc) + ACCESS_TOKEN_LIFETIME}, os.getenv("ACCESS_TOKEN_SECRET"), algorithm="HS256")
 
     res.set_cookie(
         key="access_token",
@@ -91,98 +121,82 @@ async def generate_new_token(res: Response, payload):
         httponly=True,
         secure=os.getenv("PROD") == "production",
         samesite="lax",
-        max_age=15 * 60
+        max_age=int(ACCESS_TOKEN_LIFETIME.total_seconds())
     )
 
 
-async def check_auth(res: Response, access_token: Optional[str], refresh_token: Optional[str]):
-    try:
-        if access_token:
-            verify_access_token(access_token)
-    except jwt.InvalidTokenError:
-        clear_tokens(res)
+async def generate_new_token(res: Response, payload):
+    set_access_token(res, payload)
 
-    if not refresh_token:
-        raise HTTPException(status_code=401, detail="You are not authenticated, no access and refresh token was found")
 
-    try:
-        auth_data = verify_refresh_token(refresh_token)
-
-        payload = {
-            "uid": auth_data.get("uid", 0),
-            "role": auth_data.get("role", ""),
-            "pfp": auth_data.get("pfp", ""),
-            "username": auth_data.get("username", "")
-        }
-
-        new_access_token = await create_token(payload, timedelta(minutes=15), os.getenv("ACCESS_TOKEN_SECRET"))
-
-        res.set_cookie(
-            key="access_token",
-            value=new_access_token,
-            httponly=True,
-            secure=os.getenv("PROD") == "production",
-            samesite="lax",
-            max_age=15 * 60
-        )
-
-        return payload
-    except jwt.InvalidTokenError:
-        raise HTTPException(status_code=401, detail="Invalid refresh token")
+class AuthState:
+    def __init__(self, logged_in: bool = False, users_data: Optional[dict] = None, authenticated: bool = False):
+        # Whether the client holds a usable token (former check_tokens)
+        self.logged_in = logged_in
+        # Public claims of the refresh token, empty for anonymous clients (former check_users_auth)
+        self.users_data = users_data or {}
+        # Whether the refresh token is valid, required by check_auth
+        self.authenticated = authenticated
 
 
-async def check_users_auth(res: Response, access_token: Optional[str], refresh_token: Optional[str]):
-    try:
-        if access_token:
-            verify_access_token(access_token)
-    except jwt.InvalidTokenError:
-        clear_tokens(res)
+"""Resolving the auth state of a request from its cookies, each token decoded at most once"""
+
+
+def resolve_tokens(res: Response, access_token: Optional[str], refresh_token: Optional[str]) -> AuthState:
+    access_claims = None
+    logged_in = False
+
+    if access_token:
+        try:
+            access_claims = verify_access_token(access_token)
+            logged_in = True
+        except jwt.InvalidTokenError:
+            clear_tokens(res)
 
     if not refresh_token:
-        return {}
+        return AuthState(logged_in=logged_in)
 
     try:
-        auth_data = verify_refresh_token(refresh_token)
+        refresh_claims = verify_refresh_token(refresh_token)
+    except jwt.InvalidTokenError:
+        return AuthState(logged_in=logged_in)
 
-        payload = {
-            "uid": auth_data.get("uid", 0),
-            "role": auth_data.get("role", ""),
-            "pfp": auth_data.get("pfp", ""),
-            "username": auth_data.get("username", "")
-        }
+    users_data = {
+        "uid": refresh_claims.get("uid", 0),
+        "role": refresh_claims.get("role", ""),
+        "pfp": refresh_claims.get("pfp", ""),
+        "username": refresh_claims.get("username", "")
+    }
 
-        await generate_new_token(res, payload)
+    if access_claims is None or access_claims.get("exp", 0) - time.time() < ACCESS_TOKEN_RENEW_BEFORE:
+        set_access_token(res, {**users_data, **({"email": refresh_claims["email"]} if "email" in refresh_claims else {})})
 
-        return payload
-    except jwt.InvalidTokenError:
-        return {}
+    # A broken access token makes the client anonymous for this request, like before
+    return AuthState(logged_in=logged_in or not access_token, users_data=users_data, authenticated=True)
 
 
-async def check_tokens(res: Response, access_token: Optional[str], refresh_token: Optional[str]) -> bool:
-    try:
-        if access_token:
-            verify_access_token(access_token)
+"""Dependency resolving the auth state once per request, shared by every handler that needs it"""
 
-            return True
-    except jwt.InvalidTokenError:
-        clear_tokens(res)
 
-        return False
+async def resolve_auth(req: Request, res: Response) -> AuthState:
+    return resolve_tokens(res, req.cookies.get("access_token"), req.cookies.get("refresh_token"))
 
+
+async def check_auth(res: Response, access_token: Optional[str], refresh_token: Optional[str]):
     if not refresh_token:
-        return False
+        raise HTTPException(status_code=401, detail="You are not authenticated, no access and refresh token was found")
 
-    try:
-        auth_data = verify_refresh_token(refresh_token)
+    auth = resolve_tokens(res, access_token, refresh_token)
 
-        payload = {
-            "uid": auth_data["uid"],
-            "role": auth_data["role"],
-            "email": auth_data["email"]
-        }
+    if not auth.authenticated:
+        raise HTTPException(status_code=401, detail="Invalid refresh token")
 
-        await generate_new_token(res, payload)
+    return auth.users_data
 
-        return True
-    except jwt.InvalidTokenError:
-        return False
+
+async def check_users_auth(res: Response, access_token: Optional[str], refresh_token: Optional[str]):
+    return resolve_tokens(res, access_token, refresh_token).users_data
+
+
+async def check_tokens(res: Response, access_token: Optional[str], refresh_token: Optional[str]) -> bool:
+    return resolve_tokens(res, access_token, refresh_token).logged_in
@@ -1,20 +1,25 @@
 import sys
 import os
-import asyncio
 
 from dotenv import load_dotenv
-from pycoingecko import CoinGeckoAPI
-from celery import Celery
+from celery import Celery, chord
 from celery.schedules import crontab
-from src.mail import mail, create_message
-from src.database.db import session
-from src.models.models import Subscritions, User, Notifications
+from celery.signals import worker_process_init, worker_ready
+from sqlalchemy import func
+from src.mail import mail_pool, create_message
+from src.database.db import db, SessionLocal
+from src.models.models import Subscritions
 from src.helpers.subscription_helper import name_to_sign
-from src.helpers.stocks_helper import get_stock_price
+from src.helpers.alerts_helper import NotificationSink, find_triggered, load_price_keys, shard_ranges
+from src.helpers.price_helper import prices_from_rows, prices_to_rows, resolve_prices
+from src.helpers.stocks_helper import get_stocks
+from src.helpers.ticker_meta_helper import ticker_store
+from src.helpers.notification_stream_helper import publish_notifications
 
 load_dotenv()
 
-cg = CoinGeckoAPI(demo_api_key=os.getenv('GECKO_API_KEY'))
+# Number of slices the subscriptions table is split into on every check cycle
+ALERT_SHARDS = int(os.getenv("ALERT_SHARDS", 4))
 
 sys.path.insert(0, os.path.dirname((os.path.abspath(__file__))))
 
@@ -33,6 +38,7 @@ app.conf.update(
     timezone='UTC',
     enable_utc=True,
     broker_connection_retry_on_startup=True,
+    worker_prefetch_multiplier=1,
 )
 
 
@@ -40,42 +46,38 @@ app.conf.beat_scheduler = 'celery.beat.PersistentScheduler'
 app.conf.scheduler_filename = '/tmp/celerybeat-schedule'
 
 
-@app.task
-def send_email(recipients: list[str], subject: str, body: str):
-    try:
-        message = create_message(recipients, subject, body)
-        asyncio.run(mail.send_message(message))
-        return "Email sent successfully"
-    except Exception as e:
-        raise e
+@worker_process_init.connect
+def reset_db_pool(**kwargs):
+    # Forked worker processes must not reuse connections opened by the parent process
+    db.dispose(close=False)
+
+
+"""Task to send a batch of emails over the pooled SMTP connections, failures are reported per message"""
 
 
-def add_notif(sub: Subscritions):
-    notif = Notifications(
-        check_type=sub.check_type,
-        uid=sub.uid,
-        what_to_check=sub.what_to_check,
-        operator=sub.operator,
-        value=sub.value,
-        currency=sub.currency
-    )
+@app.task
+def send_email_batch(messages: list[dict]):
+    results = mail_pool.send_batch_sync([create_message(**message) for message in messages])
+
+    failed = [result for result in results if not result["sent"]]
 
-    session.add(notif)
-    session.delete(sub)
-    session.commit()
+    return {"sent": len(results) - len(failed), "failed": failed}
 
 
-"""Helper function to check if threshold was reached"""
+@app.task
+def send_email(recipients: list[str], subject: str, body: str):
+    result = send_email_batch([{"recipients": recipients, "subject": subject, "body": body}])
 
+    if result["failed"]:
+        raise Exception(result["failed"][0]["error"])
 
-def check_operators(operator: str, threshold: float, current: float) -> bool:
-    return (operator == "greater" and current > threshold) or (operator == "less" and current < threshold)
+    return "Email sent successfully"
 
 
-"""Function to send email to user"""
+"""Function to build the alert email for user"""
 
 
-def send_formatted_email(user: User, sub: Subscritions, current_value: float):
+def format_alert_email(email: str, sub: Subscritions, current_value: float) -> dict:
     symbol = "📈" if sub.operator == "greater" else "📉"
 
     notification_content = f"""
@@ -93,42 +95,84 @@ def send_formatted_email(user: User, sub: Subscritions, current_value: float):
         </html>
     """
 
-    send_email.delay([user.email],
-                     f"{(sub.what_to_check).upper()} is {sub.operator} than {sub.value}{name_to_sign(sub.currency) or sub.currency}{symbol}!",
-                     notification_content)
+    return {
+        "recipients": [email],
+        "subject": f"{(sub.what_to_check).upper()} is {sub.operator} than {sub.value}{name_to_sign(sub.currency) or sub.currency}{symbol}!",
+        "body": notification_content
+    }
+
 
-    add_notif(sub)
+def notify_owners(batch: list):
+    send_email_batch.delay([format_alert_email(sub.email, sub, current_price) for sub, current_price in batch])
 
-"""Main method, which decides what to send, subscription type"""
 
+"""Shard task, finds triggered subscriptions of the id range and notifies their owners"""
 
-def check_subscriptions(sub: Subscritions, user: User):
-    if sub.check_type == "stock":
-        current_price = asyncio.run(get_stock_price(sub.what_to_check))
-    elif sub.check_type == "crypto":
-        price_data = cg.get_price(ids=sub.what_to_check, vs_currencies=sub.currency, include_market_cap=True)
-        current_price = price_data[sub.what_to_check][sub.currency]
-    else:
-        return
 
-    if check_operators(sub.operator, sub.value, current_price):
-        send_formatted_email(user, sub, current_price)
+@app.task
+def check_shard(low: int, high: int, prices: list[list] = None):
+    # A session per run, so no transaction or connection stays pinned between beats
+    with SessionLocal() as session:
+        checked, hits = find_triggered(session, low, high, prices=None if prices is None else prices_from_rows(prices))
+
+        with NotificationSink(session, on_flush=notify_owners, publish=publish_notifications) as sink:
+            for sub, current_price in hits:
+                sink.add(sub, current_price)
+
+    return {"checked": checked, "triggered": len(hits)}
+
+
+@app.task
+def collect_shards(results: list[dict]):
+    return {
+        "shards": len(results),
+        "checked": sum(result["checked"] for result in results),
+        "triggered": sum(result["triggered"] for result in results)
+    }
+
+
+"""Main method, resolves the prices once per cycle and fans the id range shards out to the workers"""
 
 
 @app.task
 def check_if_notify():
-    subs = session.query(Subscritions).all()
+    with SessionLocal() as session:
+        low, high = session.query(func.min(Subscritions.id), func.max(Subscritions.id)).one()
+
+        ranges = shard_ranges(low, high, ALERT_SHARDS)
+
+        if not ranges:
+            return 0
+
+        prices = prices_to_rows(resolve_prices(load_price_keys(session, low, high + 1)))
+
+    chord(check_shard.s(start, end, prices) for start, end in ranges)(collect_shards.s())
+
+    return len(ranges)
+
+
+"""Task to refresh locally stored metadata of the listed stocks, runs on a slow schedule"""
+
+
+@app.task
+def refresh_ticker_metadata():
+    return ticker_store.refresh(get_stocks())
 
-    for sub in subs:
-        current_user = session.query(User).filter(User.id == sub.uid).first()
 
-        check_subscriptions(sub, current_user)
+@worker_ready.connect
+def fill_ticker_metadata(**kwargs):
+    if ticker_store.is_empty():
+        refresh_ticker_metadata.delay()
 
 
 app.conf.beat_schedule = {
     'check-alerts': {
         'task': 'src.celery_worker.check_if_notify',
         'schedule': 300.0
+    },
+    'refresh-ticker-metadata': {
+        'task': 'src.celery_worker.refresh_ticker_metadata',
+        'schedule': 12 * 60 * 60.0
     }
 }
 
@@ -1,15 +1,73 @@
 import os
 from sqlalchemy import create_engine
 from dotenv import load_dotenv
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
 
 from src.models import Base
 
 load_dotenv()
 
-db = create_engine(os.getenv('DB_CONN_LINE'))
+# Connection pool of the web process, shared by all requests of one uvicorn worker
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 10))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 20))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", 30))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 30 * 60))
+# Every celery process gets its own, much smaller pool
+WORKER_DB_POOL_SIZE = int(os.getenv("WORKER_DB_POOL_SIZE", 2))
+WORKER_DB_MAX_OVERFLOW = int(os.getenv("WORKER_DB_MAX_OVERFLOW", 2))
+
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+
+def pool_options(url, pool_size: int, max_overflow: int) -> dict:
+    if url.get_backend_name() == "sqlite":
+        return {}
+
+    return {
+        "pool_size": pool_size,
+        "max_overflow": max_overflow,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": True,
+    }
+
+
+def async_engine_options(url) -> tuple:
+    options = pool_options(url, DB_POOL_SIZE, DB_MAX_OVERFLOW)
+
+    # asyncpg does not understand libpq's sslmode, it takes the same values through "ssl"
+    if url.get_backend_name() == "postgresql" and "sslmode" in url.query:
+        options["connect_args"] = {"ssl": url.query["sslmode"]}
+        url = url.difference_update_query(["sslmode"])
+
+    return url.set(drivername=ASYNC_DRIVERS.get(url.get_backend_name(), url.drivername)), options
+
+
+db_url = make_url(os.getenv('DB_CONN_LINE'))
+
+# Sync engine, used by the celery worker and for creating tables
+db = create_engine(db_url, **pool_options(db_url, WORKER_DB_POOL_SIZE, WORKER_DB_MAX_OVERFLOW))
 
 Base.metadata.create_all(bind=db)
 
+# Worker tasks open a session per run, a long-lived one would keep its connection and transaction between runs
 SessionLocal = sessionmaker(db)
-session = SessionLocal()
+
+async_db_url, async_db_options = async_engine_options(db_url)
+
+async_db = create_async_engine(async_db_url, **async_db_options)
+
+AsyncSessionLocal = async_sessionmaker(async_db, expire_on_commit=False)
+
+
+"""FastAPI dependency, gives every request its own session from the async pool"""
+
+
+async def get_session():
+    async with AsyncSessionLocal() as session:
+        yield session
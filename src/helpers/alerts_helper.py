@@ -0,0 +1,235 @@
+import os
+
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import select, insert, delete
+from sqlalchemy.orm import Session
+
+from src.models.models import Subscritions, User, Notifications
+from src.helpers.price_helper import PriceKey, price_key, resolve_prices
+from src.helpers.notification_stream_helper import notification_to_dict
+
+# Rows fetched per round-trip of the server-side cursor while scanning subscriptions
+ALERT_FETCH_BATCH = int(os.getenv("ALERT_FETCH_BATCH", 1000))
+
+# Triggered alerts written per transaction by the notification sink
+NOTIF_BATCH_SIZE = int(os.getenv("NOTIF_BATCH_SIZE", 500))
+
+
+"""In-memory index of alert thresholds, sorted per key so triggered alerts are found with one bisection"""
+
+
+class ThresholdIndex:
+    def __init__(self, subs: Iterable[Subscritions] = ()):
+        self._buckets: Dict[PriceKey, Dict[str, List[Tuple[float, Any]]]] = {}
+        self._columns: Dict[PriceKey, Dict[str, Tuple[List[float], List[Any]]]] = {}
+
+        for sub in subs:
+            self.add(sub)
+
+    def __len__(self):
+        return sum(len(entries) for bucket in self._buckets.values() for entries in bucket.values())
+
+    def keys(self) -> List[PriceKey]:
+        return list(self._buckets.keys())
+
+    def add(self, sub: Subscritions, item: Any = None):
+        if sub.operator not in ("greater", "less"):
+            return
+
+        key = price_key(sub)
+
+        bucket = self._buckets.setdefault(key, {"greater": [], "less": []})
+        bucket[sub.operator].append((float(sub.value), sub if item is None else item))
+
+        self._columns.pop(key, None)
+
+    def _sorted(self, key: PriceKey) -> Dict[str, Tuple[List[float], List[Any]]]:
+        columns = self._columns.get(key)
+
+        if columns is None:
+            columns = {}
+
+            for operator, entries in self._buckets[key].items():
+                entries.sort(key=lambda entry: entry[0])
+
+                columns[operator] = ([value for value, _ in entries], [item for _, item in entries])
+
+            self._columns[key] = columns
+
+        return columns
+
+    def triggered(self, key: PriceKey, current: float) -> List[Any]:
+        if key not in self._buckets:
+            return []
+
+        columns = self._sorted(key)
+
+        greater_values, greater_items = columns["greater"]
+        less_values, less_items = columns["less"]
+
+        # "greater" fires when current > threshold, "less" fires when current < threshold
+        return greater_items[:bisect_left(greater_values, current)] + less_items[bisect_right(less_values, current):]
+
+
+"""Splitting the [low, high] id range of subscriptions into half-open ranges, one per shard"""
+
+
+def shard_ranges(low: Optional[int], high: Optional[int], shards: int) -> List[Tuple[int, int]]:
+    if low is None or high is None:
+        return []
+
+    shards = max(1, min(shards, high - low + 1))
+    step = -(-(high - low + 1) // shards)
+
+    return [(start, min(start + step, high + 1)) for start in range(low, high + 1, step)]
+
+
+def load_price_keys(session: Session, low: int, high: int):
+    return session.execute(
+        select(Subscritions.check_type, Subscritions.what_to_check, Subscritions.currency)
+        .where(Subscritions.id >= low, Subscritions.id < high)
+        .distinct()
+    ).all()
+
+
+"""Streaming subscriptions of the shard together with the owner's email, one partition per cursor batch"""
+
+
+def stream_subscriptions(session: Session, low: int, high: int, batch_size: int = ALERT_FETCH_BATCH):
+    query = (
+        select(
+            Subscritions.id,
+            Subscritions.uid,
+            Subscritions.check_type,
+            Subscritions.what_to_check,
+            Subscritions.operator,
+            Subscritions.value,
+            Subscritions.currency,
+            User.email
+        )
+        .join(User, User.id == Subscritions.uid)
+        .where(Subscritions.id >= low, Subscritions.id < high)
+        .execution_options(yield_per=batch_size)
+    )
+
+    return session.execute(query).partitions()
+
+
+"""Finding triggered subscriptions of the shard with a constant number of queries"""
+
+
+def find_triggered(
+    session: Session,
+    low: int,
+    high: int,
+    batch_size: int = ALERT_FETCH_BATCH,
+    prices: Optional[Dict[PriceKey, float]] = None
+):
+    if prices is None:
+        prices = resolve_prices(load_price_keys(session, low, high))
+
+    checked = 0
+    hits = []
+
+    for rows in stream_subscriptions(session, low, high, batch_size):
+        index = ThresholdIndex(rows)
+
+        checked += len(rows)
+
+        for key in index.keys():
+            if key in prices:
+                hits.extend((row, prices[key]) for row in index.triggered(key, prices[key]))
+
+    return checked, hits
+
+
+"""Accumulating triggered alerts and writing them in batches, claiming the subscriptions first"""
+
+
+class NotificationSink:
+    def __init__(
+        self,
+        session: Session,
+        batch_size: int = NOTIF_BATCH_SIZE,
+        on_flush: Optional[Callable[[List[Tuple[Any, float]]], None]] = None,
+        publish: Optional[Callable[[List[dict]], None]] = None
+    ):
+        self.session = session
+        self.batch_size = max(1, batch_size)
+        self.on_flush = on_flush
+        self.publish = publish
+        self.flushed = 0
+
+        self._pending: List[Tuple[Any, float]] = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.flush()
+
+    def add(self, sub: Subscritions, current_price: float):
+        self._pending.append((sub, current_price))
+
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self._pending:
+            return
+
+        batch, self._pending = self._pending, []
+        created_at = datetime.now()
+
+        try:
+            claimed = set(self.session.scalars(
+                delete(Subscritions)
+                .where(Subscritions.id.in_([sub.id for sub, _ in batch]))
+                .returning(Subscritions.id)
+            ).all())
+
+            batch = [(sub, price) for sub, price in batch if sub.id in claimed]
+
+            rows = [
+                {
+                    "uid": sub.uid,
+                    "check_type": sub.check_type,
+                    "what_to_check": sub.what_to_check,
+                    "operator": sub.operator,
+                    "value": sub.value,
+                    "currency": sub.currency,
+                    "price": price,
+                    "created_at": created_at
+                }
+                for sub, price in batch
+            ]
+
+            published = []
+
+            if rows and self.publish:
+                # Stored rows are only needed for publishing
+                stored = self.session.scalars(insert(Notifications).returning(Notifications), rows).all()
+                # Serialized before the commit expires them
+                published = [notification_to_dict(notification) for notification in stored]
+            elif rows:
+                self.session.execute(insert(Notifications), rows)
+
+            self.session.commit()
+        except Exception:
+            self.session.rollback()
+            raise
+
+        if not batch:
+            return
+
+        self.flushed += len(batch)
+
+        if self.on_flush:
+            self.on_flush(batch)
+
+        if self.publish:
+            self.publish(published)
@@ -0,0 +1,145 @@
+import asyncio
+import json
+import os
+
+from typing import Awaitable, Callable, Dict, Optional, Set
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Seconds between two upstream polls of the watched assets
+PRICE_POLL_INTERVAL = float(os.getenv("PRICE_POLL_INTERVAL", 10))
+# A client that does not take a message within this time is dropped, so it cannot stall the others
+PRICE_SEND_TIMEOUT = float(os.getenv("PRICE_SEND_TIMEOUT", 5))
+MAX_ASSETS_PER_CLIENT = int(os.getenv("MAX_ASSETS_PER_CLIENT", 100))
+# Upper bound of the union polled upstream, new assets beyond it are rejected until clients leave
+MAX_WATCHED_ASSETS = int(os.getenv("MAX_WATCHED_ASSETS", 300))
+
+
+class TooManyAssets(Exception):
+    pass
+
+
+"""Fan-out of live prices to connected websockets from one poller over the union of their assets"""
+
+
+class PriceBroadcaster:
+    def __init__(self, fetch_prices: Callable[[Set[str]], Awaitable[Dict[str, float]]], interval: float = PRICE_POLL_INTERVAL):
+        self.fetch_prices = fetch_prices
+        self.interval = interval
+
+        self.clients: Dict[object, frozenset] = {}
+        self.prices: Dict[str, float] = {}
+
+        self._task = None
+        self._wake: Optional[asyncio.Event] = None
+
+    def watched(self) -> Set[str]:
+        return set().union(*self.clients.values()) if self.clients else set()
+
+    def _ensure_running(self):
+        if self._task is None or self._task.done():
+            # Created here rather than in __init__, so the event belongs to the loop that runs the poller
+            self._wake = asyncio.Event()
+            self._task = asyncio.create_task(self.run())
+
+    def connect(self, websocket):
+        self.clients[websocket] = frozenset()
+
+        self._ensure_running()
+
+    def disconnect(self, websocket):
+        self.clients.pop(websocket, None)
+
+        if not self.clients and self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def subscribe(self, websocket, assets: Set[str]):
+        assets = frozenset(assets)
+
+        if len(assets) > MAX_ASSETS_PER_CLIENT:
+            raise TooManyAssets(f"At most {MAX_ASSETS_PER_CLIENT} assets can be watched per connection")
+
+        others = set().union(*(watched for client, watched in self.clients.items() if client is not websocket))
+
+        if len(others | assets) > MAX_WATCHED_ASSETS:
+            raise TooManyAssets("Too many assets are watched right now, try again later")
+
+        self.clients[websocket] = assets
+
+        # The poller may have stopped in between, when this client was dropped as the last one
+        self._ensure_running()
+
+        known = {asset: self.prices[asset] for asset in self.clients[websocket] if asset in self.prices}
+
+        # Assets nobody watched before are fetched right away instead of on the next tick
+        if self._wake is not None and len(known) < len(self.clients[websocket]):
+            self._wake.set()
+
+        await self._send(websocket, json.dumps({"type": "snapshot", "data": known}))
+
+    async def _send(self, websocket, payload: str):
+        try:
+            await asyncio.wait_for(websocket.send_text(payload), PRICE_SEND_TIMEOUT)
+        except Exception:
+            self.disconnect(websocket)
+
+            # Closed as well, otherwise the client stays connected without getting prices
+            try:
+                await asyncio.wait_for(websocket.close(code=1011), PRICE_SEND_TIMEOUT)
+            except Exception:
+                pass
+
+    async def broadcast(self, changed: Dict[str, float]):
+        groups: Dict[frozenset, list] = {}
+
+        for websocket, assets in list(self.clients.items()):
+            groups.setdefault(assets, []).append(websocket)
+
+        sends = []
+
+        for assets, websockets in groups.items():
+            diff = {asset: changed[asset] for asset in assets if asset in changed}
+
+            if not diff:
+                continue
+
+            payload = json.dumps({"type": "prices", "data": diff})
+
+            sends.extend(self._send(websocket, payload) for websocket in websockets)
+
+        await asyncio.gather(*sends)
+
+    async def poll_once(self):
+        watched = self.watched()
+
+        if not watched:
+            return
+
+        fresh = await self.fetch_prices(watched)
+
+        changed = {asset: price for asset, price in fresh.items() if self.prices.get(asset) != price}
+
+        self.prices = {asset: price for asset, price in self.prices.items() if asset in watched}
+        self.prices.update(fresh)
+
+        if changed:
+            await self.broadcast(changed)
+
+    async def run(self):
+        while True:
+            try:
+                await self.poll_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                pass
+
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+
+            self._wake.clear()
@@ -0,0 +1,323 @@
+import asyncio
+import hashlib
+import json
+import os
+import pickle
+import threading
+import time
+
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Seconds market data stays fresh in the cache
+MARKET_CACHE_TTL = float(os.getenv("MARKET_CACHE_TTL", 30))
+MARKET_CACHE_SIZE = int(os.getenv("MARKET_CACHE_SIZE", 1024))
+# "memory" keeps entries per process, "redis" additionally shares them between web and worker processes
+MARKET_CACHE_BACKEND = os.getenv("MARKET_CACHE_BACKEND", "memory")
+# Ticker metadata (website, market cap) barely changes, so it is kept much longer than prices
+METADATA_CACHE_TTL = float(os.getenv("METADATA_CACHE_TTL", 24 * 60 * 60))
+# Seconds market snapshots are still served after their TTL while a refresh runs, only then do requests fail
+MARKET_STALE_TTL = float(os.getenv("MARKET_STALE_TTL", 10 * 60))
+# Threads refreshing stale entries for sync callers
+MARKET_REFRESH_WORKERS = int(os.getenv("MARKET_REFRESH_WORKERS", 4))
+
+MISS = object()
+
+
+class LRUCache:
+    def __init__(self, max_entries: int = MARKET_CACHE_SIZE):
+        self.max_entries = max_entries
+
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is None:
+                return MISS
+
+            value, expires_at = entry
+
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return MISS
+
+            self._entries.move_to_end(key)
+
+            return value
+
+    def set(self, key: str, value: Any, ttl: float):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class RedisBackend:
+    def __init__(self, url: str, prefix: str = "market-cache:v3:"):
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def get(self, key: str):
+        try:
+            raw = self.client.get(self.prefix + key)
+        except Exception:
+            return MISS
+
+        return MISS if raw is None else pickle.loads(raw)
+
+    def ttl(self, key: str) -> float:
+        try:
+            return max(self.client.pttl(self.prefix + key), 0) / 1000
+        except Exception:
+            return 0
+
+    def set(self, key: str, value: Any, ttl: float):
+        try:
+            self.client.set(self.prefix + key, pickle.dumps(value), px=int(ttl * 1000))
+        except Exception:
+            pass
+
+    def clear(self):
+        try:
+            for key in self.client.scan_iter(self.prefix + "*"):
+                self.client.delete(key)
+        except Exception:
+            pass
+
+
+"""Cache for upstream market data shared by sync and async callers, with Redis and stale-while-revalidate"""
+
+
+class MarketCache:
+    def __init__(self, ttl: float = MARKET_CACHE_TTL, max_entries: int = MARKET_CACHE_SIZE, remote: Optional[RedisBackend] = None):
+        self.ttl = ttl
+        self.local = LRUCache(max_entries)
+        self.remote = remote
+
+        self._inflight: dict = {}
+        self._lock = threading.Lock()
+        # Background refreshes are referenced until they finish, so they are not garbage collected
+        self._refreshes: set = set()
+        self._refresh_executor: Optional[ThreadPoolExecutor] = None
+
+    @staticmethod
+    def make_key(provider: str, endpoint: str, params: dict) -> str:
+        digest = hashlib.sha1(json.dumps(params, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+        return f"{provider}:{endpoint}:{digest}"
+
+    def clear(self):
+        self.local.clear()
+
+        if self.remote:
+            self.remote.clear()
+
+    def _load_remote(self, key: str, ttl: float):
+        entry = self.remote.get(key)
+
+        if entry is not MISS:
+            self.local.set(key, entry, self.remote.ttl(key) or ttl)
+
+        return entry
+
+    def _store(self, key: str, value: Any, ttl: float, stale_ttl: float) -> tuple:
+        fetched_at = time.time()
+        entry = (value, fetched_at + ttl, fetched_at)
+
+        self.local.set(key, entry, ttl + stale_ttl)
+
+        if self.remote:
+            self.remote.set(key, entry, ttl + stale_ttl)
+
+        return entry
+
+    def _join(self, key: str):
+        with self._lock:
+            future = self._inflight.get(key)
+
+            if future is not None:
+                return future, False
+
+            future = Future()
+            self._inflight[key] = future
+
+            return future, True
+
+    def _leave(self, key: str):
+        with self._lock:
+            self._inflight.pop(key, None)
+
+    def _refresh(self, key: str, future: Future, fetch: Callable[[], Any], ttl: float, stale_ttl: float):
+        try:
+            future.set_result(self._store(key, fetch(), ttl, stale_ttl))
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            self._leave(key)
+
+    def _refresh_in_thread(self, key: str, fetch: Callable[[], Any], ttl: float, stale_ttl: float):
+        future, leader = self._join(key)
+
+        if not leader:
+            return
+
+        if self._refresh_executor is None:
+            self._refresh_executor = ThreadPoolExecutor(max_workers=MARKET_REFRESH_WORKERS, thread_name_prefix="cache-refresh")
+
+        self._refresh_executor.submit(self._refresh, key, future, fetch, ttl, stale_ttl)
+
+    async def _astore(self, key: str, value: Any, ttl: float, stale_ttl: float) -> tuple:
+        if self.remote:
+            return await asyncio.to_thread(self._store, key, value, ttl, stale_ttl)
+
+        return self._store(key, value, ttl, stale_ttl)
+
+    async def _arefresh(self, key: str, future: Future, fetch: Callable[[], Awaitable[Any]], ttl: float, stale_ttl: float):
+        try:
+            future.set_result(await self._astore(key, await fetch(), ttl, stale_ttl))
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            self._leave(key)
+
+    def _refresh_in_task(self, key: str, fetch: Callable[[], Awaitable[Any]], ttl: float, stale_ttl: float):
+        future, leader = self._join(key)
+
+        if not leader:
+            return
+
+        task = asyncio.get_running_loop().create_task(self._arefresh(key, future, fetch, ttl, stale_ttl))
+
+        self._refreshes.add(task)
+        task.add_done_callback(self._refreshes.discard)
+
+    # Wall clock time the cached value of the key was fetched at, None when nothing is cached
+    async def aversion(self, provider: str, endpoint: str, params: dict) -> Optional[float]:
+        key = self.make_key(provider, endpoint, params)
+        entry = self.local.get(key)
+
+        if entry is MISS and self.remote:
+            entry = await asyncio.to_thread(self._load_remote, key, self.ttl)
+
+        return None if entry is MISS else entry[2]
+
+    def get_entry(self, provider: str, endpoint: str, params: dict, fetch: Callable[[], Any], ttl: Optional[float] = None, stale_ttl: float = 0) -> tuple:
+        key = self.make_key(provider, endpoint, params)
+        ttl = self.ttl if ttl is None else ttl
+
+        entry = self.local.get(key)
+
+        if entry is not MISS:
+            if time.time() >= entry[1]:
+                self._refresh_in_thread(key, fetch, ttl, stale_ttl)
+
+            return entry
+
+        future, leader = self._join(key)
+
+        if not leader:
+            return future.result()
+
+        try:
+            entry = self._load_remote(key, ttl) if self.remote else MISS
+            cached = entry is not MISS
+
+            if not cached:
+                entry = self._store(key, fetch(), ttl, stale_ttl)
+
+            future.set_result(entry)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            self._leave(key)
+
+        # A stale entry of another process is served the same way, after this leader left
+        if cached and time.time() >= entry[1]:
+            self._refresh_in_thread(key, fetch, ttl, stale_ttl)
+
+        return entry
+
+    def get_or_fetch(self, provider: str, endpoint: str, params: dict, fetch: Callable[[], Any], ttl: Optional[float] = None, stale_ttl: float = 0):
+        return self.get_entry(provider, endpoint, params, fetch, ttl, stale_ttl)[0]
+
+    async def aget_entry(self, provider: str, endpoint: str, params: dict, fetch: Callable[[], Awaitable[Any]], ttl: Optional[float] = None, stale_ttl: float = 0) -> tuple:
+        key = self.make_key(provider, endpoint, params)
+        ttl = self.ttl if ttl is None else ttl
+
+        entry = self.local.get(key)
+
+        if entry is not MISS:
+            if time.time() >= entry[1]:
+                self._refresh_in_task(key, fetch, ttl, stale_ttl)
+
+            return entry
+
+        future, leader = self._join(key)
+
+        if not leader:
+            return await asyncio.wrap_future(future)
+
+        try:
+            entry = await asyncio.to_thread(self._load_remote, key, ttl) if self.remote else MISS
+            cached = entry is not MISS
+
+            if not cached:
+                entry = await self._astore(key, await fetch(), ttl, stale_ttl)
+
+            future.set_result(entry)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            self._leave(key)
+
+        if cached and time.time() >= entry[1]:
+            self._refresh_in_task(key, fetch, ttl, stale_ttl)
+
+        return entry
+
+    async def aget_or_fetch(self, provider: str, endpoint: str, params: dict, fetch: Callable[[], Awaitable[Any]], ttl: Optional[float] = None, stale_ttl: float = 0):
+        return (await self.aget_entry(provider, endpoint, params, fetch, ttl, stale_ttl))[0]
+
+
+def create_market_cache() -> MarketCache:
+    remote = None
+
+    if MARKET_CACHE_BACKEND == "redis" and os.getenv("REDIS_URL"):
+        remote = RedisBackend(os.getenv("REDIS_URL"))
+
+    return MarketCache(remote=remote)
+
+
+market_cache = create_market_cache()
+
+
+def cached_call(provider: str, endpoint: str, fetch: Callable[..., Any], ttl: Optional[float] = None, stale_ttl: float = 0, **params):
+    return market_cache.get_or_fetch(provider, endpoint, params, lambda: fetch(**params), ttl, stale_ttl)
+
+
+async def acached_call(provider: str, endpoint: str, fetch: Callable[..., Awaitable[Any]], ttl: Optional[float] = None, stale_ttl: float = 0, **params):
+    return await market_cache.aget_or_fetch(provider, endpoint, params, lambda: fetch(**params), ttl, stale_ttl)
+
+
+async def acached_entry(provider: str, endpoint: str, fetch: Callable[..., Awaitable[Any]], ttl: Optional[float] = None, stale_ttl: float = 0, **params):
+    value, _, fetched_at = await market_cache.aget_entry(provider, endpoint, params, lambda: fetch(**params), ttl, stale_ttl)
+
+    return value, fetched_at
@@ -0,0 +1,134 @@
+import os
+import sqlite3
+import threading
+
+from pathlib import Path
+from typing import Dict, Iterable, List, Tuple
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Shared by the web processes the same way the ticker metadata file is
+HISTORY_DB_PATH = os.getenv(
+    "HISTORY_DB_PATH",
+    str(Path(__file__).resolve().parents[2] / ".cache" / "history.sqlite3")
+)
+
+HOUR = 60 * 60
+
+Point = Tuple[int, float]
+
+
+"""Append-only SQLite store of closed price points (daily stock closes, hourly crypto prices)"""
+
+
+class HistoryStore:
+    def __init__(self, path: str = HISTORY_DB_PATH):
+        self.path = path
+
+        self._local = threading.local()
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+
+        if conn is None:
+            if self.path != ":memory:":
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS history (
+                    source TEXT NOT NULL,
+                    symbol TEXT NOT NULL,
+                    ts INTEGER NOT NULL,
+                    close REAL NOT NULL,
+                    PRIMARY KEY (source, symbol, ts)
+                ) WITHOUT ROWID
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS fetches (
+                    source TEXT NOT NULL,
+                    symbol TEXT NOT NULL,
+                    ts INTEGER NOT NULL,
+                    PRIMARY KEY (source, symbol)
+                ) WITHOUT ROWID
+            """)
+
+            self._local.conn = conn
+
+        return conn
+
+    def read(self, source: str, symbols: Iterable[str], since: int) -> Dict[str, List[Point]]:
+        symbols = list(dict.fromkeys(symbols))
+        history: Dict[str, List[Point]] = {symbol: [] for symbol in symbols}
+
+        if not symbols:
+            return history
+
+        rows = self._connection().execute(
+            f"SELECT symbol, ts, close FROM history WHERE source = ? AND symbol IN ({','.join('?' * len(symbols))}) AND ts >= ? ORDER BY symbol, ts",
+            (source, *symbols, since)
+        )
+
+        for symbol, ts, close in rows:
+            history[symbol].append((ts, close))
+
+        return history
+
+    def append(self, source: str, points: Iterable[Tuple[str, int, float]]) -> int:
+        conn = self._connection()
+
+        with conn:
+            cursor = conn.executemany(
+                "INSERT OR IGNORE INTO history (source, symbol, ts, close) VALUES (?, ?, ?, ?)",
+                ((source, symbol, ts, close) for symbol, ts, close in points)
+            )
+
+        return cursor.rowcount
+
+    def delete(self, source: str, symbols: Iterable[str]) -> int:
+        symbols = list(dict.fromkeys(symbols))
+        conn = self._connection()
+
+        with conn:
+            cursor = conn.execute(
+                f"DELETE FROM history WHERE source = ? AND symbol IN ({','.join('?' * len(symbols))})",
+                (source, *symbols)
+            )
+
+        return cursor.rowcount
+
+    # When upstream was last asked for the points of a symbol, whether it returned any or not
+    def last_fetch(self, source: str, symbol: str) -> int:
+        row = self._connection().execute(
+            "SELECT ts FROM fetches WHERE source = ? AND symbol = ?",
+            (source, symbol)
+        ).fetchone()
+
+        return row[0] if row else 0
+
+    def record_fetch(self, source: str, symbol: str, ts: int):
+        conn = self._connection()
+
+        with conn:
+            conn.execute("INSERT OR REPLACE INTO fetches (source, symbol, ts) VALUES (?, ?, ?)", (source, symbol, ts))
+
+
+history_store = HistoryStore()
+
+
+"""Bucketing [timestamp in ms, price] pairs of a CoinGecko chart by hour, strictly between after and before"""
+
+
+def hourly_points(prices: Iterable[Tuple[float, float]], after: int, before: int) -> List[Point]:
+    buckets: Dict[int, float] = {}
+
+    for ts_ms, price in prices:
+        bucket = int(ts_ms // 1000) // HOUR * HOUR
+
+        if after < bucket < before and price is not None:
+            buckets[bucket] = float(price)
+
+    return sorted(buckets.items())
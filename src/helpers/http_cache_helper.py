@@ -0,0 +1,122 @@
+import hashlib
+import os
+import time
+
+from typing import Any, Awaitable, Callable, List, Optional
+
+from dotenv import load_dotenv
+from fastapi import Request, Response
+
+from src.helpers.cache_helper import acached_entry, market_cache
+from src.helpers.json_helper import dumps, json_response
+
+load_dotenv()
+
+# Seconds browsers and shared caches may reuse a market data response without revalidating
+MARKET_MAX_AGE = int(os.getenv("MARKET_MAX_AGE", 10))
+
+
+def snapshot_version(fetched_at: float) -> int:
+    return int(fetched_at * 1000)
+
+
+def fields_digest(fields: dict) -> str:
+    digest = hashlib.blake2b(digest_size=8)
+
+    for key, value in fields.items():
+        digest.update(key.encode("utf-8"))
+        digest.update(dumps(value))
+
+    return digest.hexdigest()
+
+
+"""Weak ETag of a cached snapshot version and the per-request fields sent with it"""
+
+
+def snapshot_etag(version: int, fields: dict) -> str:
+    return f'W/"{version}-{fields_digest(fields)}"'
+
+
+def opaque_tags(if_none_match: Optional[str]) -> List[str]:
+    # If-None-Match uses the weak comparison, so W/ prefixes are ignored on both sides
+    candidates = (candidate.strip() for candidate in (if_none_match or "").split(","))
+
+    return [candidate[2:] if candidate.startswith("W/") else candidate for candidate in candidates if candidate]
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if if_none_match and if_none_match.strip() == "*":
+        return True
+
+    return opaque_tags(etag)[0] in opaque_tags(if_none_match)
+
+
+"""Newest snapshot version the client holds with the same per-request fields, None without one"""
+
+
+def held_version(if_none_match: Optional[str], fields: dict) -> Optional[int]:
+    digest = fields_digest(fields)
+    versions = []
+
+    for tag in opaque_tags(if_none_match):
+        version, _, tag_digest = tag.strip('"').partition("-")
+
+        if tag_digest == digest and version.isdigit():
+            versions.append(int(version))
+
+    return max(versions, default=None)
+
+
+def cache_headers(req: Request, etag: str) -> dict:
+    # A response to a request carrying cookies contains the users data, so only the browser may keep it
+    scope = "private" if req.headers.get("cookie") else "public"
+
+    return {
+        "ETag": etag,
+        "Cache-Control": f"{scope}, max-age={MARKET_MAX_AGE}",
+        "Vary": "Cookie"
+    }
+
+
+def not_modified(req: Request, res: Response, etag: str) -> Response:
+    response = Response(status_code=304, headers=cache_headers(req, etag))
+    # Refreshed auth cookies of the injected response are carried over
+    response.headers.raw.extend(header for header in res.headers.raw if header[0] != b"content-length")
+
+    return response
+
+
+"""Cached snapshot under field, answered with 304 before any fetch when the client holds it"""
+
+
+async def conditional_snapshot_response(
+    req: Request,
+    res: Response,
+    field: str,
+    fields: dict,
+    provider: str,
+    endpoint: str,
+    fetch: Callable[..., Awaitable[Any]],
+    stale_ttl: float = 0,
+    **params
+) -> Response:
+    held = held_version(req.headers.get("if-none-match"), fields)
+
+    if held is not None:
+        cached = await market_cache.aversion(provider, endpoint, params)
+
+        if cached is None:
+            current = held > snapshot_version(time.time() - market_cache.ttl - stale_ttl)
+        else:
+            current = held >= snapshot_version(cached)
+
+        if current:
+            return not_modified(req, res, snapshot_etag(held, fields))
+
+    value, fetched_at = await acached_entry(provider, endpoint, fetch, stale_ttl=stale_ttl, **params)
+    etag = snapshot_etag(snapshot_version(fetched_at), fields)
+
+    if etag_matches(req.headers.get("if-none-match"), etag):
+        return not_modified(req, res, etag)
+
+    return json_response(res, {field: value, **fields}, headers=cache_headers(req, etag))
@@ -0,0 +1,64 @@
+import hashlib
+
+from typing import Any, Optional
+
+import orjson
+
+from fastapi.responses import JSONResponse, Response
+
+# numpy scalars and arrays come straight from the pandas/yfinance helpers
+ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
+"""Pre-serialized JSON, embedded as is wherever it appears inside the content of a FastJSONResponse"""
+
+
+class Serialized:
+    __slots__ = ("body", "fragment", "_etag")
+
+    def __init__(self, body: bytes):
+        self.body = body
+        self.fragment = orjson.Fragment(body)
+        self._etag: Optional[str] = None
+
+    def __reduce__(self):
+        return Serialized, (self.body,)
+
+    @property
+    def etag(self) -> str:
+        if self._etag is None:
+            self._etag = hashlib.blake2b(self.body, digest_size=16).hexdigest()
+
+        return self._etag
+
+
+def _default(value: Any):
+    if isinstance(value, Serialized):
+        return value.fragment
+
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def dumps(content: Any) -> bytes:
+    return orjson.dumps(content, default=_default, option=ORJSON_OPTIONS)
+
+
+def serialized(content: Any) -> Serialized:
+    return Serialized(dumps(content))
+
+
+class FastJSONResponse(JSONResponse):
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+"""Building the response directly, so FastAPI skips jsonable_encoder for it"""
+
+
+def json_response(res: Response, content: Any, status_code: int = 200, headers: Optional[dict] = None) -> FastJSONResponse:
+    response = FastJSONResponse(content, status_code=status_code, headers=headers)
+    response.headers.raw.extend(header for header in res.headers.raw if header[0] != b"content-length")
+
+    return response
@@ -0,0 +1,141 @@
+import asyncio
+
+from email.message import EmailMessage
+from email.utils import formataddr
+from typing import List, Optional
+
+import aiosmtplib
+
+
+"""Small pool of persistent SMTP connections, all driven from one event loop owned by the pool"""
+
+
+class SMTPPool:
+    def __init__(
+        self,
+        hostname: str,
+        port: int,
+        username: Optional[str] = None,
+        password: Optional[str] = None,
+        sender: Optional[str] = None,
+        sender_name: Optional[str] = None,
+        start_tls: Optional[bool] = None,
+        validate_certs: bool = True,
+        size: int = 2,
+        timeout: float = 30
+    ):
+        self.hostname = hostname
+        self.port = port
+        self.username = username
+        self.password = password
+        self.sender = sender or username
+        self.sender_name = sender_name
+        self.start_tls = start_tls
+        self.validate_certs = validate_certs
+        self.size = max(1, size)
+        self.timeout = timeout
+
+        self._idle: List[aiosmtplib.SMTP] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def build_message(self, recipients: List[str], subject: str, body: str) -> EmailMessage:
+        message = EmailMessage()
+
+        message["From"] = formataddr((self.sender_name, self.sender)) if self.sender_name else self.sender
+        message["To"] = ", ".join(recipients)
+        message["Subject"] = subject
+
+        message.set_content(body, subtype="html")
+
+        return message
+
+    async def _connect(self) -> aiosmtplib.SMTP:
+        smtp = aiosmtplib.SMTP(
+            hostname=self.hostname,
+            port=self.port,
+            username=self.username,
+            password=self.password,
+            start_tls=self.start_tls,
+            validate_certs=self.validate_certs,
+            timeout=self.timeout
+        )
+
+        await smtp.connect()
+
+        return smtp
+
+    async def _acquire(self) -> aiosmtplib.SMTP:
+        while self._idle:
+            smtp = self._idle.pop()
+
+            if smtp.is_connected:
+                return smtp
+
+        return await self._connect()
+
+    async def _release(self, smtp: aiosmtplib.SMTP):
+        if smtp.is_connected and len(self._idle) < self.size:
+            self._idle.append(smtp)
+        else:
+            await self._quit(smtp)
+
+    async def _quit(self, smtp: aiosmtplib.SMTP):
+        try:
+            if smtp.is_connected:
+                await smtp.quit()
+        except aiosmtplib.SMTPException:
+            smtp.close()
+
+    async def _deliver(self, queue: asyncio.Queue, results: List[dict]):
+        smtp = None
+
+        while not queue.empty():
+            position, message = queue.get_nowait()
+
+            # A pooled connection may have been dropped by the server while idle, so retry once on a fresh one
+            for attempt in range(2):
+                try:
+                    if smtp is None:
+                        smtp = await self._acquire()
+
+                    await smtp.send_message(message)
+
+                    results[position] = {"recipients": message["To"], "sent": True, "error": None}
+                    break
+                except aiosmtplib.SMTPServerDisconnected as e:
+                    smtp = None
+                    results[position] = {"recipients": message["To"], "sent": False, "error": str(e)}
+                except Exception as e:
+                    if smtp is not None and not smtp.is_connected:
+                        smtp = None
+
+                    results[position] = {"recipients": message["To"], "sent": False, "error": str(e)}
+                    break
+
+        if smtp is not None:
+            await self._release(smtp)
+
+    async def send_batch(self, messages: List[EmailMessage]) -> List[dict]:
+        queue: asyncio.Queue = asyncio.Queue()
+
+        for position, message in enumerate(messages):
+            queue.put_nowait((position, message))
+
+        results: List[dict] = [{}] * len(messages)
+
+        await asyncio.gather(*(self._deliver(queue, results) for _ in range(min(self.size, len(messages)))))
+
+        return results
+
+    async def close(self):
+        while self._idle:
+            await self._quit(self._idle.pop())
+
+    def run(self, coro):
+        if self._loop is None or self._loop.is_closed():
+            self._loop = asyncio.new_event_loop()
+
+        return self._loop.run_until_complete(coro)
+
+    def send_batch_sync(self, messages: List[EmailMessage]) -> List[dict]:
+        return self.run(self.send_batch(messages))
@@ -0,0 +1,80 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from src.helpers.json_helper import serialized
+from src.schemas.query_types import SortByType
+
+LIST_COLUMNS = ("id", "symbol", "image", "current_price", "market_cap", "market_cap_rank", "price_change_percentage_24h")
+NAME_COLUMNS = ("id", "image", "current_price")
+SORT_COLUMNS: Tuple[str, ...] = SortByType.__args__
+
+
+"""Columnar snapshot of one CoinGecko market page, built once per cache refresh"""
+
+
+class MarketSnapshot:
+    def __init__(self, rows: Iterable[dict]):
+        rows = list(rows)
+
+        self.columns: Dict[str, Tuple] = {column: tuple(row.get(column) for row in rows) for column in LIST_COLUMNS}
+        self.positions: Dict[str, int] = {coin_id: position for position, coin_id in enumerate(self.columns["id"])}
+
+        self.records = {
+            False: self._project(len(rows), LIST_COLUMNS),
+            True: self._project(len(rows), NAME_COLUMNS)
+        }
+        self.serialized = {
+            names: tuple(None if record is None else serialized(record) for record in records)
+            for names, records in self.records.items()
+        }
+
+        self.orderings: Dict[Tuple[str, bool], Tuple[int, ...]] = {}
+        self.ranks: Dict[Tuple[str, bool], Dict[int, int]] = {}
+
+        for column in SORT_COLUMNS:
+            values = self.columns[column]
+            present = [position for position, value in enumerate(values) if value is not None]
+
+            for descending in (False, True):
+                ordering = tuple(sorted(present, key=values.__getitem__, reverse=descending))
+
+                self.orderings[column, descending] = ordering
+                self.ranks[column, descending] = {position: rank for rank, position in enumerate(ordering)}
+
+    def __len__(self):
+        return len(self.columns["id"])
+
+    def _project(self, size: int, columns: Tuple[str, ...]) -> Tuple[Optional[dict], ...]:
+        records = []
+
+        for position in range(size):
+            record = {column: self.columns[column][position] for column in columns}
+            records.append(None if any(value is None for value in record.values()) else record)
+
+        return tuple(records)
+
+    def select(self, names: bool = False, sort_by: str = "current_price", descending: bool = True, ids: Iterable[str] = (), limit: Optional[int] = None) -> List[dict]:
+        return self._select(self.records[bool(names)], sort_by, descending, ids, limit)
+
+    def select_serialized(self, names: bool = False, sort_by: str = "current_price", descending: bool = True, ids: Iterable[str] = (), limit: Optional[int] = None) -> list:
+        return self._select(self.serialized[bool(names)], sort_by, descending, ids, limit)
+
+    def _select(self, records: tuple, sort_by: str, descending: bool, ids: Iterable[str], limit: Optional[int]) -> list:
+        key = (sort_by, descending)
+
+        if ids:
+            rank = self.ranks[key]
+            wanted = {self.positions[coin_id.lower()] for coin_id in ids if coin_id.lower() in self.positions}
+            ordering = sorted((position for position in wanted if position in rank), key=rank.__getitem__)
+        else:
+            ordering = self.orderings[key]
+
+        selected = []
+
+        for position in ordering:
+            if limit is not None and len(selected) >= limit:
+                break
+
+            if records[position] is not None:
+                selected.append(records[position])
+
+        return selected
@@ -0,0 +1,138 @@
+import math
+import warnings
+
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+
+"""Statistics over the price series of many symbols at once, stacked into one NumPy matrix"""
+
+
+def to_matrix(series: Sequence[Sequence[float]]) -> np.ndarray:
+    lengths = {len(prices) for prices in series}
+
+    # Series of equal length (one window of one source) are converted in a single call
+    if len(lengths) == 1:
+        return np.array(series, dtype=np.float64).reshape(len(series), lengths.pop())
+
+    length = max(lengths, default=0)
+    matrix = np.full((len(series), length), np.nan)
+
+    for row, prices in enumerate(series):
+        if len(prices):
+            matrix[row, length - len(prices):] = prices
+
+    return matrix
+
+
+def _first_valid(matrix: np.ndarray) -> np.ndarray:
+    return matrix[np.arange(len(matrix)), np.argmax(~np.isnan(matrix), axis=1)]
+
+
+def _percent(current: np.ndarray, previous: np.ndarray) -> np.ndarray:
+    with np.errstate(divide="ignore", invalid="ignore"):
+        change = (current - previous) / previous * 100
+
+    # The per-ticker helper reported a change from a zero price as 0
+    return np.where(previous == 0, 0.0, change)
+
+
+def high_low(matrix: np.ndarray):
+    return np.nanmax(matrix, axis=1), np.nanmin(matrix, axis=1)
+
+
+def pct_change(matrix: np.ndarray, window: Optional[int] = None) -> np.ndarray:
+    if window is None:
+        return _percent(matrix[:, -1], _first_valid(matrix))
+
+    if window >= matrix.shape[1]:
+        return np.full(len(matrix), np.nan)
+
+    return _percent(matrix[:, -1], matrix[:, -1 - window])
+
+
+def moving_average(matrix: np.ndarray, window: int) -> np.ndarray:
+    if window > matrix.shape[1]:
+        return np.full(len(matrix), np.nan)
+
+    tail = matrix[:, -window:]
+
+    # Only averages over a full window, a series shorter than the window has NaN in its tail
+    return np.where(np.isnan(tail).any(axis=1), np.nan, tail.mean(axis=1))
+
+
+def volatility(matrix: np.ndarray) -> np.ndarray:
+    with np.errstate(divide="ignore", invalid="ignore"):
+        returns = np.diff(np.log(matrix), axis=1)
+
+    valid = (~np.isnan(returns)).sum(axis=1)
+
+    # nanstd warns about rows with less than two returns, those are reported as None anyway
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        deviation = np.nanstd(returns, axis=1, ddof=1)
+
+    return np.where(valid > 1, deviation * 100, np.nan)
+
+
+def max_drawdown(matrix: np.ndarray) -> np.ndarray:
+    peaks = np.fmax.accumulate(matrix, axis=1)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        drawdowns = (matrix - peaks) / peaks * 100
+
+    return np.nanmin(drawdowns, axis=1)
+
+
+def _values(column: np.ndarray) -> List[Optional[float]]:
+    return [None if math.isnan(value) else value for value in column.tolist()]
+
+
+"""Indicators requested through the statistics endpoints, one dict per series"""
+
+
+def compute_indicators(
+    series: Sequence[Sequence[float]],
+    changes: Iterable[int] = (),
+    averages: Iterable[int] = (),
+    with_volatility: bool = False,
+    with_drawdown: bool = False
+) -> List[Dict[str, Optional[float]]]:
+    indicators: List[Dict[str, Optional[float]]] = [{} for _ in series]
+
+    if not series:
+        return indicators
+
+    matrix = to_matrix(series)
+    columns: Dict[str, np.ndarray] = {}
+
+    for window in sorted(set(changes)):
+        columns[f"change_{window}"] = pct_change(matrix, window)
+
+    for window in sorted(set(averages)):
+        columns[f"sma_{window}"] = moving_average(matrix, window)
+
+    if with_volatility:
+        columns["volatility"] = volatility(matrix)
+
+    if with_drawdown:
+        columns["max_drawdown"] = max_drawdown(matrix)
+
+    for name, column in columns.items():
+        for row, value in enumerate(_values(column)):
+            indicators[row][name] = value
+
+    return indicators
+
+
+def with_indicators(stats: List[dict], changes: Iterable[int] = (), averages: Iterable[int] = (), with_volatility: bool = False, with_drawdown: bool = False) -> List[dict]:
+    changes = [window for window in changes if window > 0]
+    averages = [window for window in averages if window > 0]
+
+    if not (changes or averages or with_volatility or with_drawdown):
+        return stats
+
+    indicators = compute_indicators([item["sparkline_in_7d"]["price"] for item in stats], changes, averages, with_volatility, with_drawdown)
+
+    return [{**item, "indicators": values} for item, values in zip(stats, indicators)]
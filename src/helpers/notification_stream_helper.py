@@ -0,0 +1,171 @@
+import asyncio
+import json
+import os
+
+from typing import Dict, List, Optional, Set
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+NOTIF_CHANNEL_PREFIX = os.getenv("NOTIF_CHANNEL_PREFIX", "notifications:")
+# Seconds between comment lines sent on idle streams, so proxies do not close them
+SSE_KEEPALIVE = float(os.getenv("SSE_KEEPALIVE", 15))
+# Events buffered per open stream; a client that falls further behind catches up on reconnect via Last-Event-ID
+SSE_QUEUE_SIZE = int(os.getenv("SSE_QUEUE_SIZE", 100))
+# Seconds to wait before subscribing again after Redis failed
+NOTIF_RETRY_DELAY = float(os.getenv("NOTIF_RETRY_DELAY", 1))
+
+
+def channel_for(uid: int) -> str:
+    return f"{NOTIF_CHANNEL_PREFIX}{uid}"
+
+
+def format_event(notification: dict) -> str:
+    return f"id: {notification['id']}\nevent: notification\ndata: {json.dumps(notification, default=str)}\n\n"
+
+
+"""Event payload of a stored notification, used for both published and backlog events"""
+
+
+def notification_to_dict(notification) -> dict:
+    return {
+        "id": notification.id,
+        "uid": notification.uid,
+        "check_type": notification.check_type,
+        "what_to_check": notification.what_to_check,
+        "operator": notification.operator,
+        "value": notification.value,
+        "currency": notification.currency,
+        "price": notification.price,
+        "created_at": notification.created_at
+    }
+
+
+_publisher = None
+
+
+"""Best effort publishing of freshly stored notifications from the worker"""
+
+
+def publish_notifications(notifications: List[dict]):
+    global _publisher
+
+    if not os.getenv("REDIS_URL"):
+        return
+
+    try:
+        if _publisher is None:
+            import redis
+
+            _publisher = redis.Redis.from_url(os.getenv("REDIS_URL"))
+
+        pipeline = _publisher.pipeline(transaction=False)
+
+        for notification in notifications:
+            pipeline.publish(channel_for(notification["uid"]), json.dumps(notification, default=str))
+
+        pipeline.execute()
+    except Exception:
+        pass
+
+
+"""Fan-out of published notifications to the open SSE streams of one web process"""
+
+
+class NotificationStream:
+    def __init__(self, url: Optional[str] = None, prefix: str = NOTIF_CHANNEL_PREFIX, queue_size: int = SSE_QUEUE_SIZE):
+        self.url = url
+        self.prefix = prefix
+        self.queue_size = queue_size
+
+        self.listeners: Dict[int, Set[asyncio.Queue]] = {}
+
+        self._task = None
+
+    def listen(self, uid: int) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+
+        self.listeners.setdefault(uid, set()).add(queue)
+
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self.run())
+
+        return queue
+
+    def unlisten(self, uid: int, queue: asyncio.Queue):
+        queues = self.listeners.get(uid, set())
+        queues.discard(queue)
+
+        if not queues:
+            self.listeners.pop(uid, None)
+
+        if not self.listeners and self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def dispatch(self, channel: str, data: str):
+        try:
+            uid = int(channel[len(self.prefix):])
+            notification = json.loads(data)
+        except ValueError:
+            return
+
+        for queue in self.listeners.get(uid, ()):
+            try:
+                queue.put_nowait(notification)
+            except asyncio.QueueFull:
+                pass
+
+    async def run(self):
+        import redis.asyncio as aioredis
+
+        while True:
+            client = pubsub = None
+
+            try:
+                client = aioredis.Redis.from_url(self.url or os.getenv("REDIS_URL"), decode_responses=True)
+                pubsub = client.pubsub()
+
+                await pubsub.psubscribe(f"{self.prefix}*")
+
+                async for message in pubsub.listen():
+                    if message["type"] == "pmessage":
+                        self.dispatch(message["channel"], message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # Redis is unreachable or went away, subscribe again after a short pause
+                await asyncio.sleep(NOTIF_RETRY_DELAY)
+            finally:
+                if pubsub is not None:
+                    await pubsub.aclose()
+
+                if client is not None:
+                    await client.aclose()
+
+    async def events(self, uid: int, queue: asyncio.Queue, backlog: List[dict]):
+        try:
+            last_id = 0
+
+            for notification in backlog:
+                last_id = max(last_id, notification["id"])
+                yield format_event(notification)
+
+            while True:
+                try:
+                    notification = await asyncio.wait_for(queue.get(), SSE_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+
+                # Already sent from the backlog, which is read after the queue was registered
+                if notification["id"] <= last_id:
+                    continue
+
+                yield format_event(notification)
+        finally:
+            self.unlisten(uid, queue)
+
+
+notification_stream = NotificationStream()
@@ -0,0 +1,126 @@
+import os
+
+from typing import Dict, Iterable, List, Set, Tuple
+
+import pandas as pd
+
+from dotenv import load_dotenv
+
+from src.models.models import Subscritions
+from src.helpers.cache_helper import cached_call
+from src.helpers.upstream_helper import NoMarketData, coingecko_background, download_quotes
+
+load_dotenv()
+
+# Alert checks run on the background share of the CoinGecko budget
+cg = coingecko_background
+
+# CoinGecko accepts a comma separated list of ids, but very long query strings get rejected
+GECKO_IDS_PER_CALL = int(os.getenv("GECKO_IDS_PER_CALL", 250))
+
+PriceKey = Tuple[str, str, str]
+
+
+def price_key(sub: Subscritions) -> PriceKey:
+    return (sub.check_type, sub.what_to_check, sub.currency)
+
+
+# Task arguments are JSON, which has no tuple keys, so prices travel as [check_type, what_to_check, currency, price] rows
+def prices_to_rows(prices: Dict[PriceKey, float]) -> List[list]:
+    return [[*key, price] for key, price in prices.items()]
+
+
+def prices_from_rows(rows: Iterable[list]) -> Dict[PriceKey, float]:
+    return {(check_type, what_to_check, currency): price for check_type, what_to_check, currency, price in rows}
+
+
+def chunks(items: List[str], size: int):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+"""Collecting distinct (what_to_check, currency) pairs for every check_type"""
+
+
+def group_subscriptions(subs: Iterable[Subscritions]) -> Dict[str, Set[Tuple[str, str]]]:
+    groups: Dict[str, Set[Tuple[str, str]]] = {}
+
+    for sub in subs:
+        groups.setdefault(sub.check_type, set()).add((sub.what_to_check, sub.currency))
+
+    return groups
+
+
+def resolve_crypto_prices(pairs: Set[Tuple[str, str]]) -> Dict[PriceKey, float]:
+    ids = sorted({coin for coin, _ in pairs})
+    currencies = ",".join(sorted({currency for _, currency in pairs}))
+
+    prices: Dict[PriceKey, float] = {}
+
+    for chunk in chunks(ids, GECKO_IDS_PER_CALL):
+        data = cached_call("coingecko", "price", cg.get_price, ids=",".join(chunk), vs_currencies=currencies)
+
+        for coin, quotes in data.items():
+            for currency, price in quotes.items():
+                if price is not None:
+                    prices[("crypto", coin, currency)] = float(price)
+
+    return prices
+
+
+def resolve_stock_prices(pairs: Set[Tuple[str, str]]) -> Dict[PriceKey, float]:
+    tickers = sorted({stock.upper() for stock, _ in pairs})
+
+    if not tickers:
+        return {}
+
+    try:
+        df = cached_call(
+            "yfinance",
+            "download",
+            download_quotes,
+            tickers=tickers,
+            period="5d",
+            group_by="ticker",
+            auto_adjust=False,
+            progress=False
+        )
+    except NoMarketData:
+        return {}
+
+    latest: Dict[str, float] = {}
+
+    for ticker in tickers:
+        try:
+            closes = df[ticker]["Close"] if isinstance(df.columns, pd.MultiIndex) else df["Close"]
+        except KeyError:
+            continue
+
+        closes = closes.dropna()
+
+        if not closes.empty:
+            latest[ticker] = float(closes.iloc[-1])
+
+    # yfinance quotes in the listing currency, so every currency of the subscription shares the price
+    return {
+        ("stock", stock, currency): latest[stock.upper()]
+        for stock, currency in pairs
+        if stock.upper() in latest
+    }
+
+
+"""Resolving prices for all of the subscriptions with as few upstream calls as possible"""
+
+
+def resolve_prices(subs: Iterable[Subscritions]) -> Dict[PriceKey, float]:
+    groups = group_subscriptions(subs)
+
+    prices: Dict[PriceKey, float] = {}
+
+    if groups.get("crypto"):
+        prices.update(resolve_crypto_prices(groups["crypto"]))
+
+    if groups.get("stock"):
+        prices.update(resolve_stock_prices(groups["stock"]))
+
+    return prices
@@ -1,15 +1,88 @@
+import asyncio
+import os
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable
+
 import bcrypt
 
+from dotenv import load_dotenv
 
-async def hashPwd(plainPwd: str):
-    bytePwd = plainPwd.encode('utf-8')
-    saltRounds = bcrypt.gensalt()
+load_dotenv()
 
-    return bcrypt.hashpw(bytePwd, saltRounds)
+# bcrypt cost factor of new hashes, existing hashes with another cost are rehashed on login
+PWD_HASH_ROUNDS = int(os.getenv("PWD_HASH_ROUNDS", 12))
+# Threads doing password work, bcrypt releases the GIL so they run in parallel on separate cores
+PWD_WORKERS = int(os.getenv("PWD_WORKERS", os.cpu_count() or 1))
+# Password operations allowed to wait for a worker before new ones are rejected
+PWD_QUEUE_LIMIT = int(os.getenv("PWD_QUEUE_LIMIT", 32))
 
+pwd_executor = ThreadPoolExecutor(max_workers=PWD_WORKERS, thread_name_prefix="pwd")
 
-async def comparePwds(plainPwd: str, hashedPwd: str):
-    plainPwdBytes = plainPwd.encode('utf-8')
-    hashedPwdBytes = hashedPwd.encode('utf-8')
 
-    return bcrypt.checkpw(plainPwdBytes, hashedPwdBytes)
+class PasswordPoolBusy(Exception):
+    pass
+
+
+"""Admission to the password pool, failing fast once PWD_QUEUE_LIMIT operations are waiting"""
+
+
+class PasswordPool:
+    def __init__(self, executor: ThreadPoolExecutor, workers: int = PWD_WORKERS, queue_limit: int = PWD_QUEUE_LIMIT):
+        self.executor = executor
+        self.capacity = workers + queue_limit
+
+        self.pending = 0
+        self._lock = threading.Lock()
+
+    def _acquire(self):
+        with self._lock:
+            if self.pending >= self.capacity:
+                raise PasswordPoolBusy("Too many password operations in progress")
+
+            self.pending += 1
+
+    def _release(self):
+        with self._lock:
+            self.pending -= 1
+
+    async def run(self, fn: Callable[..., Any], *args) -> Any:
+        self._acquire()
+
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, partial(fn, *args))
+        finally:
+            self._release()
+
+
+pwd_pool = PasswordPool(pwd_executor)
+
+
+def hash_rounds(hashedPwd: str) -> int:
+    # bcrypt hashes look like $2b$<cost>$<salt and hash>
+    try:
+        return int(hashedPwd.split("$")[2])
+    except (IndexError, ValueError):
+        return 0
+
+
+def needs_rehash(hashedPwd: str) -> bool:
+    return hash_rounds(hashedPwd) != PWD_HASH_ROUNDS
+
+
+def _hash(plainPwd: str, rounds: int) -> bytes:
+    return bcrypt.hashpw(plainPwd.encode('utf-8'), bcrypt.gensalt(rounds))
+
+
+def _compare(plainPwd: str, hashedPwd: str) -> bool:
+    return bcrypt.checkpw(plainPwd.encode('utf-8'), hashedPwd.encode('utf-8'))
+
+
+async def hashPwd(plainPwd: str):
+    return await pwd_pool.run(_hash, plainPwd, PWD_HASH_ROUNDS)
+
+
+async def comparePwds(plainPwd: str, hashedPwd: str):
+    return await pwd_pool.run(_compare, plainPwd, hashedPwd)
@@ -0,0 +1,262 @@
+import math
+import os
+import threading
+import time
+
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from dotenv import load_dotenv
+from starlette.datastructures import Headers
+from starlette.requests import cookie_parser
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from src.auth.auth_service import verify_access_token
+
+load_dotenv()
+
+# "memory" keeps buckets per process, "redis" shares them between all web processes
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "redis")
+# Clients tracked by the in-memory buckets, the least recently seen are dropped first
+RATE_LIMIT_MEMORY_SIZE = int(os.getenv("RATE_LIMIT_MEMORY_SIZE", 10000))
+# Seconds the in-memory buckets are used after Redis failed, before Redis is tried again
+RATE_LIMIT_REDIS_RETRY = float(os.getenv("RATE_LIMIT_REDIS_RETRY", 5))
+
+# Limits as "<requests>/<seconds>": "5/60" allows a burst of 5 and refills a token every 12s, "0" disables one
+RATE_LIMITS = {
+    "login": os.getenv("RATE_LIMIT_LOGIN", "5/60"),
+    "register": os.getenv("RATE_LIMIT_REGISTER", "3/600"),
+    "alert": os.getenv("RATE_LIMIT_ALERT", "20/60"),
+    "market": os.getenv("RATE_LIMIT_MARKET", "120/60"),
+    # Price socket connects and subscribe messages, checked by the socket handler itself
+    "ws": os.getenv("RATE_LIMIT_WS", "20/60"),
+}
+
+# (method or None for any, path prefix, limit, counted per user when logged in)
+RATE_LIMIT_ROUTES = (
+    ("POST", "/auth/login", "login", False),
+    ("POST", "/auth/register", "register", False),
+    ("POST", "/alert/", "alert", True),
+    (None, "/crypto/", "market", True),
+    (None, "/stock/", "market", True),
+)
+
+
+def parse_limit(limit: str) -> Optional[Tuple[float, float]]:
+    if not limit or limit.strip() == "0":
+        return None
+
+    requests, seconds = limit.split("/")
+
+    # Refill rate in tokens per second and bucket capacity
+    return int(requests) / float(seconds), float(requests)
+
+
+"""Token bucket of one client, in the same arithmetic as the Lua script below"""
+
+
+def take_token(tokens: float, updated: float, now: float, rate: float, capacity: float, reserve: float = 0.0) -> Tuple[bool, float, float]:
+    tokens = min(capacity, tokens + max(0.0, now - updated) * rate)
+
+    if tokens >= 1 + reserve:
+        return True, tokens - 1, 0.0
+
+    return False, tokens, (1 + reserve - tokens) / rate
+
+
+class MemoryBuckets:
+    def __init__(self, max_entries: int = RATE_LIMIT_MEMORY_SIZE, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.clock = clock
+
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take_sync(self, key: str, rate: float, capacity: float, reserve: float = 0.0) -> Tuple[bool, float, float]:
+        now = self.clock()
+
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (capacity, now))
+            allowed, tokens, wait = take_token(tokens, updated, now, rate, capacity, reserve)
+
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+
+            while len(self._buckets) > self.max_entries:
+                self._buckets.popitem(last=False)
+
+        return allowed, wait, tokens
+
+    async def take(self, key: str, rate: float, capacity: float, reserve: float = 0.0) -> Tuple[bool, float, float]:
+        return self.take_sync(key, rate, capacity, reserve)
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+"""Atomic token bucket in Redis, on the Redis clock so all web processes share it"""
+TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local reserve = tonumber(ARGV[3]) or 0
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(bucket[1]) or capacity
+local updated = tonumber(bucket[2]) or now
+
+tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate)
+
+local allowed = 0
+local wait = 0
+
+if tokens >= 1 + reserve then
+    tokens = tokens - 1
+    allowed = 1
+else
+    wait = (1 + reserve - tokens) / rate
+end
+
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate * 1000))
+
+-- Redis truncates Lua numbers to integers
+return {allowed, tostring(wait), tostring(tokens)}
+"""
+
+
+class RedisBuckets:
+    def __init__(self, url: str, prefix: str = "rate-limit:"):
+        self.url = url
+        self.prefix = prefix
+
+        self._script = None
+        self._sync_script = None
+
+    async def take(self, key: str, rate: float, capacity: float, reserve: float = 0.0) -> Tuple[bool, float, float]:
+        if self._script is None:
+            import redis.asyncio as aioredis
+
+            client = aioredis.Redis.from_url(self.url, socket_timeout=0.5, socket_connect_timeout=0.5)
+            self._script = client.register_script(TOKEN_BUCKET_SCRIPT)
+
+        allowed, wait, tokens = await self._script(keys=[self.prefix + key], args=[rate, capacity, reserve])
+
+        return bool(allowed), float(wait), float(tokens)
+
+    # Used from the celery worker, which has no event loop
+    def take_sync(self, key: str, rate: float, capacity: float, reserve: float = 0.0) -> Tuple[bool, float, float]:
+        if self._sync_script is None:
+            import redis
+
+            client = redis.Redis.from_url(self.url, socket_timeout=0.5, socket_connect_timeout=0.5)
+            self._sync_script = client.register_script(TOKEN_BUCKET_SCRIPT)
+
+        allowed, wait, tokens = self._sync_script(keys=[self.prefix + key], args=[rate, capacity, reserve])
+
+        return bool(allowed), float(wait), float(tokens)
+
+
+"""Rate limiter over Redis buckets with the in-memory ones as fallback"""
+
+
+class RateLimiter:
+    def __init__(self, limits: Dict[str, str] = RATE_LIMITS, remote: Optional[RedisBuckets] = None, local: Optional[MemoryBuckets] = None):
+        self.limits = {name: parse_limit(limit) for name, limit in limits.items()}
+        self.remote = remote
+        self.local = local or MemoryBuckets()
+
+        self._remote_down_until = 0.0
+
+    async def hit(self, name: str, client: str) -> Tuple[bool, float]:
+        limit = self.limits.get(name)
+
+        if limit is None:
+            return True, 0.0
+
+        rate, capacity = limit
+        key = f"{name}:{client}"
+
+        if self.remote is not None and time.monotonic() >= self._remote_down_until:
+            try:
+                allowed, wait, _ = await self.remote.take(key, rate, capacity)
+
+                return allowed, wait
+            except Exception:
+                self._remote_down_until = time.monotonic() + RATE_LIMIT_REDIS_RETRY
+
+        allowed, wait, _ = await self.local.take(key, rate, capacity)
+
+        return allowed, wait
+
+
+def create_rate_limiter() -> RateLimiter:
+    remote = None
+
+    if RATE_LIMIT_BACKEND == "redis" and os.getenv("REDIS_URL"):
+        remote = RedisBuckets(os.getenv("REDIS_URL"))
+
+    return RateLimiter(remote=remote)
+
+
+rate_limiter = create_rate_limiter()
+
+
+def match_route(method: str, path: str) -> Optional[Tuple[str, bool]]:
+    for route_method, prefix, name, per_user in RATE_LIMIT_ROUTES:
+        if (route_method is None or route_method == method) and path.startswith(prefix):
+            return name, per_user
+
+    return None
+
+
+def client_key(scope: Scope, per_user: bool) -> str:
+    if per_user:
+        access_token = cookie_parser(Headers(scope=scope).get("cookie", "")).get("access_token")
+
+        # Verified claims are cached, so this is no extra decode for the handler's own auth check
+        try:
+            if access_token:
+                return f"user:{verify_access_token(access_token)['uid']}"
+        except Exception:
+            pass
+
+    # Behind a proxy uvicorn's --proxy-headers puts the forwarded address here
+    client = scope.get("client")
+
+    return f"ip:{client[0] if client else 'unknown'}"
+
+
+"""Answering requests over the limit of their route with 429 before they reach the handlers"""
+
+
+class RateLimitMiddleware:
+    def __init__(self, app: ASGIApp, limiter: Optional[RateLimiter] = None):
+        self.app = app
+        self.limiter = limiter or rate_limiter
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        route = match_route(scope["method"], scope["path"])
+
+        if route is not None:
+            name, per_user = route
+            allowed, wait = await self.limiter.hit(name, client_key(scope, per_user))
+
+            if not allowed:
+                response = JSONResponse(
+                    status_code=429,
+                    content={"detail": "Too many requests, try again later"},
+                    headers={"Retry-After": str(max(1, math.ceil(wait)))}
+                )
+
+                await response(scope, receive, send)
+                return
+
+        await self.app(scope, receive, send)
@@ -2,13 +2,13 @@ import random
 
 from fastapi.responses import Response
 from fastapi.requests import Request
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from src.celery_worker import send_email
 from src.models.models import Verifications, User
 
-from src.database.db import session
 
-
-def send_verification_email(email: str, res: Response):
+async def send_verification_email(session: AsyncSession, email: str, res: Response):
     code = random.randint(1000, 9999)
 
     verification_content = f"""
@@ -34,7 +34,7 @@ def send_verification_email(email: str, res: Response):
     verification = (Verifications(email=email, code=code))
 
     session.add(verification)
-    session.commit()
+    await session.commit()
 
     res.set_cookie(
         key="user_email",
@@ -46,32 +46,33 @@ def send_verification_email(email: str, res: Response):
     )
 
 
-def check_code(req: Request, code: str):
+async def check_code(session: AsyncSession, req: Request, code: str):
     user_email = req.cookies.get("user_email")
 
     if not user_email:
         return False
 
     verif, user = (
-        session.query(Verifications, User)
-        .join(User, User.email == Verifications.email)
-        .filter(Verifications.email == user_email)
-        .first()
-    )
+        await session.execute(
+            select(Verifications, User)
+            .join(User, User.email == Verifications.email)
+            .where(Verifications.email == user_email)
+        )
+    ).first()
 
     if verif and code == verif.code and user:
         user.verified = True
-        session.delete(verif)
+        await session.delete(verif)
 
-        session.commit()
+        await session.commit()
 
         return True
     else:
         return False
 
 
-def check_verified(email: str):
-    current_user = session.query(User).filter(User.email == email).first()
+async def check_verified(session: AsyncSession, email: str):
+    current_user = (await session.scalars(select(User).where(User.email == email))).first()
 
     if current_user.verified:
         return True
@@ -0,0 +1,40 @@
+import base64
+
+from typing import List, Optional
+
+import numpy as np
+
+from src.schemas.query_types import SparklineEncodingType
+
+
+"""Compact encodings of the 7 day sparkline for bandwidth constrained clients"""
+
+
+def downsample(prices: np.ndarray, points: Optional[int]) -> np.ndarray:
+    if not points or len(prices) <= points:
+        return prices
+
+    return prices[np.linspace(0, len(prices) - 1, points).round().astype(int)]
+
+
+def encode_sparkline(prices: List[float], encoding: SparklineEncodingType = "full", points: Optional[int] = None) -> dict:
+    values = downsample(np.asarray(prices, dtype=np.float64), points)
+
+    if encoding == "full":
+        return {"price": values.tolist()}
+
+    if encoding == "delta":
+        values = np.diff(values, prepend=0.0)
+
+    return {
+        "encoding": encoding,
+        "length": len(values),
+        "data": base64.b64encode(values.astype("<f4").tobytes()).decode("ascii")
+    }
+
+
+def compact_statistics(stats: List[dict], encoding: SparklineEncodingType = "full", points: Optional[int] = None) -> List[dict]:
+    if encoding == "full" and not points:
+        return stats
+
+    return [{**item, "sparkline_in_7d": encode_sparkline(item["sparkline_in_7d"]["price"], encoding, points)} for item in stats]
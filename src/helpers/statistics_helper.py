@@ -1,66 +1,228 @@
+import asyncio
+import calendar
+import math
 import os
+import time
 
-from typing import List
+from typing import Dict, List
 
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta, timezone
 
 from dotenv import load_dotenv
 
-from pycoingecko import CoinGeckoAPI
-import yfinance as yf
+import pandas as pd
+
+from src.helpers.cache_helper import cached_call, acached_call, METADATA_CACHE_TTL
+from src.helpers.ticker_meta_helper import get_ticker_info, ticker_store
+from src.helpers.history_helper import HOUR, Point, history_store, hourly_points
+from src.helpers.market_stats_helper import high_low, pct_change, to_matrix
+from src.helpers.upstream_helper import NoMarketData, coingecko, download_quotes, run_blocking
 
 load_dotenv()
 
-cg = CoinGeckoAPI(demo_api_key=os.getenv('GECKO_API_KEY'))
+# Upper bound of metadata lookups one statistics request runs at the same time
+STATS_META_CONCURRENCY = int(os.getenv("STATS_META_CONCURRENCY", 8))
+# Relative difference between a stored close and the downloaded one that counts as rewritten upstream
+HISTORY_MISMATCH_TOLERANCE = float(os.getenv("HISTORY_MISMATCH_TOLERANCE", 0.001))
 
+cg = coingecko
 
-def get_stock_price_change(curr_price, oldest_price):
-    if oldest_price == 0:
-        return 0
-    percentage = ((curr_price - oldest_price) / oldest_price) * 100
-    return percentage
 
+def day_ts(day: date) -> int:
+    return calendar.timegm(day.timetuple())
 
-async def get_stock_stats(stock_names: List[str]):
-    start_date = (datetime.today() - timedelta(days=21)).strftime("%Y-%m-%d")
 
-    res = []
+def get_history(df: pd.DataFrame, ticker: str) -> List[Point]:
+    try:
+        closes = df[ticker]["Close"] if isinstance(df.columns, pd.MultiIndex) else df["Close"]
+    except KeyError:
+        return []
+
+    return [(day_ts(index.date()), float(close)) for index, close in closes.dropna().items()]
+
+
+def matches_stored(stored: List[Point], downloaded: List[Point]) -> bool:
+    closes = dict(stored)
+
+    return all(math.isclose(closes[ts], close, rel_tol=HISTORY_MISMATCH_TOLERANCE) for ts, close in downloaded if ts in closes)
+
 
-    for stock in stock_names:
-        df = yf.download(
-            stock.upper(),
-            start=start_date,
+async def download_closes(tickers: List[str], start: date) -> pd.DataFrame:
+    try:
+        return await run_blocking(
+            cached_call,
+            "yfinance",
+            "download",
+            download_quotes,
+            tickers=tickers,
+            start=start.strftime("%Y-%m-%d"),
+            group_by="ticker",
             auto_adjust=False,
             progress=False
         )
+    except NoMarketData:
+        # Tickers without a downloaded close keep their stored history
+        return pd.DataFrame()
+
+
+"""Daily closes since start, only the tail after the last stored day is downloaded"""
+
+
+async def load_stock_history(tickers: List[str], start: date) -> Dict[str, List[Point]]:
+    today = date.today()
+
+    stored = await run_blocking(history_store.read, "stock", tickers, day_ts(start))
+    last_days = {
+        ticker: datetime.fromtimestamp(points[-1][0], timezone.utc).date()
+        for ticker, points in stored.items() if points
+    }
+
+    tail_start = min(last_days[ticker] + timedelta(days=1) if ticker in last_days else start for ticker in stored)
+
+    # Nothing can be missing when no trading day passed since the last stored close (weekends)
+    if pd.bdate_range(tail_start, today).empty:
+        return stored
+
+    # The Close of yfinance is split-adjusted, a split rewrites every close before it. The last stored
+    # day is downloaded again to check it against the store, tickers that differ are refetched in full
+    df = await download_closes(tickers, min(last_days.get(ticker, start) for ticker in stored))
+
+    history = {}
+    closed = []
+    rewritten = []
+
+    for ticker, points in stored.items():
+        downloaded = get_history(df, ticker)
+
+        if not matches_stored(points, downloaded):
+            rewritten.append(ticker)
+            continue
+
+        last_stored = points[-1][0] if points else -1
+        tail = [(ts, close) for ts, close in downloaded if ts > last_stored]
+
+        closed.extend((ticker, ts, close) for ts, close in tail if ts < day_ts(today))
+        history[ticker] = points + tail
+
+    if rewritten:
+        await run_blocking(history_store.delete, "stock", rewritten)
+
+        df = await download_closes(rewritten, start)
+
+        for ticker in rewritten:
+            history[ticker] = get_history(df, ticker)
+            closed.extend((ticker, ts, close) for ts, close in history[ticker] if ts < day_ts(today))
+
+    if closed:
+        await run_blocking(history_store.append, "stock", closed)
+
+    return history
+
 
-        closes = df['Close'].squeeze().tolist()
+"""Metadata from the local ticker store, falling back to yfinance (cached) for tickers it does not know"""
 
-        stock_info = yf.Ticker(stock.upper())
-        info = stock_info.info
 
-        data = {
-            'name': stock.upper(),
-            'image': f"https://logo.clearbit.com/{info.get('website', stock.lower())}",
-            'current_price': closes[-1],
-            'high': max(closes),
-            'low': min(closes),
+async def get_ticker_meta(ticker: str, semaphore: asyncio.Semaphore) -> dict:
+    stored = ticker_store.get(ticker)
+
+    if stored:
+        return stored
+
+    async with semaphore:
+        try:
+            return await run_blocking(cached_call, "yfinance", "info", get_ticker_info, ttl=METADATA_CACHE_TTL, ticker=ticker)
+        except Exception:
+            return {}
+
+
+"""Statistics of several stocks over the 21 day window, with the ticker metadata resolved concurrently"""
+
+
+async def get_stock_stats(stock_names: List[str]):
+    start_date = date.today() - timedelta(days=21)
+
+    tickers = [stock.upper() for stock in stock_names]
+    unique_tickers = sorted(set(tickers))
+
+    semaphore = asyncio.Semaphore(STATS_META_CONCURRENCY)
+
+    history, *metas = await asyncio.gather(
+        load_stock_history(unique_tickers, start_date),
+        *(get_ticker_meta(ticker, semaphore) for ticker in unique_tickers)
+    )
+
+    meta = dict(zip(unique_tickers, metas))
+    closes = {ticker: [close for _, close in history[ticker]] for ticker in unique_tickers}
+
+    for ticker in unique_tickers:
+        if not closes[ticker]:
+            raise ValueError(f"No data found for {ticker}")
+
+    matrix = to_matrix([closes[ticker] for ticker in unique_tickers])
+    highs, lows = high_low(matrix)
+    change_window, change_day = pct_change(matrix), pct_change(matrix, 1)
+
+    row = {ticker: position for position, ticker in enumerate(unique_tickers)}
+
+    return [
+        {
+            'name': ticker,
+            'image': f"https://logo.clearbit.com/{meta[ticker].get('website') or ticker.lower()}",
+            'current_price': closes[ticker][-1],
+            'high': float(highs[row[ticker]]),
+            'low': float(lows[row[ticker]]),
             'sparkline_in_7d': {
-                'price': closes
+                'price': closes[ticker]
             },
-            'price_change_percentage_7d_in_currency': get_stock_price_change(closes[0], closes[-1]),
-            'price_change_percentage_24h': get_stock_price_change(closes[-2], closes[-1])
+            'price_change_percentage_7d_in_currency': float(change_window[row[ticker]]),
+            'price_change_percentage_24h': float(change_day[row[ticker]])
         }
+        for ticker in tickers
+    ]
 
-        res.append(data)
 
-    return res
+"""Hourly prices of the last 7 days, upstream is asked at most once an hour for the missing tail"""
 
 
-async def get_coin_stats(coin_name: str):
-    res = cg.get_coins_markets(vs_currency="usd",
-                               ids=coin_name,
-                               price_change_percentage="24,7d",
-                               sparkline=True)
+async def get_coin_sparkline(coin: str, current_price: float) -> List[float]:
+    now = int(time.time())
+    current_hour = now // HOUR * HOUR
+    since = current_hour - 7 * 24 * HOUR
+
+    points = (await run_blocking(history_store.read, "crypto", [coin], since))[coin]
+    last_stored = points[-1][0] if points else since - HOUR
+
+    if last_stored < current_hour - HOUR and await run_blocking(history_store.last_fetch, "crypto", coin) < current_hour:
+        try:
+            if points:
+                chart = await cg.get_coin_market_chart_range_by_id(coin, "usd", from_timestamp=last_stored + HOUR, to_timestamp=now)
+            else:
+                chart = await cg.get_coin_market_chart_by_id(coin, "usd", days=7)
+
+            tail = hourly_points(chart.get("prices", []), last_stored, current_hour)
 
-    return res
+            await run_blocking(history_store.append, "crypto", [(coin, ts, price) for ts, price in tail])
+
+            points = points + tail
+        except Exception:
+            # A sparkline missing its last hours is better than none
+            if not points:
+                raise
+
+        await run_blocking(history_store.record_fetch, "crypto", coin, now)
+
+    return [price for _, price in points] + [current_price]
+
+
+async def get_coin_stats(coin_name: str):
+    res = await acached_call("coingecko",
+                             "coins_markets",
+                             cg.get_coins_markets,
+                             vs_currency="usd",
+                             ids=coin_name,
+                             price_change_percentage="24,7d")
+
+    return [
+        {**coin, "sparkline_in_7d": {"price": await get_coin_sparkline(coin["id"], coin["current_price"])}}
+        for coin in res
+    ]
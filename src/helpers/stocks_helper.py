@@ -1,10 +1,12 @@
 from fastapi import HTTPException
 import pandas as pd
 
-import yfinance as yf
-
 from datetime import datetime
 
+from src.helpers.cache_helper import MARKET_STALE_TTL, cached_call
+from src.helpers.ticker_meta_helper import ticker_store
+from src.helpers.upstream_helper import NoMarketData, download_quotes, run_blocking
+
 
 def get_stocks():
     return [
@@ -28,7 +30,12 @@ async def get_stock_price(
 
             stocks = get_stocks()
 
-            df = yf.download(
+            df = await run_blocking(
+                cached_call,
+                "yfinance",
+                "download",
+                download_quotes,
+                stale_ttl=MARKET_STALE_TTL,
                 tickers=stocks,
                 start=datetime.today().strftime('%Y-%m-%d'),
                 group_by='ticker',
@@ -44,18 +51,15 @@ async def get_stock_price(
                         if pd.isna(data["Volume"]):
                             continue
 
-                        stock_info = yf.Ticker(ticker=ticker)
-                        info = stock_info.info
-
                         res.append({
                             "id": ticker,
-                            'image': f"https://logo.clearbit.com/{info.get('website', ticker.lower())}",
+                            'image': ticker_store.logo_url(ticker),
                             "date": df[ticker].index[-1].strftime('%Y-%m-%d'),
                             "open": float(data["Open"]),
                             "current_price": float(data["Close"]),
                             "high": float(data["High"]),
                             "low": float(data["Low"]),
-                            "market_cap": info.get('marketCap', 0)
+                            "market_cap": ticker_store.get(ticker).get('market_cap', 0)
                             # "price_change_percentage_24h": price_stats["price_change_percentage_24h"]
                         })
                 except Exception:
@@ -67,25 +71,27 @@ async def get_stock_price(
 
             return res
         else:
-            df = yf.download(
-                stock_name.upper(),
-                start=datetime.today().strftime('%Y-%m-%d'),
-                auto_adjust=False,
-                progress=False
-            )
-
-            if df.empty:
+            try:
+                df = await run_blocking(
+                    cached_call,
+                    "yfinance",
+                    "download",
+                    download_quotes,
+                    stale_ttl=MARKET_STALE_TTL,
+                    tickers=stock_name.upper(),
+                    start=datetime.today().strftime('%Y-%m-%d'),
+                    auto_adjust=False,
+                    progress=False
+                )
+            except NoMarketData:
                 raise HTTPException(status_code=409, detail=[{"msg": f"No data found for {stock_name}"}])
 
             res = []
             latest = df.iloc[-1]
 
-            stock_info = yf.Ticker(ticker=stock_name)
-            info = stock_info.info
-
             res.append({
                 "id": stock_name.upper(),
-                'image': f"https://logo.clearbit.com/{info.get('website', stock_name.lower())}",
+                'image': ticker_store.logo_url(stock_name),
                 "date": df.index[-1].strftime('%Y-%m-%d'),
                 "open": float(latest["Open"].iloc[-1]),
                 "current_price": float(latest["Close"].iloc[-1]),
@@ -1,14 +1,15 @@
 from fastapi import HTTPException
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
 from src.schemas.request_types import NotifyRequest
 from src.models.models import Subscritions, User
-from src.database.db import session
 
 
-async def addSubscription(payload: NotifyRequest, uid: int):
-    user = session.query(User).filter(User.id == uid).first()
-    users_subscriptions = session.query(Subscritions).filter(Subscritions.uid == uid).all()
+async def addSubscription(session: AsyncSession, payload: NotifyRequest, uid: int):
+    user = await session.get(User, int(uid))
+    subscriptions_count = await session.scalar(select(func.count()).select_from(Subscritions).where(Subscritions.uid == int(uid)))
 
-    if (not user.premium and len(users_subscriptions) >= 4) or (user.premium and len(users_subscriptions) >= 25):
+    if (not user.premium and subscriptions_count >= 4) or (user.premium and subscriptions_count >= 25):
         return HTTPException(status_code=409, detail="You reached the limit for subscriptions")
 
     try:
@@ -19,13 +20,13 @@ async def addSubscription(payload: NotifyRequest, uid: int):
         subscription = (Subscritions(**data))
 
         session.add(subscription)
-        session.commit()
+        await session.commit()
 
         return {
             "detail": "Your subscribtion was successfully created!"
         }
     except Exception as e:
-        session.rollback()
+        await session.rollback()
 
         raise HTTPException(status_code=400, detail=f"Something went wrong {e}")
 
@@ -0,0 +1,108 @@
+import json
+import os
+import threading
+
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Iterable, Optional
+
+import yfinance as yf
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# The project directory is mounted into both the web and the celery containers, so the file is shared
+TICKER_META_PATH = os.getenv(
+    "TICKER_META_PATH",
+    str(Path(__file__).resolve().parents[2] / ".cache" / "ticker_metadata.json")
+)
+
+
+def get_ticker_info(ticker: str):
+    return yf.Ticker(ticker=ticker).info
+
+
+"""Local store of slow changing ticker metadata (name, website, market cap)"""
+
+
+class TickerMetadataStore:
+    def __init__(self, path: str = TICKER_META_PATH):
+        self.path = path
+
+        self._data: dict = {}
+        self._mtime: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def _reload(self):
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except OSError:
+            return
+
+        if mtime == self._mtime:
+            return
+
+        with self._lock:
+            try:
+                with open(self.path, "r", encoding="utf-8") as file:
+                    self._data = json.load(file)
+
+                self._mtime = mtime
+            except (OSError, ValueError):
+                pass
+
+    def all(self) -> dict:
+        self._reload()
+
+        return self._data
+
+    def is_empty(self) -> bool:
+        return not self.all()
+
+    def get(self, ticker: str) -> dict:
+        return self.all().get(ticker.upper(), {})
+
+    def logo_url(self, ticker: str) -> str:
+        return f"https://logo.clearbit.com/{self.get(ticker).get('website') or ticker.lower()}"
+
+    def update(self, entries: dict):
+        data = {**self.all(), **entries}
+
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+
+        tmp_path = f"{self.path}.tmp"
+
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(data, file)
+
+        os.replace(tmp_path, self.path)
+
+        with self._lock:
+            self._data = data
+            self._mtime = os.stat(self.path).st_mtime
+
+    def refresh(self, tickers: Iterable[str], fetch_info: Callable[[str], dict] = get_ticker_info) -> int:
+        entries = {}
+        updated_at = datetime.now().isoformat()
+
+        for ticker in tickers:
+            try:
+                info = fetch_info(ticker)
+            except Exception:
+                continue
+
+            entries[ticker.upper()] = {
+                "name": info.get("shortName") or info.get("longName") or ticker.upper(),
+                "website": info.get("website"),
+                "market_cap": info.get("marketCap", 0),
+                "updated_at": updated_at
+            }
+
+        if entries:
+            self.update(entries)
+
+        return len(entries)
+
+
+ticker_store = TickerMetadataStore()
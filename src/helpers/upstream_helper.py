@@ -0,0 +1,217 @@
+import asyncio
+import os
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Optional
+
+import httpx
+import yfinance as yf
+
+from dotenv import load_dotenv
+
+from src.helpers.upstream_quota_helper import BACKGROUND, GECKO_MAX_RETRIES, GECKO_MAX_WAIT, INTERACTIVE, UpstreamQuota, gecko_quota, retry_delay
+
+load_dotenv()
+
+GECKO_BASE_URL = os.getenv("GECKO_BASE_URL", "https://api.coingecko.com/api/v3")
+GECKO_TIMEOUT = float(os.getenv("GECKO_TIMEOUT", 10))
+# Threads used for blocking SDK calls (yfinance, stripe) made from async handlers
+UPSTREAM_WORKERS = int(os.getenv("UPSTREAM_WORKERS", 32))
+
+upstream_executor = ThreadPoolExecutor(max_workers=UPSTREAM_WORKERS, thread_name_prefix="upstream")
+
+
+class NoMarketData(Exception):
+    pass
+
+
+"""yf.download that raises when nothing came back, so an empty frame is never cached"""
+
+
+def download_quotes(**params):
+    df = yf.download(**params)
+
+    if df is None or df.dropna(how="all").empty:
+        raise NoMarketData(f"yfinance returned no data for {params.get('tickers')}")
+
+    return df
+
+
+"""Running a blocking call in the upstream thread pool, so the event loop keeps serving other requests"""
+
+
+async def run_blocking(fn: Callable[..., Any], *args, **kwargs):
+    loop = asyncio.get_running_loop()
+
+    return await loop.run_in_executor(upstream_executor, partial(fn, *args, **kwargs))
+
+
+def format_params(params: dict) -> dict:
+    formatted = {}
+
+    for name, value in params.items():
+        if value is None:
+            continue
+
+        if isinstance(value, bool):
+            value = str(value).lower()
+        elif isinstance(value, (list, tuple, set)):
+            value = ",".join(str(item) for item in value)
+
+        formatted[name] = value
+
+    return formatted
+
+
+def gecko_headers(api_key: Optional[str]) -> dict:
+    return {"x-cg-demo-api-key": api_key} if api_key else {}
+
+
+"""Delay before retrying a 429, None when the call should fail instead"""
+
+
+def retry_after_429(res: httpx.Response, attempt: int, max_retries: int, priority: str, quota: Optional[UpstreamQuota]) -> Optional[float]:
+    if res.status_code != 429:
+        return None
+
+    if quota is not None:
+        quota.record_rate_limited()
+
+    if attempt >= max_retries:
+        return None
+
+    delay = retry_delay(attempt, res.headers.get("retry-after"))
+
+    return delay if delay <= GECKO_MAX_WAIT[priority] else None
+
+
+"""Async CoinGecko client built on httpx, mirrors the pycoingecko methods used by the routes"""
+
+
+class AsyncCoinGeckoAPI:
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        base_url: str = GECKO_BASE_URL,
+        timeout: float = GECKO_TIMEOUT,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+        quota: Optional[UpstreamQuota] = None,
+        priority: str = INTERACTIVE,
+        max_retries: int = 0
+    ):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.timeout = timeout
+        self.transport = transport
+        self.quota = quota
+        self.priority = priority
+        self.max_retries = max_retries
+
+        self._client: Optional[httpx.AsyncClient] = None
+        self._client_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+
+        # httpx connection pools belong to the event loop that created them
+        if self._client is None or self._client_loop is not loop or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers=gecko_headers(self.api_key),
+                timeout=self.timeout,
+                transport=self.transport
+            )
+            self._client_loop = loop
+
+        return self._client
+
+    async def request(self, path: str, **params):
+        attempt = 0
+
+        while True:
+            if self.quota is not None:
+                await self.quota.acquire(self.priority)
+
+            res = await self._get_client().get(path, params=format_params(params))
+            delay = retry_after_429(res, attempt, self.max_retries, self.priority, self.quota)
+
+            if delay is None:
+                break
+
+            attempt += 1
+            await asyncio.sleep(delay)
+
+        res.raise_for_status()
+
+        return res.json()
+
+    async def get_coins_markets(self, vs_currency: str, **kwargs):
+        return await self.request("/coins/markets", vs_currency=vs_currency, **kwargs)
+
+    async def get_price(self, ids, vs_currencies, **kwargs):
+        return await self.request("/simple/price", ids=ids, vs_currencies=vs_currencies, **kwargs)
+
+    async def get_coin_market_chart_by_id(self, id: str, vs_currency: str, days, **kwargs):
+        return await self.request(f"/coins/{id}/market_chart", vs_currency=vs_currency, days=days, **kwargs)
+
+    async def get_coin_market_chart_range_by_id(self, id: str, vs_currency: str, from_timestamp: int, to_timestamp: int, **kwargs):
+        return await self.request(f"/coins/{id}/market_chart/range", vs_currency=vs_currency, to=to_timestamp, **{"from": from_timestamp}, **kwargs)
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+"""Blocking counterpart of AsyncCoinGeckoAPI for the celery worker"""
+
+
+class CoinGeckoAPI:
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        base_url: str = GECKO_BASE_URL,
+        timeout: float = GECKO_TIMEOUT,
+        transport: Optional[httpx.BaseTransport] = None,
+        quota: Optional[UpstreamQuota] = None,
+        priority: str = BACKGROUND,
+        max_retries: int = 0
+    ):
+        self.quota = quota
+        self.priority = priority
+        self.max_retries = max_retries
+
+        self.client = httpx.Client(base_url=base_url, headers=gecko_headers(api_key), timeout=timeout, transport=transport)
+
+    def request(self, path: str, **params):
+        attempt = 0
+
+        while True:
+            if self.quota is not None:
+                self.quota.acquire_sync(self.priority)
+
+            res = self.client.get(path, params=format_params(params))
+            delay = retry_after_429(res, attempt, self.max_retries, self.priority, self.quota)
+
+            if delay is None:
+                break
+
+            attempt += 1
+            time.sleep(delay)
+
+        res.raise_for_status()
+
+        return res.json()
+
+    def get_coins_markets(self, vs_currency: str, **kwargs):
+        return self.request("/coins/markets", vs_currency=vs_currency, **kwargs)
+
+    def get_price(self, ids, vs_currencies, **kwargs):
+        return self.request("/simple/price", ids=ids, vs_currencies=vs_currencies, **kwargs)
+
+
+# The clients every module uses, so all CoinGecko calls of a process go through one budget
+coingecko = AsyncCoinGeckoAPI(api_key=os.getenv('GECKO_API_KEY'), quota=gecko_quota, max_retries=GECKO_MAX_RETRIES)
+coingecko_background = CoinGeckoAPI(api_key=os.getenv('GECKO_API_KEY'), quota=gecko_quota, max_retries=GECKO_MAX_RETRIES)
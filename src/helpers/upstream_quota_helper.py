@@ -0,0 +1,172 @@
+import asyncio
+import os
+import random
+import threading
+import time
+
+from typing import Optional, Tuple
+
+from dotenv import load_dotenv
+
+from src.helpers.rate_limit_helper import MemoryBuckets, RedisBuckets
+
+load_dotenv()
+
+INTERACTIVE = "interactive"
+BACKGROUND = "background"
+
+# Calls per minute allowed for the API key, shared by every web and worker process
+GECKO_RATE_LIMIT = int(os.getenv("GECKO_RATE_LIMIT", 30))
+# Calls of the budget background jobs (alert checks) leave to user requests
+GECKO_INTERACTIVE_RESERVE = float(os.getenv("GECKO_INTERACTIVE_RESERVE", 10))
+# Seconds a call may wait for budget before failing, user requests give up much sooner than jobs
+GECKO_MAX_WAIT = {
+    INTERACTIVE: float(os.getenv("GECKO_MAX_WAIT", 5)),
+    BACKGROUND: float(os.getenv("GECKO_BACKGROUND_MAX_WAIT", 120)),
+}
+# Retries of a call answered with 429, each one after an exponential, jittered delay
+GECKO_MAX_RETRIES = int(os.getenv("GECKO_MAX_RETRIES", 3))
+GECKO_RETRY_BASE = float(os.getenv("GECKO_RETRY_BASE", 1))
+# Seconds the in-process budget is used after Redis failed, before Redis is tried again
+GECKO_QUOTA_REDIS_RETRY = float(os.getenv("GECKO_QUOTA_REDIS_RETRY", 5))
+
+
+class QuotaExceeded(Exception):
+    pass
+
+
+def retry_delay(attempt: int, retry_after: Optional[str] = None) -> float:
+    try:
+        # Retry-After in seconds is the minimum, the jitter spreads the retries of the processes
+        minimum = max(float(retry_after), 0.0) if retry_after else 0.0
+    except ValueError:
+        minimum = 0.0
+
+    return minimum + random.uniform(0, GECKO_RETRY_BASE * 2 ** attempt)
+
+
+"""Request budget of one upstream API key, with a reserve background calls cannot take"""
+
+
+class UpstreamQuota:
+    def __init__(
+        self,
+        name: str,
+        per_minute: int = GECKO_RATE_LIMIT,
+        reserve: float = GECKO_INTERACTIVE_RESERVE,
+        remote: Optional[RedisBuckets] = None,
+        local: Optional[MemoryBuckets] = None
+    ):
+        self.name = name
+        self.per_minute = per_minute
+        self.rate = per_minute / 60
+        self.capacity = float(per_minute)
+        # Background calls must still be able to take a token at all
+        self.reserve = min(reserve, self.capacity - 1)
+
+        self.remote = remote
+        self.local = local or MemoryBuckets()
+
+        self.granted = {INTERACTIVE: 0, BACKGROUND: 0}
+        self.waited = {INTERACTIVE: 0, BACKGROUND: 0}
+        self.rejected = {INTERACTIVE: 0, BACKGROUND: 0}
+        self.rate_limited = 0
+        self.remaining: Optional[float] = None
+
+        self._remote_down_until = 0.0
+        self._lock = threading.Lock()
+
+    def _reserve_for(self, priority: str) -> float:
+        return self.reserve if priority == BACKGROUND else 0.0
+
+    def _use_remote(self) -> bool:
+        return self.remote is not None and time.monotonic() >= self._remote_down_until
+
+    def _remote_failed(self):
+        self._remote_down_until = time.monotonic() + GECKO_QUOTA_REDIS_RETRY
+
+    async def _take(self, priority: str) -> Tuple[bool, float, float]:
+        if self._use_remote():
+            try:
+                return await self.remote.take(self.name, self.rate, self.capacity, self._reserve_for(priority))
+            except Exception:
+                self._remote_failed()
+
+        return self.local.take_sync(self.name, self.rate, self.capacity, self._reserve_for(priority))
+
+    def _take_sync(self, priority: str) -> Tuple[bool, float, float]:
+        if self._use_remote():
+            try:
+                return self.remote.take_sync(self.name, self.rate, self.capacity, self._reserve_for(priority))
+            except Exception:
+                self._remote_failed()
+
+        return self.local.take_sync(self.name, self.rate, self.capacity, self._reserve_for(priority))
+
+    def _record(self, priority: str, allowed: bool, wait: float, remaining: float, deadline: float) -> float:
+        with self._lock:
+            self.remaining = remaining
+
+            if allowed:
+                self.granted[priority] += 1
+                return 0.0
+
+            if time.monotonic() + wait > deadline:
+                self.rejected[priority] += 1
+                raise QuotaExceeded(f"{self.name} request budget is used up, next {priority} call possible in {wait:.1f}s")
+
+            self.waited[priority] += 1
+
+        return wait
+
+    async def acquire(self, priority: str = INTERACTIVE):
+        deadline = time.monotonic() + GECKO_MAX_WAIT[priority]
+
+        while True:
+            wait = self._record(priority, *await self._take(priority), deadline)
+
+            if not wait:
+                return
+
+            await asyncio.sleep(wait)
+
+    def acquire_sync(self, priority: str = BACKGROUND):
+        deadline = time.monotonic() + GECKO_MAX_WAIT[priority]
+
+        while True:
+            wait = self._record(priority, *self._take_sync(priority), deadline)
+
+            if not wait:
+                return
+
+            time.sleep(wait)
+
+    def record_rate_limited(self):
+        with self._lock:
+            self.rate_limited += 1
+
+    def metrics(self) -> dict:
+        with self._lock:
+            return {
+                "upstream": self.name,
+                "limit_per_minute": self.per_minute,
+                "interactive_reserve": self.reserve,
+                "remaining": self.remaining,
+                "shared": self.remote is not None,
+                "granted": dict(self.granted),
+                "waited": dict(self.waited),
+                "rejected": dict(self.rejected),
+                "rate_limited": self.rate_limited
+            }
+
+
+def create_gecko_quota() -> UpstreamQuota:
+    remote = None
+
+    if os.getenv("REDIS_URL"):
+        remote = RedisBuckets(os.getenv("REDIS_URL"), prefix="upstream-quota:")
+
+    return UpstreamQuota("coingecko", remote=remote)
+
+
+gecko_quota = create_gecko_quota()
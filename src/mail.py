@@ -1,31 +1,29 @@
 import os
-from fastapi_mail import FastMail, ConnectionConfig, MessageSchema, MessageType
 from pathlib import Path
 from dotenv import load_dotenv
 
+from src.helpers.mail_helper import SMTPPool
+
 """File to configurate mail service, that will send email to users"""
 
 load_dotenv()
 
 BASE_DIR = Path(__file__).resolve().parent
 
-mail_config = ConnectionConfig(
-    MAIL_USERNAME=os.getenv("MAIL_USERNAME"),
-    MAIL_PASSWORD=os.getenv("MAIL_PASSWORD"),
-    MAIL_FROM=os.getenv("MAIL_USERNAME"),
-    MAIL_PORT=os.getenv("MAIL_PORT"),
-    MAIL_SERVER=os.getenv("MAIL_SERVER"),
-    MAIL_FROM_NAME=os.getenv("MAIL_FROM_NAME"),
-    MAIL_STARTTLS=True,
-    MAIL_SSL_TLS=False,
-    USE_CREDENTIALS=True,
-    VALIDATE_CERTS=True,
+mail_pool = SMTPPool(
+    hostname=os.getenv("MAIL_SERVER"),
+    port=int(os.getenv("MAIL_PORT", 587)),
+    username=os.getenv("MAIL_USERNAME"),
+    password=os.getenv("MAIL_PASSWORD"),
+    sender=os.getenv("MAIL_USERNAME"),
+    sender_name=os.getenv("MAIL_FROM_NAME"),
+    start_tls=True,
+    validate_certs=True,
+    size=int(os.getenv("MAIL_POOL_SIZE", 2)),
 )
 
-mail = FastMail(config=mail_config)
-
 
 def create_message(recipients: list[str], subject: str, body: str):
-    result = MessageSchema(recipients=recipients, subject=subject, body=body, subtype=MessageType.html)
+    result = mail_pool.build_message(recipients, subject, body)
 
     return result
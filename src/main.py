@@ -2,25 +2,34 @@ import os
 import stripe
 
 from dotenv import load_dotenv
-from fastapi import FastAPI, Response, Request, HTTPException
-from fastapi.responses import RedirectResponse, JSONResponse
+from fastapi import FastAPI, Depends, Response, Request, HTTPException
+from fastapi.responses import RedirectResponse, JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from pycoingecko import CoinGeckoAPI
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 
-from src.database.db import session
+from src.database.db import get_session
 from src.models.models import User, Subscritions, Notifications
 from src.schemas.request_types import NotifyRequest
 from src.auth.auth_service import check_auth
 
 from src.helpers.subscription_helper import addSubscription
+from src.helpers.upstream_helper import run_blocking
+from src.helpers.notification_stream_helper import notification_stream, notification_to_dict
+from src.helpers.compression_helper import CompressionMiddleware
+from src.helpers.rate_limit_helper import RateLimitMiddleware
+from src.helpers.upstream_quota_helper import gecko_quota
 
-from src.routes import auth_route, stock_route, payment_route, user_route, crypto_route
+from src.routes import auth_route, stock_route, payment_route, user_route, crypto_route, ws_route
 
 load_dotenv()
 
 app = FastAPI()
 
+# Added first so it runs inside CORS and the browser can read the 429 responses
+app.add_middleware(RateLimitMiddleware)
+
 allowed_origins = [
     "http://localhost:3000",
 ]
@@ -33,7 +42,7 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-cg = CoinGeckoAPI(demo_api_key=os.getenv('GECKO_API_KEY'))
+app.add_middleware(CompressionMiddleware)
 
 stripe.api_key = os.getenv("STRIPE_SECRET_KEY")
 
@@ -42,18 +51,19 @@ app.include_router(crypto_route.router, prefix="/crypto")
 app.include_router(stock_route.router, prefix="/stock")
 app.include_router(payment_route.router, prefix="/payment")
 app.include_router(user_route.router, prefix="/users")
+app.include_router(ws_route.router, prefix="/ws")
 
 
 @app.post("/alert/",
           status_code=201,
           response_description="Add a subscription to check crypto/stock price")
-async def notify_user(payload: NotifyRequest, res: Response, req: Request):
+async def notify_user(payload: NotifyRequest, res: Response, req: Request, session: AsyncSession = Depends(get_session)):
     try:
         auth_data = await check_auth(res, req.cookies.get("access_token"), req.cookies.get("refresh_token"))
 
         res.status_code = 201
 
-        return await addSubscription(payload, auth_data["uid"])
+        return await addSubscription(session, payload, auth_data["uid"])
     except Exception as e:
         res.status_code = 401
 
@@ -64,7 +74,7 @@ async def notify_user(payload: NotifyRequest, res: Response, req: Request):
          status_code=200,
          response_model=List[NotifyRequest],
          response_description="Get list of  all of the users subscribtions")
-async def get_subscriptions(uid: str, res: Response, req: Request) -> List[NotifyRequest]:
+async def get_subscriptions(uid: str, res: Response, req: Request, session: AsyncSession = Depends(get_session)) -> List[NotifyRequest]:
     try:
         auth_data = await check_auth(res, req.cookies.get("access_token"), req.cookies.get("refresh_token"))
 
@@ -72,16 +82,82 @@ async def get_subscriptions(uid: str, res: Response, req: Request) -> List[Notif
             res.status_code = 409
             return JSONResponse(status_code=409, content={"detail": "You are not allowed to see others subscriptions"})
 
-        return session.query(Subscritions).filter(Subscritions.uid == uid).all()
+        return (await session.scalars(select(Subscritions).where(Subscritions.uid == int(uid)))).all()
     except Exception as e:
         return JSONResponse(status_code=401, content={"detail": e})
 
 
+"""Remaining CoinGecko budget and how calls of each priority fared in this process, for admins"""
+
+
+@app.get("/upstream/quota",
+         status_code=200,
+         response_description="Usage of the shared CoinGecko request budget")
+async def upstream_quota(res: Response, req: Request):
+    try:
+        auth_data = await check_auth(res, req.cookies.get("access_token"), req.cookies.get("refresh_token"))
+    except HTTPException as e:
+        return JSONResponse(status_code=e.status_code, content={"detail": e.detail})
+
+    if auth_data["role"] != "admin":
+        return JSONResponse(status_code=401, content={"detail": "You are not allowed to do this"})
+
+    return gecko_quota.metrics()
+
+
+"""Declared before /notifications/{uid}, otherwise "stream" would be taken for a uid"""
+
+
+@app.get("/notifications/stream",
+         status_code=200,
+         response_description="Server-Sent Events stream of the users notifications, as soon as alerts trigger")
+async def stream_notifications(res: Response, req: Request, session: AsyncSession = Depends(get_session)):
+    try:
+        auth_data = await check_auth(res, req.cookies.get("access_token"), req.cookies.get("refresh_token"))
+    except HTTPException as e:
+        return JSONResponse(status_code=e.status_code, content={"detail": e.detail})
+
+    uid = int(auth_data["uid"])
+
+    # Listening starts before the backlog query, so nothing published in between is lost
+    queue = notification_stream.listen(uid)
+
+    try:
+        last_event_id = int(req.headers.get("last-event-id") or 0)
+    except ValueError:
+        last_event_id = 0
+
+    try:
+        backlog = []
+
+        if last_event_id:
+            missed = await session.scalars(
+                select(Notifications)
+                .where(Notifications.uid == uid, Notifications.id > last_event_id)
+                .order_by(Notifications.id)
+            )
+            backlog = [notification_to_dict(notification) for notification in missed]
+    except Exception:
+        notification_stream.unlisten(uid, queue)
+        raise
+
+    stream = StreamingResponse(
+        notification_stream.events(uid, queue, backlog),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+    for cookie in res.headers.getlist("set-cookie"):
+        stream.headers.append("set-cookie", cookie)
+
+    return stream
+
+
 @app.get("/notifications/{uid}",
          status_code=200,
          response_model=List[NotifyRequest],
          response_description="Get list of all notifications that were sent to the user")
-async def get_notifications(uid: str, res: Response, req: Request) -> List[NotifyRequest]:
+async def get_notifications(uid: str, res: Response, req: Request, session: AsyncSession = Depends(get_session)) -> List[NotifyRequest]:
     try:
         auth_data = await check_auth(res, req.cookies.get("access_token"), req.cookies.get("refresh_token"))
 
@@ -89,7 +165,7 @@ async def get_notifications(uid: str, res: Response, req: Request) -> List[Notif
             res.status_code = 409
             return JSONResponse(status_code=409, content={"detail": "You are not allowed to see others notifications"})
 
-        return session.query(Notifications).filter(Notifications.uid == uid).all()
+        return (await session.scalars(select(Notifications).where(Notifications.uid == int(uid)))).all()
     except Exception as e:
         return JSONResponse(status_code=401, content={"detail": e})
 
@@ -97,11 +173,11 @@ async def get_notifications(uid: str, res: Response, req: Request) -> List[Notif
 @app.post("/buy-premium/",
           status_code=201,
           response_class=RedirectResponse)
-async def buy_premium(res: Response, req: Request):
+async def buy_premium(res: Response, req: Request, session: AsyncSession = Depends(get_session)):
     try:
         auth_data = await check_auth(res, req.cookies.get("access_token"), req.cookies.get("refresh_token"))
 
-        user = session.query(User).filter(User.id == int(auth_data["uid"])).first()
+        user = await session.get(User, int(auth_data["uid"]))
 
         if user.premium:
             raise HTTPException(status_code=409, detail="You are already premium user!")
@@ -111,7 +187,8 @@ async def buy_premium(res: Response, req: Request):
         fail_url = f"{base_url}/payment/fail"
 
         try:
-            checkout = stripe.checkout.Session.create(
+            checkout = await run_blocking(
+                stripe.checkout.Session.create,
                 line_items=[{
                     'price_data': {
                         'currency': 'usd',
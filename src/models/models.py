@@ -1,6 +1,7 @@
 from datetime import datetime
+from typing import Optional
 from sqlalchemy.orm import Mapped, mapped_column, declarative_base
-from sqlalchemy import String, ForeignKey, Boolean
+from sqlalchemy import String, ForeignKey, Boolean, Index
 
 Base = declarative_base()
 
@@ -10,7 +11,7 @@ class User(Base):
 
     id: Mapped[int] = mapped_column(primary_key=True)
     username: Mapped[str]
-    email: Mapped[str]
+    email: Mapped[str] = mapped_column(String, unique=True, index=True)
     password: Mapped[str]
     country: Mapped[str]
     verified: Mapped[bool] = mapped_column(Boolean, default=False)
@@ -24,9 +25,13 @@ class User(Base):
 
 class Subscritions(Base):
     __tablename__ = "subscritions"
+    __table_args__ = (
+        # Used by the alert scanner to group subscriptions by the asset they watch
+        Index("ix_subscritions_check_type_what_to_check_currency", "check_type", "what_to_check", "currency"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
-    uid: Mapped[int] = mapped_column(ForeignKey("users.id"))
+    uid: Mapped[int] = mapped_column(ForeignKey("users.id"), index=True)
     check_type: Mapped[str]
     what_to_check: Mapped[str]
     operator: Mapped[str]
@@ -38,12 +43,14 @@ class Notifications(Base):
     __tablename__ = "notifications"
 
     id: Mapped[int] = mapped_column(primary_key=True)
-    uid: Mapped[int] = mapped_column(ForeignKey("users.id"))
+    uid: Mapped[int] = mapped_column(ForeignKey("users.id"), index=True)
     check_type: Mapped[str]
     what_to_check: Mapped[str]
     operator: Mapped[str]
     value: Mapped[int]
     currency: Mapped[str]
+    # Price that triggered the alert, empty for notifications stored before it was recorded
+    price: Mapped[Optional[float]]
     created_at: Mapped[datetime] = mapped_column(
         default=datetime.now(),
         nullable=False
@@ -54,7 +61,7 @@ class Verifications(Base):
     __tablename__ = "email_verifications"
 
     id: Mapped[int] = mapped_column(primary_key=True)
-    email: Mapped[str]
+    email: Mapped[str] = mapped_column(String, index=True)
     code: Mapped[str]
     created_at: Mapped[datetime] = mapped_column(
         default=datetime.now(),
@@ -3,28 +3,42 @@ import os
 
 from dotenv import load_dotenv
 
-from fastapi import APIRouter, Response, Request, HTTPException
+from fastapi import APIRouter, Depends, Response, Request, HTTPException
 from fastapi.responses import JSONResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.models.models import User
 from src.schemas.request_types import UserType, LoginType, CodeRequest
 
 from src.auth.auth_service import register_user, user_exists
-from src.helpers.pwd_helper import comparePwds, hashPwd
+from src.helpers.pwd_helper import PasswordPoolBusy, comparePwds, hashPwd, needs_rehash
 from src.helpers.send_verif import send_verification_email, check_verified, check_code
 from src.auth.auth_service import create_token, clear_tokens, check_user_payload
 
-from src.database.db import session
+from src.database.db import get_session
 
 load_dotenv()
 
 router = APIRouter()
 
+# Seconds a client is asked to wait when the password pool is saturated
+PWD_RETRY_AFTER = int(os.getenv("PWD_RETRY_AFTER", 1))
+
+
+def password_pool_busy() -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail="Too many logins at the moment, try again shortly",
+        headers={"Retry-After": str(PWD_RETRY_AFTER)}
+    )
+
 
 @router.post("/register", status_code=201)
 async def register(
     user_data: UserType,
-    res: Response
+    res: Response,
+    session: AsyncSession = Depends(get_session)
 ):
     if await user_exists(session, user_data.email):
         raise HTTPException(status_code=406, detail="User with such email already exists")
@@ -39,21 +53,23 @@ async def register(
 
         user_data.pfp = f"https://eu.ui-avatars.com/api/?name={user_data.username}"
 
-        await register_user(user_data=user_data)
+        await register_user(session, user_data=user_data)
 
         res.status_code = 201
 
-        send_verification_email(user_data.email, res)
+        await send_verification_email(session, user_data.email, res)
 
         return {"message": "Verification code was sent to your email!"}
+    except PasswordPoolBusy:
+        raise password_pool_busy()
     except Exception as e:
         raise HTTPException(status_code=403, detail=f"Happened some error with registration: {e}")
 
 
 @router.post("/email-verification", status_code=202)
-async def verify_email(code: CodeRequest, req: Request, res: Response):
+async def verify_email(code: CodeRequest, req: Request, res: Response, session: AsyncSession = Depends(get_session)):
     try:
-        verif_status = check_code(req, code.code)
+        verif_status = await check_code(session, req, code.code)
     except Exception as e:
         raise HTTPException(detail=f"Happened some error with code: {e}", status_code=404)
 
@@ -70,18 +86,27 @@ async def verify_email(code: CodeRequest, req: Request, res: Response):
 
 
 @router.post("/login", status_code=202)
-async def login(data: LoginType):
-    if not check_verified(data.email):
+async def login(data: LoginType, session: AsyncSession = Depends(get_session)):
+    if not await check_verified(session, data.email):
         raise HTTPException(status_code=403, detail="You didn't verify your email")
 
     try:
-        user = session.query(User).filter(User.email == data.email).first()
+        user = (await session.scalars(select(User).where(User.email == data.email))).first()
 
         doesMatch = await comparePwds(data.password, user.password)
 
         if not doesMatch:
             raise HTTPException(status_code=409, detail="Incorrect password for provided email")
 
+        # Hashes made with another cost factor are upgraded while the plain password is at hand
+        if needs_rehash(user.password):
+            try:
+                user.password = (await hashPwd(data.password)).decode('utf-8')
+
+                await session.commit()
+            except PasswordPoolBusy:
+                pass
+
         payload = {
             "uid": user.id,
             "role": user.role,
@@ -119,6 +144,10 @@ async def login(data: LoginType):
         )
 
         return res
+    except PasswordPoolBusy:
+        raise password_pool_busy()
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=403, detail=f"Happened some error with login: {e}")
 
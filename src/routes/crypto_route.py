@@ -1,22 +1,56 @@
-import os
-import pandas as pd
-
 from typing import List, Optional
 from dotenv import load_dotenv
 
-from fastapi import APIRouter, HTTPException, Query, Request, Response
-from pycoingecko import CoinGeckoAPI
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 
-from src.schemas.request_types import CoinsRequest, StatisticsResponse
+from src.schemas.request_types import CoinsRequest, StatisticsData, StatisticsResponse
 from src.helpers.statistics_helper import get_coin_stats
-from src.auth.auth_service import check_tokens, check_users_auth
-from src.schemas.query_types import SortByType, SortOrderType
+from src.helpers.cache_helper import MARKET_STALE_TTL, acached_call
+from src.helpers.upstream_helper import coingecko
+from src.helpers.market_snapshot_helper import MarketSnapshot
+from src.helpers.json_helper import FastJSONResponse, json_response, serialized
+from src.helpers.http_cache_helper import conditional_snapshot_response
+from src.helpers.sparkline_helper import compact_statistics
+from src.helpers.market_stats_helper import with_indicators
+from src.auth.auth_service import AuthState, resolve_auth
+from src.schemas.query_types import SortByType, SortOrderType, SparklineEncodingType
 
 load_dotenv()
 
-router = APIRouter()
+router = APIRouter(default_response_class=FastJSONResponse)
+
+cg = coingecko
+
+
+"""Fetching a market page and building its snapshot, cached together so it is built once per refresh"""
+
+
+async def fetch_market_snapshot(vs_currency: str, page: int) -> MarketSnapshot:
+    return MarketSnapshot(await cg.get_coins_markets(vs_currency=vs_currency, page=page))
+
+
+"""Validated and serialized statistics of a coin, cached so repeated requests skip validation and encoding"""
+
+
+async def fetch_coin_statistics(
+    coin: str,
+    sparkline: SparklineEncodingType = "full",
+    points: Optional[int] = None,
+    change: List[int] = (),
+    sma: List[int] = (),
+    volatility: bool = False,
+    drawdown: bool = False
+):
+    data = await get_coin_stats(coin)
+
+    if not data:
+        raise HTTPException(status_code=409, detail=f"No data found for {coin}")
 
-cg = CoinGeckoAPI(demo_api_key=os.getenv('GECKO_API_KEY'))
+    stats = StatisticsData.model_validate({**data[0], "high": data[0].get("high_24h"), "low": data[0].get("low_24h")})
+
+    stats = with_indicators([stats.model_dump(exclude_none=True)], change, sma, volatility, drawdown)
+
+    return serialized(compact_statistics(stats, sparkline, points))
 
 
 @router.post("/crypto-list",
@@ -24,38 +58,35 @@ cg = CoinGeckoAPI(demo_api_key=os.getenv('GECKO_API_KEY'))
              response_description="List of all available crypto currencies")
 async def get_coin_list(
     res: Response,
-    req: Request,
     payload: CoinsRequest, page: int = Query(1, ge=1),
+    auth: AuthState = Depends(resolve_auth),
     crypto: List[str] = Query(default=[]),
     sort_by: Optional[SortByType] = Query(None),
     sort_order: Optional[SortOrderType] = Query(None)
 ):
     try:
-        is_logged_in = await check_tokens(res, req.cookies.get("access_token"), req.cookies.get("refresh_token"))
-        users_data = await check_users_auth(res, req.cookies.get("access_token"), req.cookies.get("refresh_token"))
-
-        data = cg.get_coins_markets(vs_currency=payload.currency or "usd", page=(page if page else 1))
-
-        df = None
-
-        if payload.names:
-            df = pd.DataFrame(data)[["id", "image", "current_price"]]
-        else:
-            df = pd.DataFrame(data)[["id", "symbol", "image", "current_price", "market_cap", "market_cap_rank", "price_change_percentage_24h"]]
-
-        if crypto:
-            filtered_df = df[df.id.isin([c.lower() for c in crypto])]
-        else:
-            filtered_df = df
-
-        sort_column = sort_by if sort_by else "current_price"
-        sorted_df = filtered_df.sort_values(by=sort_column, ascending=(True if sort_order == "asc" else False)).dropna()
-
-        return {
-            "assetsData": sorted_df.head(payload.limit).to_dict(orient="records"),
-            "isLoggedIn": is_logged_in,
-            "usersData": users_data
-        }
+        snapshot = await acached_call(
+            "coingecko",
+            "coins_markets_snapshot",
+            fetch_market_snapshot,
+            stale_ttl=MARKET_STALE_TTL,
+            vs_currency=payload.currency or "usd",
+            page=(page if page else 1)
+        )
+
+        assets = snapshot.select_serialized(
+            names=payload.names,
+            sort_by=sort_by if sort_by else "current_price",
+            descending=sort_order != "asc",
+            ids=crypto,
+            limit=payload.limit
+        )
+
+        return json_response(res, {
+            "assetsData": assets,
+            "isLoggedIn": auth.logged_in,
+            "usersData": auth.users_data
+        })
     except Exception as e:
         raise HTTPException(status_code=409, detail=f"Happened some error with getting coins data: {e}")
 
@@ -67,23 +98,35 @@ async def get_coin_list(
 async def get_coin_statistics(
     res: Response,
     req: Request,
+    auth: AuthState = Depends(resolve_auth),
     crypto: str = Query("", min_length=0),
+    sparkline: SparklineEncodingType = Query("full"),
+    points: Optional[int] = Query(None, ge=2, le=1000),
+    change: List[int] = Query(default=[], description="Percentage change over the last N hours"),
+    sma: List[int] = Query(default=[], description="Moving average of the last N hourly prices"),
+    volatility: bool = Query(False, description="Standard deviation of hourly log returns, in percent"),
+    drawdown: bool = Query(False, description="Largest drop from a previous high over the 7 days, in percent")
 ):
     try:
-        is_logged_in = await check_tokens(res, req.cookies.get("access_token"), req.cookies.get("refresh_token"))
-        users_data = await check_users_auth(res, req.cookies.get("access_token"), req.cookies.get("refresh_token"))
-
         if crypto == "":
             raise HTTPException(status_code=409, detail="You cannot use empty string as crypto!")
 
-        data = await get_coin_stats(crypto)
-
-        res = pd.DataFrame(data)[["name", "image", "current_price", "high_24h", "low_24h", "sparkline_in_7d", "price_change_percentage_24h", "price_change_percentage_7d_in_currency"]].rename(columns={"high_24h": "high", "low_24h": "low"})
-
-        return {
-            "statsData": [res.to_dict(orient="records")[0]],
-            "isLoggedIn": is_logged_in,
-            "usersData": users_data
-        }
+        return await conditional_snapshot_response(
+            req,
+            res,
+            "statsData",
+            {"isLoggedIn": auth.logged_in, "usersData": auth.users_data},
+            "coingecko",
+            "coin_statistics",
+            fetch_coin_statistics,
+            stale_ttl=MARKET_STALE_TTL,
+            coin=crypto,
+            sparkline=sparkline,
+            points=points,
+            change=change,
+            sma=sma,
+            volatility=volatility,
+            drawdown=drawdown
+        )
     except Exception as e:
         raise HTTPException(status_code=409, detail=f"Error with getting statistics for {crypto}: {e}")
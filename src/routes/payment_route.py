@@ -1,12 +1,15 @@
 import stripe
 from dotenv import load_dotenv
 
-from fastapi import APIRouter, HTTPException, Request
+from fastapi import APIRouter, Depends, HTTPException, Request
 from fastapi.responses import HTMLResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.models.models import User
 
-from src.database.db import session
+from src.database.db import get_session
+from src.helpers.upstream_helper import run_blocking
 
 router = APIRouter()
 
@@ -14,18 +17,18 @@ load_dotenv()
 
 
 @router.get("/success", response_class=HTMLResponse)
-async def payment_success(req: Request):
+async def payment_success(req: Request, session: AsyncSession = Depends(get_session)):
     session_id = req.query_params.get("session_id")
 
     try:
-        stripe_session = stripe.checkout.Session.retrieve(session_id)
+        stripe_session = await run_blocking(stripe.checkout.Session.retrieve, session_id)
         users_email = stripe_session.get("customer_email")
 
-        user = session.query(User).filter(User.email == users_email).first()
+        user = (await session.scalars(select(User).where(User.email == users_email))).first()
 
         if user:
             user.premium = True
-            session.commit()
+            await session.commit()
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Happened error with payment: {e}")
 
@@ -1,37 +1,56 @@
 from typing import List, Optional
 
-from fastapi import APIRouter, HTTPException, Query, Response, Request
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, Request
 
 from src.schemas.request_types import StatisticsResponse
 
 from src.helpers.statistics_helper import get_stock_stats
 from src.helpers.stocks_helper import get_stock_price
-from src.auth.auth_service import check_tokens, check_users_auth
-from src.schemas.query_types import SortByType, SortOrderType
+from src.helpers.json_helper import FastJSONResponse, Serialized, json_response, serialized
+from src.helpers.cache_helper import MARKET_STALE_TTL
+from src.helpers.http_cache_helper import conditional_snapshot_response
+from src.helpers.sparkline_helper import compact_statistics
+from src.helpers.market_stats_helper import with_indicators
+from src.auth.auth_service import AuthState, resolve_auth
+from src.schemas.query_types import SortByType, SortOrderType, SparklineEncodingType
 
-router = APIRouter()
+router = APIRouter(default_response_class=FastJSONResponse)
+
+
+"""Serialized statistics of the stocks, cached so a repeated request only compares etags"""
+
+
+async def fetch_stock_statistics(
+    stocks: List[str],
+    sparkline: SparklineEncodingType = "full",
+    points: Optional[int] = None,
+    change: List[int] = (),
+    sma: List[int] = (),
+    volatility: bool = False,
+    drawdown: bool = False
+) -> Serialized:
+    stats = with_indicators(await get_stock_stats(stocks), change, sma, volatility, drawdown)
+
+    return serialized(compact_statistics(stats, sparkline, points))
 
 
 @router.post("/stock-list/", status_code=200,
              response_description="Get list of all stocks available")
 async def get_stock_list(
     res: Response,
-    req: Request,
+    auth: AuthState = Depends(resolve_auth),
     stock: Optional[str] = Query(None),
     sort_by: Optional[SortByType] = Query(None),
     sort_order: Optional[SortOrderType] = Query(None)
 ):
     try:
-        is_logged_in = await check_tokens(res, req.cookies.get("access_token"), req.cookies.get("refresh_token"))
-        users_data = await check_users_auth(res, req.cookies.get("access_token"), req.cookies.get("refresh_token"))
-
         data = await get_stock_price(stock_name=stock, sort_by=sort_by, sort_order=sort_order)
 
-        return {
+        return json_response(res, {
             "assetsData": data,
-            "isLoggedIn": is_logged_in,
-            "usersData": users_data
-        }
+            "isLoggedIn": auth.logged_in,
+            "usersData": auth.users_data
+        })
     except Exception as e:
         print(e)
         raise HTTPException(status_code=409, detail=f"{e}")
@@ -43,18 +62,32 @@ async def get_stock_list(
 async def get_stock_statistics(
     res: Response,
     req: Request,
+    auth: AuthState = Depends(resolve_auth),
     stock: List[str] = Query(default=[]),
+    sparkline: SparklineEncodingType = Query("full"),
+    points: Optional[int] = Query(None, ge=2, le=1000),
+    change: List[int] = Query(default=[], description="Percentage change over the last N trading days"),
+    sma: List[int] = Query(default=[], description="Moving average of the last N daily closes"),
+    volatility: bool = Query(False, description="Standard deviation of daily log returns, in percent"),
+    drawdown: bool = Query(False, description="Largest drop from a previous high over the window, in percent")
 ):
     try:
-        is_logged_in = await check_tokens(res, req.cookies.get("access_token"), req.cookies.get("refresh_token"))
-        users_data = await check_users_auth(res, req.cookies.get("access_token"), req.cookies.get("refresh_token"))
-
-        data = await get_stock_stats(stock)
-
-        return {
-            "statsData": data,
-            "isLoggedIn": is_logged_in,
-            "usersData": users_data
-        }
+        return await conditional_snapshot_response(
+            req,
+            res,
+            "statsData",
+            {"isLoggedIn": auth.logged_in, "usersData": auth.users_data},
+            "yfinance",
+            "stock_statistics",
+            fetch_stock_statistics,
+            stale_ttl=MARKET_STALE_TTL,
+            stocks=[name.upper() for name in stock],
+            sparkline=sparkline,
+            points=points,
+            change=change,
+            sma=sma,
+            volatility=volatility,
+            drawdown=drawdown
+        )
     except Exception as e:
         raise HTTPException(status_code=409, detail=f"Error with getting statistics for {stock}: {e}")
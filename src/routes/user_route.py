@@ -1,13 +1,15 @@
 from dotenv import load_dotenv
 from typing import List
 
-from fastapi import APIRouter, Response, Request
+from fastapi import APIRouter, Depends, Response, Request
 from fastapi.responses import JSONResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.auth.auth_service import check_auth, get_user_by_id
 from src.schemas.request_types import UserType
 from src.models.models import User
-from src.database.db import session
+from src.database.db import get_session
 
 load_dotenv()
 
@@ -17,7 +19,7 @@ router = APIRouter()
 @router.get("/",
             response_model=List[UserType],
             response_description="Endpoint to get all of the users")
-async def get_all_users(res: Response, req: Request) -> List[UserType]:
+async def get_all_users(res: Response, req: Request, session: AsyncSession = Depends(get_session)) -> List[UserType]:
     try:
         auth_data = await check_auth(res, req.cookies.get("access_token"), req.cookies.get("refresh_token"))
 
@@ -29,16 +31,16 @@ async def get_all_users(res: Response, req: Request) -> List[UserType]:
     except Exception as e:
         return JSONResponse(status_code=e.status_code, content={"detail": e.detail})
 
-    return session.query(User).all()
+    return (await session.scalars(select(User))).all()
 
 
 @router.get("/{uid}/profile",
             response_description="Profile endpoint for every user")
-async def user_profile(uid: str, res: Response, req: Request):
+async def user_profile(uid: str, res: Response, req: Request, session: AsyncSession = Depends(get_session)):
     try:
         await check_auth(res, req.cookies.get("access_token"), req.cookies.get("refresh_token"))
 
-        user_data = await get_user_by_id(uid)
+        user_data = await get_user_by_id(session, uid)
 
         res.status_code = 200
 
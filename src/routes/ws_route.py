@@ -0,0 +1,138 @@
+import os
+
+from typing import Dict, FrozenSet, Set
+
+from dotenv import load_dotenv
+
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+
+from src.helpers.broadcast_helper import PriceBroadcaster, TooManyAssets
+from src.helpers.cache_helper import METADATA_CACHE_TTL, acached_call
+from src.helpers.price_helper import GECKO_IDS_PER_CALL, chunks, resolve_stock_prices
+from src.helpers.rate_limit_helper import client_key, rate_limiter
+from src.helpers.stocks_helper import get_stocks
+from src.helpers.upstream_helper import coingecko, coingecko_background, run_blocking
+
+load_dotenv()
+
+# Coins that can be watched: the ids of the first market page, by market cap, the crypto list shows
+WS_KNOWN_COINS = int(os.getenv("WS_KNOWN_COINS", 250))
+
+router = APIRouter()
+
+cg = coingecko
+
+# The poller runs on the background share of the CoinGecko budget, like the alert checks
+poller_cg = coingecko_background
+
+
+"""Fetching usd prices of watched assets, named "crypto:<coin id>" and "stock:<ticker>\""""
+
+
+async def fetch_background_price(**params):
+    return await run_blocking(poller_cg.get_price, **params)
+
+
+async def fetch_market_prices(assets: Set[str]) -> Dict[str, float]:
+    coins = sorted(asset.split(":", 1)[1] for asset in assets if asset.startswith("crypto:"))
+    stocks = sorted(asset.split(":", 1)[1] for asset in assets if asset.startswith("stock:"))
+
+    prices: Dict[str, float] = {}
+
+    for chunk in chunks(coins, GECKO_IDS_PER_CALL):
+        data = await acached_call("coingecko", "price", fetch_background_price, ids=",".join(chunk), vs_currencies="usd")
+
+        for coin, quotes in data.items():
+            if quotes.get("usd") is not None:
+                prices[f"crypto:{coin}"] = float(quotes["usd"])
+
+    if stocks:
+        resolved = await run_blocking(resolve_stock_prices, {(stock, "usd") for stock in stocks})
+
+        for (_, stock, _), price in resolved.items():
+            prices[f"stock:{stock}"] = price
+
+    return prices
+
+
+async def fetch_coin_ids(per_page: int) -> FrozenSet[str]:
+    return frozenset(coin["id"] for coin in await cg.get_coins_markets(vs_currency="usd", per_page=per_page))
+
+
+async def known_coins() -> FrozenSet[str]:
+    return await acached_call("coingecko", "coin_ids", fetch_coin_ids, ttl=METADATA_CACHE_TTL, per_page=WS_KNOWN_COINS)
+
+
+broadcaster = PriceBroadcaster(fetch_market_prices)
+
+SUBSCRIBE_USAGE = "Send {\"action\": \"subscribe\", \"crypto\": [...], \"stocks\": [...]} with lists of names"
+
+
+def is_name_list(value) -> bool:
+    return isinstance(value, list) and all(isinstance(item, str) for item in value)
+
+
+async def send_error(websocket: WebSocket, detail: str):
+    await websocket.send_json({"type": "error", "detail": detail})
+
+
+"""Live prices of listed assets, rate limited per client and capped by the broadcaster"""
+
+
+@router.websocket("/prices")
+async def prices_socket(websocket: WebSocket):
+    allowed, _ = await rate_limiter.hit("ws", client_key(websocket.scope, True))
+
+    if not allowed:
+        # Closing before accept rejects the handshake
+        await websocket.close(code=1008)
+        return
+
+    await websocket.accept()
+
+    broadcaster.connect(websocket)
+
+    try:
+        while True:
+            message = await websocket.receive_json()
+
+            if not isinstance(message, dict) or message.get("action") != "subscribe":
+                await send_error(websocket, SUBSCRIBE_USAGE)
+                continue
+
+            crypto, stocks = message.get("crypto", []), message.get("stocks", [])
+
+            if not (is_name_list(crypto) and is_name_list(stocks)):
+                await send_error(websocket, SUBSCRIBE_USAGE)
+                continue
+
+            allowed, _ = await rate_limiter.hit("ws", client_key(websocket.scope, True))
+
+            if not allowed:
+                await send_error(websocket, "Too many requests, try again later")
+                continue
+
+            try:
+                coins = await known_coins()
+            except Exception:
+                await send_error(websocket, "Listed coins are not available right now, try again later")
+                continue
+
+            unknown = sorted({coin.lower() for coin in crypto} - coins) + sorted({stock.upper() for stock in stocks} - set(get_stocks()))
+
+            if unknown:
+                await send_error(websocket, f"Unknown assets: {', '.join(unknown)}")
+                continue
+
+            assets = {f"crypto:{coin.lower()}" for coin in crypto}
+            assets |= {f"stock:{stock.upper()}" for stock in stocks}
+
+            try:
+                await broadcaster.subscribe(websocket, assets)
+            except TooManyAssets as e:
+                await send_error(websocket, str(e))
+    # RuntimeError: the broadcaster already closed the socket after a failed send
+    except (WebSocketDisconnect, RuntimeError, ValueError):
+        pass
+    finally:
+        broadcaster.disconnect(websocket)
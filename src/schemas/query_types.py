@@ -2,3 +2,4 @@ from typing import Literal
 
 SortByType = Literal["current_price", "market_cap", "price_change_percentage_24h"]
 SortOrderType = Literal["asc", "desc"]
+SparklineEncodingType = Literal["full", "float32", "delta"]
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional, List, Union
+from typing import Optional, List, Union, Dict
 from datetime import datetime
 
 """Models/Classes to identify types of data in endpoints"""
@@ -62,7 +62,11 @@ class CodeRequest(BaseModel):
 
 
 class SparklineIn7D(BaseModel):
-    price: List[float]
+    price: Optional[List[float]] = None
+    # Set instead of price when a compact encoding was requested
+    encoding: Optional[str] = None
+    length: Optional[int] = None
+    data: Optional[str] = None
 
 
 class StatisticsData(BaseModel):
@@ -74,6 +78,8 @@ class StatisticsData(BaseModel):
     sparkline_in_7d: SparklineIn7D
     price_change_percentage_7d_in_currency: float
     price_change_percentage_24h: float
+    # Only present when indicators were requested through the query parameters
+    indicators: Optional[Dict[str, Optional[float]]] = None
 
 
 class StatisticsResponse(BaseModel):